@@ -0,0 +1,441 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""asyncio client for the 4chan API.
+
+:class:`AsyncBoard` and :class:`AsyncThread` mirror :class:`basc_py4chan.Board`
+and :class:`basc_py4chan.Thread`, but every network call is a coroutine running
+on a shared aiohttp connection pool. Parsing is shared with the blocking
+client, so the objects handed back are the usual threads, posts and files.
+
+Requires Python 3 and the optional ``aiohttp`` dependency::
+
+    pip install basc-py4chan[async]
+"""
+import asyncio
+from functools import partial
+
+import aiohttp
+import requests
+
+from . import __version__
+from .board import Board, ExpandResult
+from .jsonstream import loads
+from .thread import Thread, ThreadDelta
+
+
+class _Response(object):
+    """A fully-read aiohttp response, exposing the bits of the requests API we use."""
+    def __init__(self, response, content):
+        self._response = response
+        self.status_code = response.status
+        self.reason = response.reason
+        self.url = str(response.url)
+        self.headers = response.headers
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        # the same error as the blocking client, so ExpandResult.is_404 works
+        if not self.ok:
+            raise requests.HTTPError('%i Error: %s for url: %s' % (self.status_code, self.reason, self.url),
+                                     response=self)
+
+
+class AsyncSession(object):
+    """Connection pool shared between :class:`AsyncBoard` objects.
+
+    Attributes:
+        concurrency (int): Maximum number of requests in flight at once.
+    """
+    def __init__(self, concurrency=100, session=None):
+        """Creates a :class:`basc_py4chan.aio.AsyncSession` object.
+
+        Args:
+            concurrency (int): Maximum number of requests in flight at once.
+            session: Existing aiohttp.ClientSession object to use instead of creating one.
+        """
+        self.concurrency = concurrency
+        self._session = session
+        self._semaphore = None
+
+    def _get_session(self):
+        # aiohttp sessions must be created from within a running event loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                headers={'User-Agent': 'py-4chan/%s' % __version__},
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def request(self, method, url, headers=None):
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.request(method, url, headers=headers) as res:
+                content = await res.read()
+        return _Response(res, content)
+
+    async def get(self, url, headers=None):
+        return await self.request('GET', url, headers=headers)
+
+    async def head(self, url):
+        return await self.request('HEAD', url)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncThread(Thread):
+    """Represents a 4chan thread fetched by :class:`basc_py4chan.aio.AsyncBoard`.
+
+    Same attributes as :class:`basc_py4chan.Thread`, but :meth:`update` and
+    :meth:`expand` are coroutines.
+    """
+    @classmethod
+    def _from_request(cls, board, res, id):
+        if res.status_code == 404:
+            return None
+
+        res.raise_for_status()
+
+        return cls._from_json(loads(res.content), board, id, res.headers['Last-Modified'])
+
+    async def update(self, force=False):
+        """Fetch new posts from the server.
+
+        Arguments:
+            force (bool): Force a thread update, even if thread has 404'd.
+
+        Returns:
+            int: How many new posts have been fetched.
+        """
+        res = await self._request_update(force)
+        if res is None:
+            return 0
+        posts = loads(res.content)['posts']
+        return self._apply_update(posts, res.headers['Last-Modified'], force)
+
+    async def _request_update(self, force):
+        # the response to an update request, or None if there is nothing to
+        # update; like Thread._request_update(), failures are kept in _update_error
+        if self.is_404 and not force:
+            return None
+
+        # random connection errors, just return 0 and try again later
+        self._update_error = None
+        try:
+            res = await self._board._async_session.get(self._api_url, headers=self._update_headers())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._update_error = e
+            return None
+
+        if res.status_code == 304:
+            return None
+
+        elif res.status_code == 404:
+            self._mark_404()
+            self._update_error = requests.HTTPError('404 Client Error: Not Found for url: %s' % res.url,
+                                                    response=res)
+            return None
+
+        elif res.status_code == 200:
+            return res
+
+        else:
+            res.raise_for_status()
+
+    async def update_diff(self, force=False):
+        """Fetch the thread and bring every post up to date, not just new ones.
+
+        See :meth:`basc_py4chan.Thread.update_diff`.
+
+        Returns:
+            :class:`basc_py4chan.thread.ThreadDelta`: The posts that were added,
+            removed and modified.
+        """
+        res = await self._request_update(force)
+        if res is None:
+            return ThreadDelta([], [], [])
+        return self._apply_diff(loads(res.content)['posts'], res.headers['Last-Modified'])
+
+    async def expand(self):
+        """If there are omitted posts, update to include all posts."""
+        if self.omitted_posts > 0:
+            await self.update()
+
+    @property
+    def all_posts(self):
+        # expanding needs a request, so await expand() before reading this
+        return self.posts
+
+
+class AsyncBoard(Board):
+    """Represents a 4chan board, accessed through asyncio.
+
+    Same attributes as :class:`basc_py4chan.Board`. Every method that talks to
+    4chan is a coroutine; board metadata such as :attr:`title` is still fetched
+    with a blocking request the first time it is read.
+    """
+    _thread_class = AsyncThread
+
+    def __init__(self, board_name, https=False, session=None, concurrency=100, **kwargs):
+        """Creates a :class:`basc_py4chan.aio.AsyncBoard` object.
+
+        Args:
+            board_name (string): Name of the board, such as "tg" or "etc".
+            https (bool): Whether to use a secure connection to 4chan.
+            session (:class:`basc_py4chan.aio.AsyncSession`): Connection pool to share
+                with other boards. A new one is created if not given.
+            concurrency (int): Maximum number of requests in flight, when no
+                session is given.
+            **kwargs: Other options, such as ``thread_cache``, as taken by
+                :class:`basc_py4chan.Board`.
+        """
+        super(AsyncBoard, self).__init__(board_name, https=https, **kwargs)
+        self._owns_session = session is None
+        self._async_session = session or AsyncSession(concurrency)
+
+    async def _get_json(self, url):
+        res = await self._async_session.get(url)
+        res.raise_for_status()
+        return loads(res.content)
+
+    async def get_thread(self, thread_id, update_if_cached=True, raise_404=False):
+        """Get a thread from 4chan via 4chan API.
+
+        Args:
+            thread_id (int): Thread ID
+            update_if_cached (bool): Whether the thread should be updated if it's already in our cache
+            raise_404 (bool): Raise an Exception if thread has 404'd
+
+        Returns:
+            :class:`basc_py4chan.aio.AsyncThread`: Thread object
+        """
+        cached_thread = self._thread_cache.get(thread_id)
+        if cached_thread is not None:
+            if update_if_cached:
+                await cached_thread.update()
+                # died since it was cached; fail like an uncached thread would
+                if raise_404 and cached_thread.is_404:
+                    raise cached_thread._update_error
+            return cached_thread
+
+        res = await self._async_session.get(self._url.thread_api_url(thread_id=thread_id))
+
+        if raise_404:
+            res.raise_for_status()
+        elif not res.ok:
+            return None
+
+        thread = self._thread_class._from_request(self, res, thread_id)
+        self._thread_cache[thread_id] = thread
+
+        return thread
+
+    async def iter_threads(self, thread_ids=None, update_if_cached=True):
+        """Fetch many threads concurrently, yielding each one as soon as it arrives.
+
+        Used with ``async for``. Like :meth:`basc_py4chan.Board.iter_threads`, a
+        thread that 404s or fails to download is reported in its own result
+        instead of stopping the batch. Requests in flight are limited by the
+        concurrency of the session.
+
+        Args:
+            thread_ids (list of ints): IDs of the threads to fetch. Defaults to
+                every thread on this board.
+            update_if_cached (bool): Whether cached threads should be updated.
+
+        Returns:
+            async iterator of :class:`basc_py4chan.board.ExpandResult`: One result
+            per thread, in the order the requests complete.
+        """
+        if thread_ids is None:
+            thread_ids = await self.get_all_thread_ids()
+
+        async def fetch(id):
+            try:
+                return ExpandResult(id, await self._fetch_thread(id, update_if_cached), None)
+            except Exception as e:
+                return ExpandResult(id, None, e)
+
+        tasks = [asyncio.ensure_future(fetch(id)) for id in thread_ids]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # the caller stopped early, don't fetch threads nobody wants
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_thread(self, thread_id, update_if_cached=True):
+        thread = await self.get_thread(thread_id, update_if_cached, raise_404=True)
+        if update_if_cached and thread._update_error is not None:
+            raise thread._update_error
+        return thread
+
+    async def thread_exists(self, thread_id):
+        """Check if a thread exists or has 404'd.
+
+        Args:
+            thread_id (int): Thread ID
+
+        Returns:
+            bool: Whether the given thread exists on this board.
+        """
+        res = await self._async_session.head(self._url.thread_api_url(thread_id=thread_id))
+        return res.ok
+
+    async def _get_listing(self, url, parse, build=list):
+        res = await self._async_session.get(url, headers=self._listing_headers(url))
+        if res.status_code == 304:
+            if url in self._listings:
+                return build(self._listings[url][1])
+            raise requests.HTTPError('304 Not Modified, and no copy cached: %s' % url)
+        res.raise_for_status()
+        listing = parse(loads(res.content))
+        self._remember_listing(url, res.headers.get('Last-Modified'), listing)
+        return build(listing)
+
+    def _get_json_listing(self, url, parse):
+        # a coroutine: _get_listing() hands the parser decoded JSON already
+        return self._get_listing(url, parse)
+
+    async def _request_threads(self, url):
+        return await self._get_listing(url, partial(self._thread_list_from_json, url),
+                                       self._threads_from_list)
+
+    async def get_threads(self, page=1):
+        """Returns all threads on a certain page.
+
+        Args:
+            page (int): Page to request threads for. Defaults to the first page.
+
+        Returns:
+            list of :class:`basc_py4chan.aio.AsyncThread`: Threads on the given page.
+        """
+        return await self._request_threads(self._url.page_url(page))
+
+    async def get_all_thread_ids(self):
+        """Return the ID of every thread on this board.
+
+        Returns:
+            list of ints: List of IDs of every thread on this board.
+        """
+        listing = await self._get_thread_listing()
+        return [id for id, last_modified in listing]
+
+    async def get_archived_thread_ids(self):
+        """Return the ID of every thread in this board's archive.
+
+        See :meth:`basc_py4chan.Board.get_archived_thread_ids`.
+
+        Returns:
+            list of ints: IDs of the archived threads, oldest first.
+        """
+        return await self._get_json_listing(self._url.archived_thread_list(), list)
+
+    async def backfill_archive(self, skip=(), progress_file=None, keep_cached=False):
+        """Fetch every archived thread not held yet, concurrently.
+
+        Used with ``async for``. See :meth:`basc_py4chan.Board.backfill_archive`.
+
+        Args:
+            skip: Container of thread IDs not to fetch, such as those already
+                in a local store.
+            progress_file (string): File recording the IDs of threads already
+                fetched, one per line. Created if missing.
+            keep_cached (bool): Whether to keep fetched threads in our cache.
+
+        Returns:
+            async iterator of :class:`basc_py4chan.board.ExpandResult`: One result
+            per thread fetched, in the order the requests complete.
+        """
+        archived = await self.get_archived_thread_ids()
+        wanted, cached_before = self._backfill_wanted(archived, skip, progress_file)
+        if not wanted:
+            return
+
+        progress = open(progress_file, 'a') if progress_file is not None else None
+        try:
+            async for result in self.iter_threads(wanted, update_if_cached=False):
+                yield result
+                self._backfill_done(result, progress, keep_cached, cached_before)
+        finally:
+            if progress is not None:
+                progress.close()
+
+    async def get_all_threads(self, expand=False):
+        """Return every thread on this board.
+
+        When expanding, every thread is fetched concurrently, limited only by
+        the concurrency of the session.
+
+        Args:
+            expand (bool): Whether to download every single post of every thread.
+
+        Returns:
+            list of :class:`basc_py4chan.aio.AsyncThread`: Every thread on this board.
+        """
+        if not expand:
+            return await self._request_threads(self._url.catalog())
+
+        thread_ids = await self.get_all_thread_ids()
+        threads = await asyncio.gather(*[self.get_thread(id, raise_404=False) for id in thread_ids])
+
+        # threads without replies are falsy, so test for the threads that 404'd
+        return [thread for thread in threads if thread is not None]
+
+    async def sync(self):
+        """Bring the cache up to date with the board, fetching only what changed.
+
+        See :meth:`basc_py4chan.Board.sync`. The threads that changed are
+        fetched concurrently, limited only by the concurrency of the session.
+
+        Returns:
+            :class:`basc_py4chan.board.SyncResult`: Which threads are new, changed or pruned.
+        """
+        listing = dict(await self._get_thread_listing())
+        wanted, cached, previous = self._sync_wanted(listing)
+        results = [result async for result in self.iter_threads(wanted)]
+        return self._sync_result(listing, cached, previous, results)
+
+    async def refresh_cache(self, if_want_update=False):
+        """Update all threads currently stored in our cache, concurrently."""
+        threads = [thread for thread in tuple(self._thread_cache.values())
+                   if thread.want_update or not if_want_update]
+        await asyncio.gather(*[thread.update() for thread in threads])
+
+    async def file_request(self, file):
+        """Download a :class:`basc_py4chan.File` and return its contents as bytes."""
+        res = await self._async_session.get(file.file_url)
+        res.raise_for_status()
+        return res.content
+
+    async def thumbnail_request(self, file):
+        """Download the thumbnail of a :class:`basc_py4chan.File` and return it as bytes."""
+        res = await self._async_session.get(file.thumbnail_url)
+        res.raise_for_status()
+        return res.content
+
+    async def close(self):
+        """Close the connection pool, if this board created it."""
+        if self._owns_session:
+            await self._async_session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
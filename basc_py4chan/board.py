@@ -1,8 +1,20 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import heapq
+import os
+from collections import namedtuple
+from functools import partial
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 
 from . import __version__
+from .columnar import threads_to_columns
+from .jsonstream import CHUNK_SIZE, iter_items, loads
+from .post import Post, CompactPost
+from .scheduler import PRIORITY_BACKFILL, current_priority, request_priority
+from . import snapshot
 from .thread import Thread
 from .url import Url
 
@@ -27,16 +39,16 @@ else:
     basestring = basestring
 
 
-def _fetch_boards_metadata(url_generator):
+def _fetch_boards_metadata(url_generator, session=None):
     if not _metadata:
-        resp = requests.get(url_generator.board_list())
+        resp = (session or requests).get(url_generator.board_list())
         resp.raise_for_status()
-        data = {entry['board']: entry for entry in resp.json()['boards']}
+        data = {entry['board']: entry for entry in loads(resp.content)['boards']}
         _metadata.update(data)
 
 
-def _get_board_metadata(url_generator, board, key):
-    _fetch_boards_metadata(url_generator)
+def _get_board_metadata(url_generator, board, key, session=None):
+    _fetch_boards_metadata(url_generator, session)
     return _metadata[board][key]
 
 
@@ -61,15 +73,50 @@ def get_all_boards(*args, **kwargs):
         dict of :class:`basc_py4chan.Board`: All boards.
     """
     # Use https based on how the Board class instances are to be instantiated
-    https = kwargs.get('https', args[1] if len(args) > 1 else False)
+    # (the positional arguments are those of Board after the board name)
+    https = kwargs.get('https', args[0] if len(args) > 0 else False)
 
     # Dummy URL generator, only used to generate the board list which doesn't
     # require a valid board name
     url_generator = Url(None, https)
-    _fetch_boards_metadata(url_generator)
+    _fetch_boards_metadata(url_generator, kwargs.get('session', args[1] if len(args) > 1 else None))
     return get_boards(_metadata.keys(), *args, **kwargs)
 
 
+# request headers that drop any conditional headers set on the session
+_UNCONDITIONAL = {'If-Modified-Since': None, 'If-None-Match': None}
+
+
+class ExpandResult(namedtuple('ExpandResult', 'thread_id thread error')):
+    """Outcome of fetching a single thread with :meth:`Board.iter_threads`.
+
+    Attributes:
+        thread_id (int): ID of the requested thread.
+        thread (:class:`basc_py4chan.Thread`): The thread, or None if it could not be fetched.
+        error (Exception): What went wrong, or None if the thread was fetched.
+        is_404 (bool): Whether the thread has 404'd.
+    """
+    __slots__ = ()
+
+    @property
+    def is_404(self):
+        response = getattr(self.error, 'response', None)
+        return response is not None and response.status_code == 404
+
+
+class SyncResult(namedtuple('SyncResult', 'new changed pruned failed')):
+    """Outcome of an incremental :meth:`Board.sync`.
+
+    Attributes:
+        new (list of :class:`basc_py4chan.Thread`): Threads seen for the first time.
+        changed (list of :class:`basc_py4chan.Thread`): Cached threads that were updated.
+        pruned (list of :class:`basc_py4chan.Thread`): Cached threads that dropped off
+            the board or 404'd, and were removed from the cache.
+        failed (list of :class:`basc_py4chan.board.ExpandResult`): Threads that could not be fetched.
+    """
+    __slots__ = ()
+
+
 class Board(object):
     """Represents a 4chan board.
 
@@ -81,31 +128,97 @@ class Board(object):
         page_count (int): How many pages this board has.
         threads_per_page (int): How many threads there are on each page.
     """
-    def __init__(self, board_name, https=False, session=None):
+    _thread_class = Thread
+
+    def __init__(self, board_name, https=False, session=None, thread_cache=None,
+                 compact_posts=False, keep_raw=True, stream_json=False):
         """Creates a :mod:`basc_py4chan.Board` object.
 
         Args:
             board_name (string): Name of the board, such as "tg" or "etc".
             https (bool): Whether to use a secure connection to 4chan.
             session: Existing requests.session object to use instead of our current one.
+            thread_cache: Mapping to cache threads in, such as a bounded
+                :class:`basc_py4chan.cache.ThreadCache`. Defaults to a plain dict.
+            compact_posts (bool): Store replies as :class:`basc_py4chan.post.CompactPost`
+                objects, which use much less memory than :class:`basc_py4chan.Post`.
+            keep_raw (bool): Whether compact posts keep the raw JSON of the post.
+                Dropping it saves the most memory.
+            stream_json (bool): Decode threads and posts one at a time as
+                responses arrive, instead of loading whole responses into memory.
         """
         self._board_name = board_name
         self._https = https
         self._protocol = 'https://' if https else 'http://'
-        self._url = Url(board_name=board_name, https=self._https)
+        self._url = Url.shared(board_name, https=self._https)
 
         self._requests_session = session or requests.session()
         self._requests_session.headers['User-Agent'] = 'py-4chan/%s' % __version__
 
-        self._thread_cache = {}
+        self._thread_cache = {} if thread_cache is None else thread_cache
+
+        if compact_posts:
+            self._post_factory = partial(CompactPost, keep_raw=keep_raw)
+        else:
+            self._post_factory = Post
+
+        self._lazy_posts = keep_raw or not compact_posts
+        self._stream_json = stream_json
+
+        # listing URL -> (Last-Modified, the listing's JSON as parsed)
+        self._listings = {}
 
     def _get_metadata(self, key):
-        return _get_board_metadata(self._url, self._board_name, key)
+        return _get_board_metadata(self._url, self._board_name, key, self._requests_session)
+
+    def _get(self, url, headers=None):
+        return self._requests_session.get(url, headers=headers, stream=self._stream_json)
 
     def _get_json(self, url):
         res = self._requests_session.get(url)
         res.raise_for_status()
-        return res.json()
+        return loads(res.content)
+
+    def _listing_headers(self, url):
+        if url in self._listings:
+            return {'If-Modified-Since': self._listings[url][0]}
+        return None
+
+    def _remember_listing(self, url, last_modified, listing):
+        if last_modified:
+            self._listings[url] = (last_modified, listing)
+
+    def _get_listing(self, url, parse, build=list):
+        # a listing that hasn't changed since we last saw it isn't downloaded or
+        # parsed again. Only its JSON is kept, and built into a fresh result each
+        # time, so threads are looked up in the cache rather than held here.
+        res = self._get(url, headers=self._listing_headers(url))
+        if res.status_code == 304:
+            res.close()
+            if url in self._listings:
+                return build(self._listings[url][1])
+            # not modified since a copy we don't have, which headers set on the
+            # session must have asked about; ask for the listing outright
+            res = self._get(url, headers=_UNCONDITIONAL)
+            if res.status_code == 304:
+                res.close()
+                raise requests.HTTPError('304 Not Modified, and no copy cached: %s' % url,
+                                         response=res)
+        res.raise_for_status()
+        listing = parse(res)
+        self._remember_listing(url, res.headers.get('Last-Modified'), listing)
+        return build(listing)
+
+    def _get_json_listing(self, url, parse):
+        # _get_listing(), for listings that are parsed from their JSON; the
+        # async board gets the JSON already decoded, and overrides this
+        return self._get_listing(url, lambda res: parse(loads(res.content)))
+
+    def _response_posts(self, res):
+        # posts of a thread response, decoded one at a time when streaming
+        if self._stream_json:
+            return iter_items(res.iter_content(CHUNK_SIZE), 2)
+        return loads(res.content)['posts']
 
     def get_thread(self, thread_id, update_if_cached=True, raise_404=False):
         """Get a thread from 4chan via 4chan API.
@@ -120,12 +233,15 @@ class Board(object):
         """
         # see if already cached
         cached_thread = self._thread_cache.get(thread_id)
-        if cached_thread:
+        if cached_thread is not None:
             if update_if_cached:
                 cached_thread.update()
+                # died since it was cached; fail like an uncached thread would
+                if raise_404 and cached_thread.is_404:
+                    raise cached_thread._update_error
             return cached_thread
 
-        res = self._requests_session.get(
+        res = self._get(
             self._url.thread_api_url(
                 thread_id = thread_id
                 )
@@ -135,9 +251,11 @@ class Board(object):
         if raise_404:
             res.raise_for_status()
         elif not res.ok:
+            # a streamed response holds its connection until closed
+            res.close()
             return None
 
-        thread = Thread._from_request(self, res, thread_id)
+        thread = self._thread_class._from_request(self, res, thread_id)
         self._thread_cache[thread_id] = thread
 
         return thread
@@ -157,32 +275,42 @@ class Board(object):
                 )
         ).ok
 
+    @staticmethod
+    def _catalog_thread(thread):
+        return {'posts': [thread] + thread.pop('last_replies', [])}
+
     def _catalog_to_threads(self, json):
-        threads_json = [thread for page in json for thread in page['threads']]
-        thread_list = [{'posts': [thread] + thread.get('last_replies', [])}
-                       for thread in threads_json]
+        return [self._catalog_thread(thread) for page in json for thread in page['threads']]
 
-        for thread in thread_list:
-            thread['posts'][0].pop('last_replies', None)
+    def _request_threads(self, url):
+        return self._get_listing(url, partial(self._thread_list_from_response, url),
+                                 self._threads_from_list)
 
-        return thread_list
+    def _thread_list_from_response(self, url, res):
+        if not self._stream_json:
+            return self._thread_list_from_json(url, loads(res.content))
 
-    def _request_threads(self, url):
-        json = self._get_json(url)
+        chunks = res.iter_content(CHUNK_SIZE)
+        if url == self._url.catalog():
+            # [{"page": 1, "threads": [...]}, ...]
+            return [self._catalog_thread(thread) for thread in iter_items(chunks, 3)]
+        # {"threads": [{"posts": [...]}, ...]}
+        return list(iter_items(chunks, 2))
 
+    def _thread_list_from_json(self, url, json):
         if url == self._url.catalog():
-            thread_list = self._catalog_to_threads(json)
-        else:
-            thread_list = json['threads']
+            return self._catalog_to_threads(json)
+        return json['threads']
 
+    def _threads_from_list(self, thread_list):
         threads = []
         for thread_json in thread_list:
             id = thread_json['posts'][0]['no']
-            if id in self._thread_cache:
-                thread = self._thread_cache[id]
+            thread = self._thread_cache.get(id)
+            if thread is not None:
                 thread.want_update = True
             else:
-                thread = Thread._from_json(thread_json, self)
+                thread = self._thread_class._from_json(thread_json, self)
                 self._thread_cache[thread.id] = thread
 
             threads.append(thread)
@@ -213,10 +341,17 @@ class Board(object):
         Returns:
             list of ints: List of IDs of every thread on this board.
         """
-        json = self._get_json(self._url.thread_list())
-        return [thread['no'] for page in json for thread in page['threads']]
+        return [id for id, last_modified in self._get_thread_listing()]
+
+    def _get_thread_listing(self):
+        return self._get_json_listing(self._url.thread_list(), self._thread_listing_from_json)
+
+    @staticmethod
+    def _thread_listing_from_json(json):
+        return [(thread['no'], thread['last_modified'])
+                for page in json for thread in page['threads']]
 
-    def get_all_threads(self, expand=False):
+    def get_all_threads(self, expand=False, workers=None):
         """Return every thread on this board.
 
         If not expanded, result is same as get_threads run across all board pages,
@@ -230,6 +365,8 @@ class Board(object):
         Args:
             expand (bool): Whether to download every single post of every thread.
                 If enabled, this option can be very slow and bandwidth-intensive.
+            workers (int): When expanding, fetch this many threads at once
+                using :meth:`iter_threads`, instead of one after another.
 
         Returns:
             list of :mod:`basc_py4chan.Thread`: List of Thread objects representing every thread on this board.
@@ -238,9 +375,218 @@ class Board(object):
             return self._request_threads(self._url.catalog())
 
         thread_ids = self.get_all_thread_ids()
-        threads = [self.get_thread(id, raise_404=False) for id in thread_ids]
+        if workers:
+            results = {result.thread_id: result.thread
+                       for result in self.iter_threads(thread_ids, workers=workers)}
+            threads = [results[id] for id in thread_ids]
+        else:
+            threads = [self.get_thread(id, raise_404=False) for id in thread_ids]
+
+        # threads without replies are falsy, so test for the threads that 404'd
+        return [thread for thread in threads if thread is not None]
+
+    def iter_threads(self, thread_ids=None, workers=8, update_if_cached=True, priority=None):
+        """Fetch many threads concurrently, yielding each one as soon as it arrives.
+
+        Threads are fetched by a pool of worker threads sharing this board's
+        session, so at most ``workers`` requests are in flight to the API host
+        at any time. A thread that 404s or fails to download does not stop the
+        batch; it is reported in its own result instead. That includes cached
+        threads whose update fails, unless ``update_if_cached`` is off.
+
+        Args:
+            thread_ids (list of ints): IDs of the threads to fetch. Defaults to
+                every thread on this board.
+            workers (int): Maximum number of requests in flight at once.
+            update_if_cached (bool): Whether cached threads should be updated.
+            priority (int): Priority of the requests, see
+                :mod:`basc_py4chan.scheduler`. Defaults to the caller's.
+
+        Returns:
+            iterator of :class:`basc_py4chan.board.ExpandResult`: One result per
+            thread, in the order the requests complete.
+        """
+        if thread_ids is None:
+            thread_ids = self.get_all_thread_ids()
+
+        # workers send their requests with the caller's priority
+        if priority is None:
+            priority = current_priority()
+
+        def fetch(id):
+            with request_priority(priority):
+                return self._fetch_thread(id, update_if_cached)
+
+        self._ensure_pool_size(workers)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = {executor.submit(fetch, id): id for id in thread_ids}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield ExpandResult(futures[future], future.result(), None)
+                except Exception as e:
+                    yield ExpandResult(futures[future], None, e)
+        finally:
+            # the caller stopped early, don't fetch threads nobody wants
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _fetch_thread(self, thread_id, update_if_cached=True):
+        # get_thread(), raising on any failure, whether the thread was cached or not
+        thread = self.get_thread(thread_id, update_if_cached, raise_404=True)
+        if update_if_cached and thread._update_error is not None:
+            raise thread._update_error
+        return thread
+
+    def _ensure_pool_size(self, size):
+        # requests keeps at most 10 connections per host by default; with more
+        # workers than that, connections would be opened and thrown away
+        for adapter in self._requests_session.adapters.values():
+            if getattr(adapter, '_pool_maxsize', size) < size:
+                adapter.poolmanager.clear()
+                adapter.init_poolmanager(adapter._pool_connections, size, block=adapter._pool_block)
+
+    def get_archived_thread_ids(self):
+        """Return the ID of every thread in this board's archive.
 
-        return filter(None, threads)
+        Not every board has an archive; for those that don't, this raises
+        requests' HTTPError.
+
+        Returns:
+            list of ints: IDs of the archived threads, oldest first.
+        """
+        return self._get_json_listing(self._url.archived_thread_list(), list)
+
+    def backfill_archive(self, skip=(), progress_file=None, workers=8, keep_cached=False,
+                         priority=PRIORITY_BACKFILL):
+        """Fetch every archived thread not held yet, several at a time.
+
+        Meant for catching up on threads missed while a scraper was down:
+        threads already stored elsewhere are passed as ``skip``, and with a
+        ``progress_file`` the IDs of fetched threads are written down as they
+        complete, so an interrupted backfill resumes where it stopped.
+
+        Args:
+            skip: Container of thread IDs not to fetch, such as those already
+                in a local store.
+            progress_file (string): File recording the IDs of threads already
+                fetched, one per line. Created if missing.
+            workers (int): Maximum number of requests in flight at once.
+            keep_cached (bool): Whether to keep fetched threads in our cache.
+                By default each is dropped once the caller moves on from it,
+                so a large backfill doesn't fill the cache. Threads that were
+                cached before the backfill began are kept either way.
+            priority (int): Priority of the requests, see :mod:`basc_py4chan.scheduler`.
+                Defaults to backfill, behind live updates.
+
+        Returns:
+            iterator of :class:`basc_py4chan.board.ExpandResult`: One result per
+            thread fetched, in the order the requests complete.
+        """
+        with request_priority(priority):
+            archived = self.get_archived_thread_ids()
+
+        wanted, cached_before = self._backfill_wanted(archived, skip, progress_file)
+        if not wanted:
+            return
+
+        progress = open(progress_file, 'a') if progress_file is not None else None
+        try:
+            for result in self.iter_threads(wanted, workers=workers, update_if_cached=False,
+                                            priority=priority):
+                yield result
+                self._backfill_done(result, progress, keep_cached, cached_before)
+        finally:
+            if progress is not None:
+                progress.close()
+
+    def _backfill_wanted(self, archived, skip, progress_file):
+        # (IDs of the archived threads to fetch, those of them already cached)
+        done = set()
+        if progress_file is not None and os.path.exists(progress_file):
+            with open(progress_file) as fd:
+                done.update(int(line) for line in fd if line.strip())
+
+        wanted = [id for id in archived if id not in done and id not in skip]
+        # only drop what the backfill itself added to the cache
+        cached_before = set(id for id in wanted if id in self._thread_cache)
+        return wanted, cached_before
+
+    def _backfill_done(self, result, progress, keep_cached, cached_before):
+        # a 404 means the thread has left the archive, it won't come back
+        if progress is not None and (result.thread is not None or result.is_404):
+            progress.write('%i\n' % result.thread_id)
+            progress.flush()
+        if not keep_cached and result.thread_id not in cached_before:
+            self._thread_cache.pop(result.thread_id, None)
+
+    def sync(self, workers=None):
+        """Bring the cache up to date with the board, fetching only what changed.
+
+        Downloads the thread listing once and compares the ``last_modified`` time
+        of every thread on it against the cache. Only threads that are new or
+        have changed since the last sync are requested, and cached threads that
+        are no longer on the board are pruned from the cache.
+
+        Args:
+            workers (int): Fetch this many threads at once using
+                :meth:`iter_threads`, instead of one after another.
+
+        Returns:
+            :class:`basc_py4chan.board.SyncResult`: Which threads are new, changed or pruned.
+        """
+        listing = dict(self._get_thread_listing())
+        wanted, cached, previous = self._sync_wanted(listing)
+
+        if workers:
+            results = self.iter_threads(wanted, workers=workers)
+        else:
+            results = (self._sync_thread(id) for id in wanted)
+
+        return self._sync_result(listing, cached, previous, results)
+
+    def _sync_wanted(self, listing):
+        # (IDs to fetch, cached threads among them, and their Last-Modified dates)
+        wanted = [id for id, last_modified in listing.items()
+                  if id not in self._thread_cache
+                  or self._thread_cache[id]._listing_modified != last_modified]
+        cached = dict((id, self._thread_cache[id]) for id in wanted if id in self._thread_cache)
+        previous = dict((id, thread._last_modified) for id, thread in cached.items())
+        return wanted, cached, previous
+
+    def _sync_result(self, listing, cached, previous, results):
+        new, changed, pruned, failed = [], [], [], []
+        for result in results:
+            thread = result.thread
+            if thread is None:
+                # a cached thread that died since the listing is as good as pruned;
+                # a failed update leaves it to be tried again next time
+                if result.is_404 and result.thread_id in cached:
+                    pruned.append(cached[result.thread_id])
+                else:
+                    failed.append(result)
+                continue
+
+            # fetched, even if unchanged (304), so skip it until the listing moves on
+            thread._listing_modified = listing[result.thread_id]
+            if result.thread_id not in cached:
+                new.append(thread)
+            elif thread._last_modified != previous[result.thread_id]:
+                changed.append(thread)
+
+        gone = [thread for id, thread in tuple(self._thread_cache.items()) if id not in listing]
+        for thread in gone:
+            self._thread_cache.pop(thread.id, None)
+        pruned.extend(gone)
+
+        return SyncResult(new, changed, pruned, failed)
+
+    def _sync_thread(self, thread_id):
+        try:
+            return ExpandResult(thread_id, self._fetch_thread(thread_id), None)
+        except Exception as e:
+            return ExpandResult(thread_id, None, e)
 
     def refresh_cache(self, if_want_update=False):
         """Update all threads currently stored in our cache."""
@@ -250,9 +596,82 @@ class Board(object):
                     continue
             thread.update()
 
+    def most_replied(self, n=10):
+        """Returns the ``n`` most quoted posts across every thread in our cache.
+
+        Returns:
+            list of (:class:`basc_py4chan.Thread`, int, int): (thread, post ID,
+            number of posts quoting it) tuples, most quoted first.
+        """
+        candidates = ((thread, post_id, count)
+                      for thread in tuple(self._thread_cache.values())
+                      for post_id, count in thread.most_replied(n))
+        return heapq.nlargest(n, candidates, key=itemgetter(2))
+
+    def to_columns(self, use_numpy=None):
+        """Returns the posts of every thread in our cache as a dict of columns.
+
+        See :func:`basc_py4chan.columnar.threads_to_columns`.
+        """
+        return threads_to_columns(self._thread_cache.values(), use_numpy)
+
     def clear_cache(self):
         """Remove everything currently stored in our cache."""
         self._thread_cache.clear()
+        self._listings.clear()
+
+    def save_snapshot(self, path, level=1):
+        """Save every thread in our cache to a snapshot file.
+
+        The file holds each thread's posts and conditional-request state,
+        compressed, so :meth:`load_snapshot` can restore the cache after a
+        restart without fetching every thread again. It is replaced in one
+        step, so a crash while saving leaves the previous snapshot intact.
+
+        Args:
+            path (string): File to write.
+            level (int): zlib compression level.
+
+        Returns:
+            int: Number of threads saved.
+        """
+        threads = [thread for thread in tuple(self._thread_cache.values())
+                   if thread.topic is not None]
+        data = snapshot.dumps(self._board_name, [thread._snapshot() for thread in threads], level)
+        snapshot.write(path, data)
+        return len(threads)
+
+    def load_snapshot(self, path):
+        """Restore threads saved by :meth:`save_snapshot` into our cache.
+
+        Restored threads pick up where they left off: :meth:`refresh_cache`
+        or :meth:`basc_py4chan.Thread.update` sends If-Modified-Since and only
+        fetches the posts made since. Threads already in the cache are kept,
+        not replaced by their older saved copies.
+
+        Args:
+            path (string): Snapshot file.
+
+        Returns:
+            list of :class:`basc_py4chan.Thread`: The threads restored.
+
+        Raises:
+            ValueError: The snapshot is of another board, or unreadable, see
+                :func:`basc_py4chan.snapshot.loads`.
+        """
+        with open(path, 'rb') as f:
+            board_name, states = snapshot.loads(f.read())
+        if board_name != self._board_name:
+            raise ValueError('snapshot is of /%s/, not /%s/' % (board_name, self._board_name))
+
+        threads = []
+        for state in states:
+            if state.thread_id in self._thread_cache:
+                continue
+            thread = self._thread_class._from_snapshot(self, state)
+            self._thread_cache[thread.id] = thread
+            threads.append(thread)
+        return threads
 
     @property
     def name(self):
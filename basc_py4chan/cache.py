@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Bounded thread cache for :class:`basc_py4chan.Board`."""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    # Python 2
+    from collections import MutableMapping
+
+
+def estimate_thread_size(thread):
+    """Returns a rough estimate of the memory used by a thread, in bytes.
+
+    Counts the post objects and the JSON data behind them. Strings shared
+    between posts are counted once per post, so this errs on the high side.
+    """
+    size = sys.getsizeof(thread) + sys.getsizeof(thread.replies)
+    # replies that haven't been accessed yet are still plain JSON
+    replies = thread.replies.stored() if hasattr(thread.replies, 'stored') else thread.replies
+    for post in [thread.topic] + list(replies):
+        if isinstance(post, dict):
+            data = post
+        else:
+            size += sys.getsizeof(post)
+            data = post._data
+        size += sys.getsizeof(data)
+        for value in data.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class ThreadCache(MutableMapping):
+    """Thread cache with LRU and TTL eviction, for long-running scrapers.
+
+    Threads are kept in least-recently-used order. Once the cache holds more
+    than ``max_threads`` threads or an estimated ``max_bytes`` bytes, the least
+    recently used threads are evicted. Threads not used for ``ttl`` seconds are
+    evicted as well. With no limits, this behaves like the plain dict
+    :class:`basc_py4chan.Board` uses by default, but still keeps statistics.
+
+    Pass it to a board with ``Board('g', thread_cache=ThreadCache(max_threads=500))``.
+    It is safe to share between threads, such as the workers of
+    :meth:`basc_py4chan.Board.iter_threads`.
+
+    Attributes:
+        max_threads (int): Maximum number of threads to keep, or None.
+        max_bytes (int): Maximum estimated size of all threads, or None.
+        ttl (float): Seconds a thread may go unused before it is evicted, or None.
+        hits (int): Lookups that found a thread.
+        misses (int): Lookups that did not find a thread.
+        evictions (int): Threads evicted because of a limit or the TTL.
+        nbytes (int): Estimated size of all cached threads, in bytes.
+    """
+    def __init__(self, max_threads=None, max_bytes=None, ttl=None, clock=time.time):
+        """Creates a :class:`basc_py4chan.cache.ThreadCache` object.
+
+        Args:
+            max_threads (int): Maximum number of threads to keep.
+            max_bytes (int): Maximum estimated size of all threads, in bytes.
+            ttl (float): Seconds a thread may go unused before it is evicted.
+            clock: Function returning the current time in seconds.
+        """
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        # re-entrant, since evicting runs inside other operations
+        self._lock = threading.RLock()
+
+        # thread id -> [thread, reply count when measured, size, last used]
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _measure(self, entry, force=False):
+        thread = entry[0]
+        if force or entry[1] != len(thread.replies):
+            size = estimate_thread_size(thread)
+            self.nbytes += size - entry[2]
+            entry[1] = len(thread.replies)
+            entry[2] = size
+
+    def _touch(self, id, entry):
+        entry[3] = self._clock()
+        # move to the most recently used end
+        del self._entries[id]
+        self._entries[id] = entry
+
+    def _expired(self, entry):
+        return self.ttl is not None and self._clock() - entry[3] > self.ttl
+
+    def _remove(self, id):
+        entry = self._entries.pop(id)
+        self.nbytes -= entry[2]
+        return entry
+
+    def _evict(self):
+        self.purge()
+        while self._entries and (
+                (self.max_threads is not None and len(self._entries) > self.max_threads) or
+                (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def purge(self):
+        """Evict every thread that has outlived the TTL."""
+        if self.ttl is None:
+            return
+        with self._lock:
+            # least recently used first, so stop at the first live entry
+            for id in list(self._entries):
+                if not self._expired(self._entries[id]):
+                    break
+                self._remove(id)
+                self.evictions += 1
+
+    def thread_updated(self, thread):
+        """Measure a cached thread again after its posts changed.
+
+        Threads call this after every update, however it was made, such as
+        by :meth:`basc_py4chan.Board.refresh_cache`, so threads that grow
+        in place still count against ``max_bytes``. Threads are evicted if
+        the cache has outgrown it.
+        """
+        with self._lock:
+            entry = self._entries.get(thread.id)
+            if entry is None or entry[0] is not thread:
+                return
+            self._measure(entry, force=True)
+            if self.max_bytes is not None and self.nbytes > self.max_bytes:
+                self._evict()
+
+    def __getitem__(self, id):
+        with self._lock:
+            entry = self._entries.get(id)
+            if entry is None or self._expired(entry):
+                if entry is not None:
+                    self._remove(id)
+                    self.evictions += 1
+                self.misses += 1
+                raise KeyError(id)
+
+            self.hits += 1
+            self._touch(id, entry)
+            self._measure(entry)
+            if self.max_bytes is not None and self.nbytes > self.max_bytes:
+                self._evict()
+            return entry[0]
+
+    def __setitem__(self, id, thread):
+        with self._lock:
+            if id in self._entries:
+                self._remove(id)
+            entry = [thread, -1, 0, self._clock()]
+            self._entries[id] = entry
+            self._measure(entry)
+            self._evict()
+
+    def __delitem__(self, id):
+        with self._lock:
+            self._remove(id)
+
+    def __contains__(self, id):
+        entry = self._entries.get(id)
+        return entry is not None and not self._expired(entry)
+
+    def _live(self):
+        # (id, entry) of every thread that hasn't outlived the TTL
+        with self._lock:
+            return [(id, entry) for id, entry in self._entries.items()
+                    if not self._expired(entry)]
+
+    def __iter__(self):
+        return iter([id for id, entry in self._live()])
+
+    def __len__(self):
+        if self.ttl is None:
+            return len(self._entries)
+        return len(self._live())
+
+    def pop(self, id, *default):
+        with self._lock:
+            if id in self._entries:
+                return self._remove(id)[0]
+        if default:
+            return default[0]
+        raise KeyError(id)
+
+    def values(self):
+        return [entry[0] for id, entry in self._live()]
+
+    def items(self):
+        return [(id, entry[0]) for id, entry in self._live()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    @property
+    def stats(self):
+        """dict: Current size and hit/miss/eviction counters."""
+        return {
+            'threads': len(self._entries),
+            'bytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __repr__(self):
+        return '<ThreadCache %i threads, ~%i bytes>' % (len(self._entries), self.nbytes)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Columnar export of posts, for analytics.
+
+Builds one array per field straight from the JSON the threads were parsed
+from, without creating :class:`basc_py4chan.Post` objects. Uses NumPy when it
+is installed, and the standard library :mod:`array` module otherwise.
+"""
+
+import sys
+from array import array
+from base64 import b64decode
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# 'q' (64-bit) was added in Python 3.3
+_INT_TYPECODE = 'q' if sys.version_info >= (3, 3) else 'l'
+
+# integer columns, and the JSON key each is read from
+INT_COLUMNS = (
+    ('no', 'no'),
+    ('resto', 'resto'),
+    ('time', 'time'),
+    ('replies', 'replies'),
+    ('images', 'images'),
+    ('fsize', 'fsize'),
+    ('w', 'w'),
+    ('h', 'h'),
+    ('tn_w', 'tn_w'),
+    ('tn_h', 'tn_h'),
+)
+
+COLUMNS = ('thread',) + tuple(name for name, key in INT_COLUMNS) + (
+    'has_file', 'filedeleted', 'md5', 'ext')
+
+
+def threads_to_columns(threads, use_numpy=None):
+    """Returns every post in the given threads as a dict of columns.
+
+    Columns are ``thread`` (ID of the thread the post is in), ``no``, ``resto``,
+    ``time``, ``replies`` and ``images`` (only set on the OP), ``fsize``, ``w``,
+    ``h``, ``tn_w``, ``tn_h``, ``has_file``, ``filedeleted``, ``md5`` (the raw
+    16-byte digest) and ``ext``. Missing values are 0, or empty for strings.
+
+    Args:
+        threads (list of :class:`basc_py4chan.Thread`): Threads to export.
+        use_numpy (bool): Whether to build NumPy arrays. Defaults to using NumPy
+            if it is installed.
+
+    Returns:
+        dict: Column name to NumPy array, or to :class:`array.array` (lists of
+        bytes/strings for ``md5`` and ``ext``) without NumPy.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ImportError('NumPy is not installed')
+
+    thread_ids = []
+    ints = [[] for column in INT_COLUMNS]
+    has_file = []
+    filedeleted = []
+    md5 = []
+    ext = []
+
+    keys = [key for name, key in INT_COLUMNS]
+    for thread in threads:
+        thread_id = thread.id
+        for data in thread._post_json():
+            thread_ids.append(thread_id)
+            for column, key in zip(ints, keys):
+                column.append(data.get(key, 0))
+            # the same test as Post.has_file
+            has_file.append(1 if 'filename' in data else 0)
+            md5.append(b64decode(data['md5']) if 'md5' in data else b'')
+            filedeleted.append(data.get('filedeleted', 0))
+            ext.append(data.get('ext', ''))
+
+    if use_numpy:
+        columns = {'thread': numpy.array(thread_ids, dtype=numpy.int64)}
+        for (name, key), values in zip(INT_COLUMNS, ints):
+            columns[name] = numpy.array(values, dtype=numpy.int64)
+        columns['has_file'] = numpy.array(has_file, dtype=numpy.bool_)
+        columns['filedeleted'] = numpy.array(filedeleted, dtype=numpy.bool_)
+        # fixed-width string columns
+        columns['md5'] = numpy.array(md5, dtype='S16')
+        columns['ext'] = numpy.array(ext, dtype=numpy.str_)
+    else:
+        columns = {'thread': array(_INT_TYPECODE, thread_ids)}
+        for (name, key), values in zip(INT_COLUMNS, ints):
+            columns[name] = array(_INT_TYPECODE, values)
+        columns['has_file'] = array('b', has_file)
+        columns['filedeleted'] = array('b', filedeleted)
+        columns['md5'] = md5
+        columns['ext'] = ext
+
+    return columns
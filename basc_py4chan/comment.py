@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Structured parsing of 4chan comment HTML.
+
+:func:`parse_comment` walks a comment's tags once, from start to end, and
+splits it into typed text segments while collecting the posts it quotes,
+links to other threads and boards, greentext lines, spoilers and code blocks.
+"""
+
+import re
+from collections import namedtuple
+
+from .util import _unescape
+
+# segment kinds
+TEXT = 'text'
+QUOTELINK = 'quotelink'      # >>123, a post in the same thread
+CROSSLINK = 'crosslink'      # >>123 in another thread, or >>>/g/
+DEADLINK = 'deadlink'        # >>123 to a post that no longer exists
+GREENTEXT = 'greentext'
+SPOILER = 'spoiler'
+CODE = 'code'
+
+_TAG = re.compile(r'<(/?)([a-z]+)([^>]*)>')
+_CLASS = re.compile(r'class="([^"]*)"')
+_HREF = re.compile(r'href="([^"]*)"')
+_QUOTE_HREF = re.compile(r'^#p(\d+)$')
+# /g/thread/123#p456, /g/thread/123, //boards.4chan.org/g/catalog#s=x, /g/
+_CROSS_HREF = re.compile(r'^(?://[^/]+)?/(\w+)/(?:thread/(\d+)(?:#p(\d+))?)?')
+_DEAD_TEXT = re.compile(r'^>>(\d+)$')
+
+
+class Segment(namedtuple('Segment', 'kind text target')):
+    """A run of comment text sharing one kind of markup.
+
+    Attributes:
+        kind (string): ``'text'``, ``'quotelink'``, ``'crosslink'``,
+            ``'deadlink'``, ``'greentext'``, ``'spoiler'`` or ``'code'``.
+        text (string): Plaintext of the run.
+        target: The quoted post ID of a quotelink, the
+            :class:`CrossReference` of a crosslink, or None.
+    """
+    __slots__ = ()
+
+
+class CrossReference(namedtuple('CrossReference', 'board thread_id post_id')):
+    """A link from a comment to another thread or board.
+
+    Attributes:
+        board (string): Board linked to, such as ``'g'``.
+        thread_id (int): Thread linked to, or None for a link to a whole board.
+        post_id (int): Post linked to, or None for a link to a whole board.
+    """
+    __slots__ = ()
+
+
+class ParsedComment(object):
+    """A comment, split into segments, with its references pulled out.
+
+    Attributes:
+        segments (list of :class:`Segment`): The comment, in order.
+        text (string): Plaintext of the whole comment.
+        quoted_ids (list of int): Posts in the same thread that are quoted, in order.
+        cross_references (list of :class:`CrossReference`): Links to other threads and boards.
+        dead_ids (list of int): Quoted posts that have been deleted.
+        greentext (list of string): Greentext lines, including the leading ``>``.
+        spoilers (list of string): Spoilered text.
+        code (list of string): Code blocks.
+    """
+    __slots__ = ('segments', 'quoted_ids', 'cross_references', 'dead_ids',
+                 'greentext', 'spoilers', 'code')
+
+    def __init__(self):
+        self.segments = []
+        self.quoted_ids = []
+        self.cross_references = []
+        self.dead_ids = []
+        self.greentext = []
+        self.spoilers = []
+        self.code = []
+
+    @property
+    def text(self):
+        return ''.join(segment.text for segment in self.segments)
+
+    def __repr__(self):
+        return '<ParsedComment %i segments, quotes %r>' % (len(self.segments), self.quoted_ids)
+
+
+def _classify(name, attrs):
+    # (kind, target) of an opening tag, or (None, None) for plain formatting
+    if name == 'a':
+        match = _HREF.search(attrs)
+        href = match.group(1) if match else ''
+        if href.startswith('#p'):
+            match = _QUOTE_HREF.match(href)
+            # a malformed quotelink is kept as plain text
+            return (QUOTELINK, int(match.group(1))) if match else (None, None)
+        match = _CROSS_HREF.match(href)
+        if match:
+            board, thread_id, post_id = match.groups()
+            thread_id = int(thread_id) if thread_id else None
+            # a link to a thread points at its OP
+            post_id = int(post_id) if post_id else thread_id
+            return CROSSLINK, CrossReference(board, thread_id, post_id)
+    elif name == 'span':
+        match = _CLASS.search(attrs)
+        css = match.group(1) if match else ''
+        if css == 'quote':
+            return GREENTEXT, None
+        if css == 'deadlink':
+            return DEADLINK, None
+    elif name == 's':
+        return SPOILER, None
+    elif name == 'pre':
+        return CODE, None
+    return None, None
+
+
+def parse_comment(html):
+    """Parse a comment's HTML in one pass over its tags.
+
+    Args:
+        html (string): The comment, as in :attr:`basc_py4chan.Post.html_comment`.
+
+    Returns:
+        :class:`ParsedComment`: The comment's segments and references.
+    """
+    parsed = ParsedComment()
+    segments = parsed.segments
+    # open tags: [name, kind, target, text pieces]
+    stack = []
+    kind, target = TEXT, None
+
+    def emit(text):
+        if '&' in text:
+            text = _unescape(text)
+        for element in stack:
+            if element[1] is not None:
+                element[3].append(text)
+        if segments:
+            last = segments[-1]
+            if last[0] == kind and last[2] == target and kind != QUOTELINK:
+                segments[-1] = Segment(kind, last[1] + text, target)
+                return
+        segments.append(Segment(kind, text, target))
+
+    pos = 0
+    for match in _TAG.finditer(html):
+        start = match.start()
+        if start > pos:
+            emit(html[pos:start])
+        pos = match.end()
+        closing, name, attrs = match.groups()
+
+        if name == 'br':
+            emit('\n')
+        elif name == 'wbr':
+            continue
+        elif not closing:
+            element_kind, element_target = _classify(name, attrs)
+            stack.append([name, element_kind, element_target, []])
+            if element_kind is not None:
+                kind, target = element_kind, element_target
+                if kind == QUOTELINK:
+                    parsed.quoted_ids.append(target)
+                elif kind == CROSSLINK:
+                    parsed.cross_references.append(target)
+        elif any(element[0] == name for element in stack):
+            # close the innermost matching tag, and anything left open inside it
+            while True:
+                element = stack.pop()
+                text = ''.join(element[3])
+                if element[1] == GREENTEXT:
+                    parsed.greentext.append(text)
+                elif element[1] == SPOILER:
+                    parsed.spoilers.append(text)
+                elif element[1] == CODE:
+                    parsed.code.append(text)
+                elif element[1] == DEADLINK:
+                    dead = _DEAD_TEXT.match(text)
+                    if dead:
+                        parsed.dead_ids.append(int(dead.group(1)))
+                if element[0] == name:
+                    break
+
+            kind, target = TEXT, None
+            for element in reversed(stack):
+                if element[1] is not None:
+                    kind, target = element[1], element[2]
+                    break
+
+    if pos < len(html):
+        emit(html[pos:])
+    return parsed
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Crawling many boards at once, across a pool of processes.
+
+A single process spends most of a big crawl decoding JSON and building
+posts. :class:`ShardedCrawler` splits the work, a board or a run of thread
+IDs at a time, across worker processes, each with its own session. Workers send their threads back as snapshots (see
+:mod:`basc_py4chan.snapshot`), which the parent restores cheaply and passes
+on to a sink such as :class:`basc_py4chan.storage.SQLiteArchive`.
+"""
+
+import itertools
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.managers import BaseManager
+
+from .board import Board, get_all_boards
+from .scheduler import RequestScheduler, ScheduledSession
+from . import snapshot
+
+# crawl key -> session, in each worker process, so connections and the rate
+# budget carry over from one task of a crawl to the next
+_sessions = {}
+_crawl_keys = itertools.count()
+
+
+class _SchedulerManager(BaseManager):
+    """Serves one :class:`RequestScheduler` to every worker process of a crawl."""
+
+
+_SchedulerManager.register('RequestScheduler', RequestScheduler)
+
+
+def _worker_session(key, scheduler, host_rates):
+    session = _sessions.get(key)
+    if session is None:
+        if scheduler is None:
+            scheduler = RequestScheduler(host_rates)
+        session = _sessions[key] = ScheduledSession(scheduler)
+    return session
+
+
+def _crawl_task(key, board_name, thread_ids, https, scheduler, host_rates, fetch_workers):
+    # runs in a worker process: fetch the threads, and send them back as a snapshot
+    session = _worker_session(key, scheduler, host_rates)
+    board = Board(board_name, https=https, session=session)
+    threads = []
+    failed = []
+    for result in board.iter_threads(thread_ids, workers=fetch_workers):
+        if result.thread is not None:
+            threads.append(result.thread)
+        elif not result.is_404:
+            # exceptions may not survive pickling
+            failed.append((result.thread_id, repr(result.error)))
+    return snapshot.dumps(board_name, [thread._snapshot() for thread in threads]), failed
+
+
+class CrawlBatch(namedtuple('CrawlBatch', 'board threads failed')):
+    """Threads fetched by one task of a :class:`ShardedCrawler`.
+
+    Attributes:
+        board (:class:`basc_py4chan.Board`): Board the threads are on.
+        threads (list of :class:`basc_py4chan.Thread`): The threads fetched.
+            Threads that 404'd while the task ran are left out.
+        failed (list of (int, string)): (thread ID, error) of each thread that
+            could not be fetched, or (None, error) if the whole task failed.
+    """
+    __slots__ = ()
+
+
+class ShardedCrawler(object):
+    """Fetches whole boards with a pool of worker processes.
+
+    Each task, a board or up to ``chunk_size`` of its threads, runs in a
+    worker process, which fetches its threads with ``fetch_workers`` requests
+    in flight and decodes them. The threads are rebuilt in the parent,
+    written to the sinks, and yielded in batches as tasks complete::
+
+        archive = SQLiteArchive('4chan.sqlite3')
+        crawler = ShardedCrawler(processes=8, sinks=[archive])
+        for batch in crawler.crawl_boards():
+            print(batch.board.name, len(batch.threads))
+
+    Every worker process has its own session. By default all of them send
+    their requests through one :class:`basc_py4chan.scheduler.RequestScheduler`,
+    served from a manager process, so the crawl as a whole keeps to the
+    API's request rates, bursts and minimum intervals; pass ``host_rates``
+    to give every worker a scheduler and budget of its own instead, for
+    example when crawling through a mirror or caching proxy.
+
+    Threads are not added to the parent's board caches, so memory use stays
+    flat however much is crawled.
+
+    Attributes:
+        processes (int): Number of worker processes.
+        threads_crawled (int): Threads fetched so far.
+        posts_crawled (int): Posts in the threads fetched so far.
+    """
+    def __init__(self, processes=None, https=False, host_rates=None, fetch_workers=4,
+                 chunk_size=50, sinks=()):
+        """Creates a :class:`basc_py4chan.crawler.ShardedCrawler` object.
+
+        Args:
+            processes (int): Number of worker processes. Defaults to the number of CPUs.
+            https (bool): Whether to use a secure connection to 4chan.
+            host_rates (dict): Request rates of each worker process, in the form
+                taken by :class:`basc_py4chan.scheduler.RequestScheduler`. By
+                default, the workers share one scheduler with the default limits.
+            fetch_workers (int): Requests each worker process keeps in flight.
+            chunk_size (int): Most threads fetched by one task of :meth:`crawl_threads`.
+            sinks (list): Objects with a ``write_threads(threads)`` method, such as
+                :class:`basc_py4chan.storage.SQLiteArchive` and
+                :class:`basc_py4chan.search.SearchIndex`, every batch is written to.
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.https = https
+        self.host_rates = host_rates
+        self.fetch_workers = fetch_workers
+        self.chunk_size = chunk_size
+        self.sinks = list(sinks)
+        self.threads_crawled = 0
+        self.posts_crawled = 0
+        # board name -> Board the crawled threads are attached to
+        self._boards = {}
+
+    def _board(self, name):
+        if name not in self._boards:
+            self._boards[name] = Board(name, https=self.https)
+        return self._boards[name]
+
+    def _run(self, tasks):
+        # tasks: [(board name, thread IDs or None for every thread)]
+        key = (os.getpid(), next(_crawl_keys))
+        manager = scheduler = None
+        if self.host_rates is None:
+            manager = _SchedulerManager()
+            manager.start()
+            scheduler = manager.RequestScheduler()
+        executor = ProcessPoolExecutor(max_workers=self.processes)
+        futures = {}
+        try:
+            futures = dict((executor.submit(_crawl_task, key, board_name, thread_ids, self.https,
+                                            scheduler, self.host_rates, self.fetch_workers),
+                            board_name)
+                           for board_name, thread_ids in tasks)
+            for future in as_completed(futures):
+                board = self._board(futures[future])
+                try:
+                    data, failed = future.result()
+                except Exception as e:
+                    yield CrawlBatch(board, [], [(None, repr(e))])
+                    continue
+
+                board_name, states = snapshot.loads(data)
+                threads = [board._thread_class._from_snapshot(board, state) for state in states]
+                for sink in self.sinks:
+                    sink.write_threads(threads)
+                self.threads_crawled += len(threads)
+                self.posts_crawled += sum(len(state.posts) for state in states)
+                yield CrawlBatch(board, threads, failed)
+        finally:
+            # stops the tasks that haven't started, if the caller stops early
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+            if manager is not None:
+                manager.shutdown()
+
+    def crawl_boards(self, boards=None):
+        """Fetch every thread of many boards, one board per task.
+
+        Args:
+            boards (list of string): Names of the boards to crawl. Defaults to
+                every board on 4chan.
+
+        Returns:
+            iterator of :class:`CrawlBatch`: One batch per board, in the order
+            they finish.
+        """
+        if boards is None:
+            boards = sorted(board.name for board in get_all_boards(https=self.https))
+        return self._run([(board_name, None) for board_name in boards])
+
+    def crawl_threads(self, board, thread_ids=None):
+        """Fetch threads of one board, split into tasks of ``chunk_size`` threads.
+
+        Args:
+            board (string): Name of the board.
+            thread_ids (list of int): IDs of the threads to fetch, such as
+                archived threads. Defaults to every thread on the board.
+
+        Returns:
+            iterator of :class:`CrawlBatch`: One batch per task, in the order
+            they finish.
+        """
+        if thread_ids is None:
+            thread_ids = self._board(board).get_all_thread_ids()
+        thread_ids = list(thread_ids)
+        return self._run([(board, thread_ids[i:i + self.chunk_size])
+                          for i in range(0, len(thread_ids), self.chunk_size)])
+
+    def run(self, boards=None):
+        """Crawl every thread of many boards into the sinks.
+
+        Args:
+            boards (list of string): Names of the boards to crawl. Defaults to
+                every board on 4chan.
+
+        Returns:
+            list of (int, string): (thread ID, error) of each thread that could
+            not be fetched.
+        """
+        failed = []
+        for batch in self.crawl_boards(boards):
+            failed.extend(batch.failed)
+        return failed
+
+    def __repr__(self):
+        return '<ShardedCrawler %i processes, %i threads crawled>' % (self.processes,
+                                                                    self.threads_crawled)
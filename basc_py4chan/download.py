@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parallel, resumable downloads of 4chan files."""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    # Python 2
+    from urlparse import urlparse
+
+from . import __version__
+from .scheduler import current_priority, request_priority
+
+# os.rename() can't replace an existing file on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+DOWNLOADED = 'downloaded'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class DownloadResult(namedtuple('DownloadResult', 'file path status size error')):
+    """Outcome of downloading a single file.
+
+    Attributes:
+        file (:class:`basc_py4chan.File`): The file that was requested.
+        path (string): Where the file was saved.
+        status (string): ``'downloaded'``, ``'skipped'`` if it was already
+            complete on disk, or ``'failed'``.
+        size (int): Bytes transferred for this file.
+        error (Exception): What went wrong, if the download failed.
+    """
+    __slots__ = ()
+
+
+class _HTTPStatusError(Exception):
+    def __init__(self, response):
+        Exception.__init__(self, '%i %s: %s' % (response.status_code, response.reason, response.url))
+        self.response = response
+
+
+class Downloader(object):
+    """Downloads files with a pool of workers, resuming interrupted downloads.
+
+    Files are streamed to a ``.part`` file next to their destination and only
+    renamed into place once complete, so a finished filename always holds a
+    finished file. Interrupted downloads resume with an HTTP Range request,
+    and files already on disk with the right size are skipped.
+
+    Attributes:
+        workers (int): Number of files downloaded at once.
+        per_host (int): Maximum number of downloads in flight to any one host.
+        retries (int): How many times to retry a failed download.
+        bytes_downloaded (int): Bytes transferred so far.
+        files_downloaded (int): Files completed so far.
+        bytes_per_second (float): Average transfer rate while downloading.
+    """
+    def __init__(self, session=None, workers=8, per_host=8, retries=3, backoff=1.0,
+                 chunk_size=1024 * 1024, timeout=60, progress=None):
+        """Creates a :class:`basc_py4chan.download.Downloader` object.
+
+        Args:
+            session: Existing requests.session object to use instead of creating one.
+            workers (int): Number of files downloaded at once.
+            per_host (int): Maximum number of downloads in flight to any one host.
+            retries (int): How many times to retry a failed download.
+            backoff (float): Seconds to wait before the first retry, doubling each time.
+            chunk_size (int): Bytes read from the network at a time.
+            timeout (float): Seconds to wait for the server before giving up on a request.
+            progress: Function called with each :class:`DownloadResult` as it completes.
+        """
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.progress = progress
+
+        if session is None:
+            session = requests.session()
+            session.headers['User-Agent'] = 'py-4chan/%s' % __version__
+            adapter = HTTPAdapter(pool_maxsize=max(workers, per_host))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self._session = session
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+
+        self.bytes_downloaded = 0
+        self.files_downloaded = 0
+        self._active = 0
+        self._active_since = None
+        self._active_time = 0.0
+
+    @property
+    def bytes_per_second(self):
+        with self._lock:
+            elapsed = self._active_time
+            if self._active_since is not None:
+                elapsed += time.time() - self._active_since
+        return self.bytes_downloaded / elapsed if elapsed else 0.0
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        return slot
+
+    def _start(self):
+        with self._lock:
+            if not self._active:
+                self._active_since = time.time()
+            self._active += 1
+
+    def _stop(self):
+        with self._lock:
+            self._active -= 1
+            if not self._active:
+                self._active_time += time.time() - self._active_since
+                self._active_since = None
+
+    def _count(self, size):
+        with self._lock:
+            self.bytes_downloaded += size
+
+    def fetch(self, file, path, thumbnail=False):
+        """Download a single file to ``path`` in the calling thread.
+
+        Args:
+            file (:class:`basc_py4chan.File`): File to download.
+            path (string): Where to save it.
+            thumbnail (bool): Download the thumbnail instead of the file.
+
+        Returns:
+            :class:`DownloadResult`: What happened.
+        """
+        url = file.thumbnail_url if thumbnail else file.file_url
+        expected_size = None if thumbnail else file.file_size
+
+        if os.path.exists(path) and (expected_size is None or
+                                     os.path.getsize(path) == expected_size):
+            return DownloadResult(file, path, SKIPPED, 0, None)
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another worker made it first
+                if not os.path.isdir(directory):
+                    raise
+
+        part = path + '.part'
+        transferred = 0
+        attempt = 0
+        self._start()
+        try:
+            while True:
+                try:
+                    with self._host_slot(url):
+                        transferred += self._transfer(url, part, expected_size)
+                    self._finish(file, part, path, expected_size)
+                    break
+                except _HTTPStatusError as e:
+                    # no point retrying something that isn't there
+                    if e.response.status_code in (403, 404, 410) or attempt >= self.retries:
+                        return DownloadResult(file, path, FAILED, transferred, e)
+                except (requests.RequestException, IOError, ValueError) as e:
+                    if attempt >= self.retries:
+                        return DownloadResult(file, path, FAILED, transferred, e)
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+        finally:
+            self._stop()
+
+        with self._lock:
+            self.files_downloaded += 1
+        return DownloadResult(file, path, DOWNLOADED, transferred, None)
+
+    def _transfer(self, url, part, expected_size):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if expected_size is not None and offset >= expected_size:
+            if offset == expected_size:
+                return 0
+            # more than there should be, start over
+            os.remove(part)
+            offset = 0
+
+        headers = {'Range': 'bytes=%i-' % offset} if offset else None
+        res = self._session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        try:
+            if res.status_code == 416:
+                # nothing left to fetch, or the partial file is bogus; check it
+                os.remove(part)
+                raise ValueError('server refused to resume %s' % url)
+            if res.status_code not in (200, 206):
+                raise _HTTPStatusError(res)
+
+            # a 200 means the server ignored our Range header
+            mode = 'ab' if res.status_code == 206 else 'wb'
+            transferred = 0
+            with open(part, mode) as fd:
+                for chunk in res.iter_content(self.chunk_size):
+                    fd.write(chunk)
+                    transferred += len(chunk)
+                    self._count(len(chunk))
+            return transferred
+        finally:
+            res.close()
+
+    def _finish(self, file, part, path, expected_size):
+        size = os.path.getsize(part)
+        if expected_size is not None and size != expected_size:
+            if size > expected_size:
+                os.remove(part)
+            # a short file is resumed on the next attempt
+            raise IOError('%s is %i bytes, expected %i' % (path, size, expected_size))
+        _replace(part, path)
+
+    def download(self, files, directory, thumbnails=False):
+        """Download files into a directory, several at a time.
+
+        Files are saved under their 4chan filename, such as ``1577836800000.jpg``.
+
+        Args:
+            files (list of :class:`basc_py4chan.File`): Files to download, such as
+                :meth:`basc_py4chan.Thread.file_objects`.
+            directory (string): Directory to save them in.
+            thumbnails (bool): Download thumbnails instead of files.
+
+        Returns:
+            iterator of :class:`DownloadResult`: One result per file, in the order
+            the downloads complete.
+        """
+        jobs = []
+        for file in files:
+            filename = file.thumbnail_fname if thumbnails else file.filename
+            jobs.append((file, os.path.join(directory, filename), thumbnails))
+        return self._run(jobs)
+
+    def download_to(self, files_and_paths, thumbnails=False):
+        """Download files to the given paths, several at a time.
+
+        Args:
+            files_and_paths: Iterable of (:class:`basc_py4chan.File`, path) pairs.
+            thumbnails (bool): Download thumbnails instead of files.
+
+        Returns:
+            iterator of :class:`DownloadResult`: One result per file, in the order
+            the downloads complete.
+        """
+        return self._run([(file, path, thumbnails) for file, path in files_and_paths])
+
+    def download_thread(self, thread, directory, thumbnails=False):
+        """Download every file in a thread into a directory.
+
+        See :meth:`download`.
+        """
+        return self.download(thread.file_objects(), directory, thumbnails)
+
+    def download_board(self, board, directory, thumbnails=False, workers=None):
+        """Download every file on a board, in one directory per thread.
+
+        Every thread on the board is fetched first, see
+        :meth:`basc_py4chan.Board.get_all_threads`.
+
+        Args:
+            board (:class:`basc_py4chan.Board`): Board to archive.
+            directory (string): Directory to create thread directories in.
+            thumbnails (bool): Download thumbnails instead of files.
+            workers (int): Number of threads fetched at once, see
+                :meth:`basc_py4chan.Board.iter_threads`.
+
+        Returns:
+            iterator of :class:`DownloadResult`: One result per file.
+        """
+        jobs = []
+        for thread in board.get_all_threads(expand=True, workers=workers):
+            thread_directory = os.path.join(directory, str(thread.id))
+            for file in thread.file_objects():
+                filename = file.thumbnail_fname if thumbnails else file.filename
+                jobs.append((file, os.path.join(thread_directory, filename), thumbnails))
+        return self._run(jobs)
+
+    def _run(self, jobs):
+        priority = current_priority()
+
+        def fetch(job):
+            with request_priority(priority):
+                try:
+                    return self.fetch(*job)
+                except Exception as e:
+                    # such as a directory that can't be made: report the one
+                    # file, rather than ending every download with it
+                    return DownloadResult(job[0], job[1], FAILED, 0, e)
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = [executor.submit(fetch, job) for job in jobs]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if self.progress is not None:
+                    self.progress(result)
+                yield result
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def __repr__(self):
+        return '<Downloader %i files, %i bytes, %.0f bytes/sec>' % (
+            self.files_downloaded, self.bytes_downloaded, self.bytes_per_second
+        )
@@ -3,7 +3,6 @@
 
 # Fix by Partha Das. 30th November, 2017
 
-from .url import Url
 from base64 import b64decode
 from binascii import hexlify
 
@@ -27,12 +26,22 @@ class File(object):
         thumbnail_height (int): Height of the thumbnail attached to this post.
         thumbnail_fname (string): Filename of the thumbnail attached to this post.
         thumbnail_url (string): URL of the thumbnail attached to this post.
+        board_name (string): Name of the board the file was posted on.
+        tim (int): Server-side timestamp 4chan names the file with, unique per board.
     """
 
     def __init__(self, post, data):
         self._post = post
         self._data = data
-        self._url = Url(board_name=self._post._thread._board.name, https=self._post._thread._board.https)       # 4chan URL generator
+        self._url = post._thread._url       # 4chan URL generator, shared by the whole board
+
+    @property
+    def board_name(self):
+        return self._post._thread._board.name
+
+    @property
+    def tim(self):
+        return self._data.get('tim')
 
     @property
     def file_md5(self):
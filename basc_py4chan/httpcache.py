@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""On-disk HTTP cache, so conditional requests survive restarts.
+
+Mount a :class:`CacheAdapter` on the session given to a board, and every JSON
+response from 4chan is kept on disk with its Last-Modified and ETag headers.
+Requests for the same URL then carry If-Modified-Since and If-None-Match, and
+a 304 Not Modified is answered from disk. Responses for threads that 404 are
+deleted, and :class:`FileCache` can be bounded by age and size.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    # Python 2
+    from urlparse import urlparse
+
+try:
+    basestring = basestring
+except NameError:
+    # Python 3
+    basestring = str
+
+# os.rename() can't replace an existing file on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+# headers describing how the body was sent rather than what it is; the body
+# is stored decoded, so they no longer apply
+_TRANSFER_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+# headers a 304 may carry that supersede the stored ones
+_REFRESHED_HEADERS = ('date', 'expires', 'cache-control', 'etag', 'last-modified')
+
+# responses meaning the URL is gone, so its stored response is no use any more
+_GONE = (404, 410)
+
+# length of a sha1 hex digest, which is what stored files are named;
+# the temporary files written next to them are named otherwise
+_KEY_LENGTH = 40
+
+
+def _is_json(request):
+    return urlparse(request.url).path.endswith('.json')
+
+
+class FileCache(object):
+    """Stores responses in a directory, one file per URL.
+
+    Each file holds the response headers as a line of JSON, followed by the body.
+    A file's access time records when it was last stored or read.
+
+    Responses not used for ``max_age`` seconds are treated as missing, and
+    deleted when they are next looked up or when :meth:`prune` runs. Once the
+    files add up to more than ``max_bytes``, :meth:`prune` deletes the least
+    recently used ones, until they take up at most 90% of ``max_bytes``, so
+    that it doesn't have to run again on the next store. With no limits, the
+    directory keeps growing as new threads are fetched.
+
+    Attributes:
+        directory (string): Directory the responses are kept in.
+        max_age (float): Seconds a response may go unused before it is deleted, or None.
+        max_bytes (int): Maximum size of all stored responses, in bytes, or None.
+        evictions (int): Responses deleted because of a limit or their age.
+    """
+    def __init__(self, directory, max_age=None, max_bytes=None):
+        """Creates a :class:`basc_py4chan.httpcache.FileCache` object.
+
+        Args:
+            directory (string): Directory to keep the responses in. Created if missing.
+            max_age (float): Seconds a response may go unused before it is deleted.
+            max_bytes (int): Maximum size of all stored responses, in bytes.
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # bytes stored, counted by the first prune(); only kept with max_bytes
+        self._nbytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def _expired(self, last_used, now):
+        return self.max_age is not None and now - last_used > self.max_age
+
+    def _remove(self, path):
+        """Delete a stored file, returning its size, or 0 if it is already gone."""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        if self._nbytes is not None:
+            with self._lock:
+                self._nbytes -= size
+        return size
+
+    def get(self, url):
+        """Returns the stored (headers, body) of a URL, or None."""
+        path = self._path(url)
+        now = time.time()
+        try:
+            with open(path, 'rb') as fd:
+                stat = os.fstat(fd.fileno())
+                if self._expired(stat.st_atime, now):
+                    meta = None
+                else:
+                    meta = json.loads(fd.readline().decode('utf-8'))
+                    body = fd.read()
+        except (IOError, OSError, ValueError):
+            return None
+        if meta is None:
+            if self._remove(path):
+                self.evictions += 1
+            return None
+        if meta.get('url') != url:
+            # hash collision
+            return None
+
+        # mark it as used, keeping the modification time as when it was stored;
+        # set explicitly, since many filesystems don't update access times on read
+        try:
+            os.utime(path, (now, stat.st_mtime))
+        except OSError:
+            pass
+        return meta['headers'], body
+
+    def set(self, url, headers, body):
+        """Store the headers and body of a URL, replacing what was there."""
+        path = self._path(url)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another thread made it first
+                if not os.path.isdir(directory):
+                    raise
+
+        # write next to the destination and rename, so readers never see half a file
+        fd, temp = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps({'url': url, 'headers': headers}).encode('utf-8'))
+                f.write(b'\n')
+                f.write(body)
+                size = f.tell()
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            _replace(temp, path)
+        except Exception:
+            os.remove(temp)
+            raise
+
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            counted = self._nbytes is not None
+            if counted:
+                self._nbytes += size - replaced
+                over = self._nbytes > self.max_bytes
+        # the first store counts what earlier runs left behind
+        if not counted or over:
+            self.prune()
+
+    def delete(self, url):
+        """Forget a URL."""
+        self._remove(self._path(url))
+
+    def clear(self):
+        """Forget every URL."""
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                os.remove(os.path.join(root, name))
+        if self._nbytes is not None:
+            with self._lock:
+                self._nbytes = 0
+
+    def prune(self):
+        """Delete responses older than ``max_age``, then the least recently used
+        ones while the rest take up more than ``max_bytes``.
+
+        Runs by itself when a store goes over ``max_bytes``. Call it yourself to
+        clear out expired responses when only ``max_age`` is set.
+
+        Returns:
+            int: The number of responses deleted.
+        """
+        now = time.time()
+        entries = []
+        removed = 0
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if len(name) != _KEY_LENGTH:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if self._expired(stat.st_atime, now):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    removed += 1
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+        nbytes = sum(size for last_used, size, path in entries)
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            target = self.max_bytes * 9 // 10
+            entries.sort()
+            for last_used, size, path in entries:
+                if nbytes <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                nbytes -= size
+                removed += 1
+
+        with self._lock:
+            self._nbytes = nbytes if self.max_bytes is not None else None
+            self.evictions += removed
+        return removed
+
+    def __repr__(self):
+        return '<FileCache %s>' % self.directory
+
+
+class CacheAdapter(HTTPAdapter):
+    """Transport adapter answering conditional requests from an on-disk cache.
+
+    Successful GET responses for cacheable URLs (JSON documents, by default)
+    that have a Last-Modified or ETag header are stored in ``cache``. The next
+    GET for the same URL is sent with If-Modified-Since and If-None-Match, and
+    if the server answers 304 Not Modified, the stored response is returned as
+    a 200 instead, with ``from_cache`` set on it. A 404 or 410 deletes the
+    stored response, since the thread it was for is gone.
+
+    Requests that already carry their own validators, like
+    :meth:`basc_py4chan.Thread.update`, are sent as they are and get the 304
+    they asked for; their 200 responses are still stored.
+
+    Example::
+
+        session = requests.session()
+        adapter = CacheAdapter('cache/http')
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        board = basc_py4chan.Board('g', session=session)
+
+    Attributes:
+        cache: Where responses are stored, such as a :class:`FileCache`.
+        hits (int): Responses served from the cache after a 304.
+        misses (int): Cacheable requests that got a fresh response.
+    """
+    def __init__(self, cache, cacheable=_is_json, **kwargs):
+        """Creates a :class:`basc_py4chan.httpcache.CacheAdapter` object.
+
+        Args:
+            cache: A directory to keep a :class:`FileCache` in, or an object with
+                the same ``get``, ``set`` and ``delete`` methods.
+            cacheable: Function taking a request and returning whether to cache it.
+                Defaults to URLs ending in ``.json``.
+            **kwargs: Passed on to requests' HTTPAdapter, such as ``pool_maxsize``.
+        """
+        HTTPAdapter.__init__(self, **kwargs)
+        self.cache = FileCache(cache) if isinstance(cache, basestring) else cache
+        self.cacheable = cacheable
+        self.hits = 0
+        self.misses = 0
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET' or not self.cacheable(request):
+            response = HTTPAdapter.send(self, request, **kwargs)
+            response.from_cache = False
+            return response
+
+        stored = None
+        if 'If-Modified-Since' not in request.headers and 'If-None-Match' not in request.headers:
+            stored = self.cache.get(request.url)
+            if stored is not None:
+                headers = stored[0]
+                for name, validator in (('If-Modified-Since', 'last-modified'),
+                                        ('If-None-Match', 'etag')):
+                    if validator in headers:
+                        request.headers[name] = headers[validator]
+
+        response = HTTPAdapter.send(self, request, **kwargs)
+        response.from_cache = False
+
+        if response.status_code == 304 and stored is not None:
+            self.hits += 1
+            return self._from_cache(response, *stored)
+
+        if response.status_code in _GONE:
+            self.cache.delete(request.url)
+            return response
+
+        if response.status_code == 200 and ('Last-Modified' in response.headers or
+                                             'ETag' in response.headers):
+            self.misses += 1
+            headers = dict((name.lower(), value) for name, value in response.headers.items()
+                           if name.lower() not in _TRANSFER_HEADERS)
+            # reads the whole body, even if the caller asked to stream it;
+            # iter_content() then hands out the body we read
+            self.cache.set(request.url, headers, response.content)
+        return response
+
+    def _from_cache(self, response, headers, body):
+        # finish with the 304, so its connection goes back to the pool
+        response.content
+
+        headers = CaseInsensitiveDict(headers)
+        for name in _REFRESHED_HEADERS:
+            if name in response.headers:
+                headers[name] = response.headers[name]
+        headers['Content-Length'] = str(len(body))
+
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = headers
+        response._content = body
+        response.encoding = None
+        response.from_cache = True
+        return response
+
+    def __repr__(self):
+        return '<CacheAdapter %r, %i hits, %i misses>' % (self.cache, self.hits, self.misses)
+
+
+def install_cache(session, cache, **kwargs):
+    """Mount a :class:`CacheAdapter` on a requests session for http and https.
+
+    Args:
+        session: The requests session, such as one given to :class:`basc_py4chan.Board`.
+        cache: A directory, or cache object, see :class:`CacheAdapter`.
+        **kwargs: Passed on to :class:`CacheAdapter`.
+
+    Returns:
+        :class:`CacheAdapter`: The mounted adapter.
+    """
+    adapter = CacheAdapter(cache, **kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
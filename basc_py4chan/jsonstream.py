@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""JSON decoding for API responses.
+
+:func:`loads` uses the fastest JSON library installed (orjson, then ujson,
+then the standard library). :func:`iter_items` decodes the elements of a large
+document one at a time as its bytes arrive, so a whole catalog or a bump-limit
+thread never has to sit in memory as one string and one object tree.
+"""
+
+import re
+
+try:
+    import orjson as _backend
+    BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson as _backend
+        BACKEND = 'ujson'
+    except ImportError:
+        import json as _backend
+        BACKEND = 'json'
+
+# how much of a streamed response to read at a time
+CHUNK_SIZE = 64 * 1024
+
+if BACKEND == 'json':
+    def loads(data):
+        """Decode a JSON document given as bytes or text."""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return _backend.loads(data)
+else:
+    def loads(data):
+        """Decode a JSON document given as bytes or text."""
+        return _backend.loads(data)
+
+# characters that change the nesting level, or start a string
+_STRUCTURE = re.compile(br'["{}\[\]]')
+# characters that end a string, or escape the next character
+_STRING = re.compile(br'["\\]')
+
+
+def iter_items(chunks, depth):
+    """Yields the objects and arrays nested ``depth`` levels deep in a JSON document.
+
+    Each element is decoded with :func:`loads` as soon as its closing bracket
+    arrives. Scalars at that depth are skipped.
+
+    For example, posts are 2 levels deep in ``{"posts": [{...}, {...}]}``, and
+    catalog threads are 3 levels deep in ``[{"page": 1, "threads": [{...}]}]``.
+
+    Args:
+        chunks: Iterable of bytes, such as ``response.iter_content(CHUNK_SIZE)``.
+        depth (int): How many containers enclose the wanted elements.
+
+    Raises:
+        ValueError: The chunks ran out before the document was complete.
+    """
+    buf = b''
+    pos = 0           # where to resume scanning in buf
+    level = 0         # containers currently open
+    start = None      # where the element being collected begins in buf
+    in_string = False
+    escaped = False   # the previous chunk ended in a backslash inside a string
+
+    for chunk in chunks:
+        if start is None:
+            # nothing worth keeping from the previous chunk
+            buf = chunk
+            pos = 0
+        else:
+            buf = buf[start:] + chunk
+            pos -= start
+            start = 0
+
+        if escaped:
+            pos += 1
+            escaped = False
+
+        end = len(buf)
+        while pos < end:
+            if in_string:
+                match = _STRING.search(buf, pos)
+                if match is None:
+                    pos = end
+                    break
+                if match.group() == b'\\':
+                    pos = match.end() + 1
+                    if pos > end:
+                        escaped = True
+                        pos = end
+                    continue
+                in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURE.search(buf, pos)
+            if match is None:
+                pos = end
+                break
+            char = match.group()
+            pos = match.end()
+            if char == b'"':
+                in_string = True
+            elif char in b'{[':
+                if level == depth:
+                    start = match.start()
+                level += 1
+            else:
+                level -= 1
+                if level == depth and start is not None:
+                    yield loads(buf[start:pos])
+                    start = None
+
+    if level or in_string:
+        raise ValueError('JSON document ended early')
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Content-addressed storage of 4chan files, deduplicated by MD5."""
+
+import hashlib
+import os
+import sqlite3
+from collections import namedtuple
+
+from .download import Downloader, FAILED, _replace
+
+STORED = 'stored'
+DEDUPLICATED = 'deduplicated'
+KNOWN = 'known'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS media (
+    digest TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS refs (
+    board TEXT NOT NULL,
+    tim INTEGER NOT NULL,
+    digest TEXT NOT NULL REFERENCES media (digest),
+    PRIMARY KEY (board, tim)
+);
+CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest);
+'''
+
+
+class StoreResult(namedtuple('StoreResult', 'file digest status error')):
+    """Outcome of adding a single file to a :class:`MediaStore`.
+
+    Attributes:
+        file (:class:`basc_py4chan.File`): The file that was added.
+        digest (string): Hex-encoded MD5 of the file.
+        status (string): ``'stored'`` if it was downloaded, ``'deduplicated'``
+            if the same content was already stored, ``'known'`` if this file
+            was already in the index, or ``'failed'``.
+        error (Exception): What went wrong, if adding the file failed.
+    """
+    __slots__ = ()
+
+
+def _md5_of(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class MediaStore(object):
+    """Stores 4chan files once per unique content, keyed by their MD5.
+
+    The same image is often posted hundreds of times. Every file is recorded
+    in an index mapping (board, tim) to the MD5 the 4chan API gives for it, and
+    is only downloaded if no file with that MD5 is stored yet. Downloads are
+    checked against the MD5 before they are stored.
+
+    Each stored file counts the (board, tim) entries referring to it; once
+    they have all been released, :meth:`gc` deletes it.
+
+    Files live under ``root/objects/<first two hex digits>/<md5 hex><ext>``,
+    with the index in ``root/index.sqlite3``.
+    """
+    def __init__(self, root, downloader=None):
+        """Creates a :class:`basc_py4chan.mediastore.MediaStore` object.
+
+        Args:
+            root (string): Directory to keep files and the index in.
+            downloader (:class:`basc_py4chan.download.Downloader`): Downloader
+                to fetch files with. A new one is created if not given.
+        """
+        self.root = root
+        self._objects = os.path.join(root, 'objects')
+        self._incoming = os.path.join(root, 'incoming')
+        for directory in (self._objects, self._incoming):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+        self._downloader = downloader or Downloader()
+        self._db = sqlite3.connect(os.path.join(root, 'index.sqlite3'))
+        self._db.executescript(_SCHEMA)
+
+    def path(self, digest, ext):
+        """Returns where the file with the given hex MD5 and extension is stored."""
+        return os.path.join(self._objects, digest[:2], digest + ext)
+
+    def lookup(self, board, tim):
+        """Returns the path of a stored file by its board and ``tim``, or None."""
+        row = self._db.execute(
+            'SELECT media.digest, media.ext FROM refs JOIN media USING (digest) '
+            'WHERE refs.board = ? AND refs.tim = ?', (board, tim)).fetchone()
+        return self.path(*row) if row else None
+
+    def __contains__(self, digest):
+        return self._db.execute('SELECT 1 FROM media WHERE digest = ?', (digest,)).fetchone() is not None
+
+    def _ref(self, board, tim, digest):
+        # callers hold the transaction
+        inserted = self._db.execute('INSERT OR IGNORE INTO refs (board, tim, digest) VALUES (?, ?, ?)',
+                                    (board, tim, digest)).rowcount
+        if inserted:
+            self._db.execute('UPDATE media SET refcount = refcount + 1 WHERE digest = ?', (digest,))
+
+    def add(self, files):
+        """Store the given files, downloading only content not stored yet.
+
+        Args:
+            files (list of :class:`basc_py4chan.File`): Files to store, such as
+                :meth:`basc_py4chan.Thread.file_objects`.
+
+        Returns:
+            iterator of :class:`StoreResult`: One result per file. Files that need
+            no download come first, then downloads as they complete.
+        """
+        # digest -> files waiting on the download of that content
+        pending = {}
+        for file in files:
+            board = file.board_name
+            tim = file.tim
+            if 'md5' not in file._data:
+                # deleted files have no content to fetch
+                yield StoreResult(file, None, FAILED, ValueError('%r has no MD5' % file))
+                continue
+
+            digest = file.file_md5_hex
+            if self._db.execute('SELECT 1 FROM refs WHERE board = ? AND tim = ?',
+                                (board, tim)).fetchone():
+                yield StoreResult(file, digest, KNOWN, None)
+            elif digest in pending:
+                pending[digest].append(file)
+            elif digest in self:
+                with self._db:
+                    self._ref(board, tim, digest)
+                yield StoreResult(file, digest, DEDUPLICATED, None)
+            else:
+                pending[digest] = [file]
+
+        jobs = [(waiting[0], os.path.join(self._incoming, digest + waiting[0].file_extension))
+                for digest, waiting in pending.items()]
+        for result in self._downloader.download_to(jobs):
+            digest = result.file.file_md5_hex
+            waiting = pending[digest]
+            error = result.error
+            if error is None and _md5_of(result.path) != result.file.file_md5:
+                os.remove(result.path)
+                error = ValueError('MD5 mismatch for %s' % result.file.file_url)
+
+            if error is not None:
+                for file in waiting:
+                    yield StoreResult(file, digest, FAILED, error)
+                continue
+
+            ext = result.file.file_extension
+            destination = self.path(digest, ext)
+            if not os.path.isdir(os.path.dirname(destination)):
+                os.makedirs(os.path.dirname(destination))
+            size = os.path.getsize(result.path)
+            _replace(result.path, destination)
+            # the content and its references go in together, so gc() never
+            # sees the content unreferenced
+            with self._db:
+                self._db.execute('INSERT OR IGNORE INTO media (digest, ext, size) VALUES (?, ?, ?)',
+                                 (digest, ext, size))
+                for file in waiting:
+                    self._ref(file.board_name, file.tim, digest)
+
+            for i, file in enumerate(waiting):
+                yield StoreResult(file, digest, STORED if i == 0 else DEDUPLICATED, None)
+
+    def add_thread(self, thread):
+        """Store every file in a thread. See :meth:`add`."""
+        return self.add(thread.file_objects())
+
+    def release(self, board, tim):
+        """Drop the reference a file makes to its stored content.
+
+        Returns:
+            bool: Whether the file was in the index.
+        """
+        row = self._db.execute('SELECT digest FROM refs WHERE board = ? AND tim = ?',
+                               (board, tim)).fetchone()
+        if row is None:
+            return False
+        with self._db:
+            self._db.execute('DELETE FROM refs WHERE board = ? AND tim = ?', (board, tim))
+            self._db.execute('UPDATE media SET refcount = refcount - 1 WHERE digest = ?', row)
+        return True
+
+    def gc(self):
+        """Delete stored content no file refers to any more.
+
+        Returns:
+            int: Bytes freed.
+        """
+        freed = 0
+        for digest, ext, size in self._db.execute(
+                'SELECT digest, ext, size FROM media WHERE refcount <= 0').fetchall():
+            with self._db:
+                deleted = self._db.execute('DELETE FROM media WHERE digest = ? AND refcount <= 0',
+                                           (digest,)).rowcount
+            if not deleted:
+                # referenced again since
+                continue
+            try:
+                os.remove(self.path(digest, ext))
+            except OSError:
+                pass
+            freed += size
+        return freed
+
+    @property
+    def stats(self):
+        """dict: Number of stored objects, their total size and the number of references."""
+        objects, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media').fetchone()
+        refs, = self._db.execute('SELECT COUNT(*) FROM refs').fetchone()
+        return {'objects': objects, 'bytes': size, 'refs': refs}
+
+    def close(self):
+        self._db.close()
+
+    def __repr__(self):
+        return '<MediaStore %s>' % self.root
@@ -4,41 +4,18 @@
 # Fix by Partha Das. 30th November, 2017
 from datetime import datetime
 
-from .url import Url
 from .file import File
+from .comment import parse_comment
 from .util import clean_comment_body
 
-class Post(object):
-    """Represents a 4chan post.
+class _PostBase(object):
+    """Properties shared by every post representation.
 
-    Attributes:
-        post_id (int): ID of this post. Eg: ``123123123``, ``456456456``.
-        poster_id (int): Poster ID.
-        name (string): Poster's name.
-        email (string): Poster's email.
-        tripcode (string): Poster's tripcode.
-        subject (string): Subject of this post.
-        comment (string): This comment, with the <wbr> tag removed.
-        html_comment (string): Original, direct HTML of this comment.
-        text_comment (string): Plaintext version of this comment.
-        is_op (bool): Whether this is the OP (first post of the thread).
-        spoiler (bool): Whether the attached file is spoiled.
-        timestamp (int): Unix timestamp for this post.
-        datetime (:class:`datetime.datetime`): Datetime time of this post.
-        first_file (:class:`py8chan.File`): The File object associated with this post.
-        has_file (bool): Whether this post has a file attached to it.
-        url (string): URL of this post.
-        semantic_url (string): URL of this post, with the thread's 'semantic' component.
-        semantic_slug (string): This post's 'semantic slug'.
+    Subclasses provide the raw fields (``post_id``, ``html_comment``,
+    ``timestamp``, ``has_file``, ``file1`` and so on); everything here is
+    derived from those.
     """
-    def __init__(self, thread, data):
-        self._thread = thread
-        self._data = data
-        self._url = Url(board_name=self._thread._board.name, https=thread.https)		# 4chan URL generator
-
-        # add file objects if they exist
-        if self.has_file:
-            self.file1 = File(self, self._data)
+    __slots__ = ()
 
     @property
     def is_op(self):
@@ -49,53 +26,37 @@ class Post(object):
     # is_OP = is_op
 
     @property
-    def post_id(self):
-        return self._data.get('no')
-    number = num = no = post_number = post_id
-
-    @property
-    def poster_id(self):
-        return self._data.get('id')
+    def number(self):
+        return self.post_id
+    num = no = post_number = number
 
     @property
-    def name(self):
-        return self._data.get('name')
-
-    @property
-    def email(self):
-        return self._data.get('email')
-
-    @property
-    def tripcode(self):
-        return self._data.get('trip')
-
-    @property
-    def subject(self):
-        return self._data.get('sub')
+    def text_comment(self):
+        # cleaned once, then kept on the post
+        text = self._text_comment
+        if text is None:
+            text = self._text_comment = clean_comment_body(self.html_comment)
+        return text
 
     @property
-    def html_comment(self):
-        return self._data.get('com', '')
+    def parsed_comment(self):
+        # parsed once, then kept on the post
+        parsed = self._parsed_comment
+        if parsed is None:
+            parsed = self._parsed_comment = parse_comment(self.html_comment)
+        return parsed
 
     @property
-    def text_comment(self):
-        return clean_comment_body(self.html_comment)
+    def quoted_ids(self):
+        return self.parsed_comment.quoted_ids
 
     @property
     def comment(self):
         return self.html_comment.replace('<wbr>', '')
 
-    @property
-    def timestamp(self):
-        return self._data['time']
-
     @property
     def datetime(self):
-        return datetime.fromtimestamp(self._data['time'])
-
-    @property
-    def spoiler(self):
-        return self._data.get('spoiler') == 1
+        return datetime.fromtimestamp(self.timestamp)
 
     """
         Legacy undocumented compatibility wrappers for File attributes that will be depreciated eventually. 
@@ -119,7 +80,6 @@ class Post(object):
     def filename(self):
         if not self.has_file:
             return None
-        board = self._thread._board
         return self.file1.filename
 
     @property
@@ -127,7 +87,6 @@ class Post(object):
         if not self.has_file:
             return None
 
-        board = self._thread._board
         return self.file1.file_url
 
     @property
@@ -189,10 +148,6 @@ class Post(object):
             return None
         return self.file1
 
-    @property
-    def has_file(self):
-        return 'filename' in self._data
-
     @property
     def url(self):
         return '%s#p%i' % (self._thread.url, self.post_number)
@@ -201,10 +156,6 @@ class Post(object):
     def semantic_url(self):
         return '%s#p%i' % (self._thread.semantic_url, self.post_number)
 
-    @property
-    def semantic_slug(self):
-        return self._data.get('semantic_url')
-
     def __repr__(self):
         return '<Post /%s/%i#%i, has_file: %r>' % (
             self._thread._board.name,
@@ -212,3 +163,203 @@ class Post(object):
             self.post_number,
             self.has_file
         )
+
+
+class Post(_PostBase):
+    """Represents a 4chan post.
+
+    Attributes:
+        post_id (int): ID of this post. Eg: ``123123123``, ``456456456``.
+        poster_id (int): Poster ID.
+        name (string): Poster's name.
+        email (string): Poster's email.
+        tripcode (string): Poster's tripcode.
+        subject (string): Subject of this post.
+        comment (string): This comment, with the <wbr> tag removed.
+        html_comment (string): Original, direct HTML of this comment.
+        text_comment (string): Plaintext version of this comment.
+        parsed_comment (:class:`basc_py4chan.comment.ParsedComment`): This comment,
+            split into quotelinks, greentext, spoilers and other segments.
+        quoted_ids (list of int): IDs of the posts in the same thread this comment quotes.
+        is_op (bool): Whether this is the OP (first post of the thread).
+        spoiler (bool): Whether the attached file is spoiled.
+        timestamp (int): Unix timestamp for this post.
+        datetime (:class:`datetime.datetime`): Datetime time of this post.
+        first_file (:class:`py8chan.File`): The File object associated with this post.
+        has_file (bool): Whether this post has a file attached to it.
+        url (string): URL of this post.
+        semantic_url (string): URL of this post, with the thread's 'semantic' component.
+        semantic_slug (string): This post's 'semantic slug'.
+    """
+    # set on the instance once text_comment and parsed_comment are first read
+    _text_comment = None
+    _parsed_comment = None
+
+    def __init__(self, thread, data):
+        self._thread = thread
+        self._data = data
+        self._file = None
+
+    @property
+    def post_id(self):
+        return self._data.get('no')
+
+    @property
+    def poster_id(self):
+        return self._data.get('id')
+
+    @property
+    def name(self):
+        return self._data.get('name')
+
+    @property
+    def email(self):
+        return self._data.get('email')
+
+    @property
+    def tripcode(self):
+        return self._data.get('trip')
+
+    @property
+    def subject(self):
+        return self._data.get('sub')
+
+    @property
+    def html_comment(self):
+        return self._data.get('com', '')
+
+    @property
+    def timestamp(self):
+        return self._data['time']
+
+    @property
+    def spoiler(self):
+        return self._data.get('spoiler') == 1
+
+    @property
+    def file1(self):
+        # File objects are only built when somebody asks for them
+        if self._file is None and self.has_file:
+            self._file = File(self, self._data)
+        return self._file
+
+    @property
+    def has_file(self):
+        return 'filename' in self._data
+
+    @property
+    def semantic_slug(self):
+        return self._data.get('semantic_url')
+
+
+class _Layout(object):
+    """The keys of a post's JSON, shared by every compact post with the same keys."""
+    __slots__ = ('keys', 'index')
+
+    # interned layouts, see _Layout.shared()
+    _shared = {}
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = dict((key, i) for i, key in enumerate(keys))
+
+    @classmethod
+    def shared(cls, keys):
+        layout = cls._shared.get(keys)
+        if layout is None:
+            layout = cls._shared.setdefault(keys, cls(keys))
+        return layout
+
+
+class CompactPost(_PostBase):
+    """Memory-efficient representation of a 4chan post.
+
+    Has the same attributes as :class:`basc_py4chan.Post`, but keeps its state
+    in ``__slots__`` instead of an instance dict. With ``keep_raw`` set it
+    holds the post's JSON as is; otherwise the JSON's values are kept in a
+    tuple, and its keys in a layout shared by every post with the same keys,
+    so no field is lost and ``_data`` can be rebuilt on demand for
+    :class:`basc_py4chan.File` and other code that reads it.
+
+    Boards create these for replies when given ``compact_posts=True``.
+    """
+    __slots__ = ('_thread', '_layout', '_values', '_file', '_text_comment',
+                 '_parsed_comment')
+
+    def __init__(self, thread, data, keep_raw=True):
+        self._thread = thread
+        if keep_raw:
+            self._layout = None
+            self._values = data
+        else:
+            self._layout = _Layout.shared(tuple(data))
+            self._values = tuple(data.values())
+        self._file = None
+        self._text_comment = None
+        self._parsed_comment = None
+
+    def _get(self, key, default=None):
+        layout = self._layout
+        if layout is None:
+            return self._values.get(key, default)
+        i = layout.index.get(key)
+        return default if i is None else self._values[i]
+
+    @property
+    def _data(self):
+        if self._layout is None:
+            return self._values
+        return dict(zip(self._layout.keys, self._values))
+
+    @property
+    def post_id(self):
+        return self._get('no')
+
+    @property
+    def poster_id(self):
+        return self._get('id')
+
+    @property
+    def name(self):
+        return self._get('name')
+
+    @property
+    def email(self):
+        return self._get('email')
+
+    @property
+    def tripcode(self):
+        return self._get('trip')
+
+    @property
+    def subject(self):
+        return self._get('sub')
+
+    @property
+    def html_comment(self):
+        return self._get('com', '')
+
+    @property
+    def timestamp(self):
+        return self._get('time')
+
+    @property
+    def spoiler(self):
+        return self._get('spoiler') == 1
+
+    @property
+    def has_file(self):
+        if self._layout is None:
+            return 'filename' in self._values
+        return 'filename' in self._layout.index
+
+    @property
+    def file1(self):
+        # built once, like Post's
+        if self._file is None and self.has_file:
+            self._file = File(self, self._data)
+        return self._file
+
+    @property
+    def semantic_slug(self):
+        return self._get('semantic_url')
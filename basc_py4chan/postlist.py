@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Lazily-built sequences of posts."""
+
+try:
+    from collections.abc import MutableSequence, Sequence
+except ImportError:
+    # Python 2
+    from collections import MutableSequence, Sequence
+
+
+class _LazySequence(Sequence):
+    """Read-only list behaviour for sequences that build their items on access."""
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('post index out of range')
+        return self._get(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, _LazySequence)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class PostList(_LazySequence, MutableSequence):
+    """The replies of a :class:`basc_py4chan.Thread`.
+
+    Behaves like a list of :class:`basc_py4chan.Post` objects, but holds the
+    JSON of each post until the post is first accessed, and only then builds
+    the Post. Threads where only the OP, the length or the last few replies
+    are looked at never pay for the rest.
+
+    Raw JSON dicts may be added alongside Post objects; they are turned into
+    posts when read.
+
+    Posts can also be looked up by number in constant time with
+    :meth:`get_post`; the index behind it is built on the first lookup and
+    kept up to date as replies are appended or replaced.
+    """
+    def __init__(self, thread, items=()):
+        self._thread = thread
+        # post JSON dicts, replaced by Post objects as they are built
+        self._items = list(items)
+        # post number -> position in _items, once somebody looks a post up
+        self._index = None
+
+    def _get(self, index):
+        item = self._items[index]
+        if type(item) is dict:
+            item = self._items[index] = self._thread._new_post(item)
+        return item
+
+    def __len__(self):
+        return len(self._items)
+
+    def __setitem__(self, index, value):
+        if self._index is None or isinstance(index, slice):
+            self._items[index] = value
+            self._index = None
+            return
+        if index < 0:
+            index += len(self._items)
+        old_id = self.post_id(index)
+        self._items[index] = value
+        # replacing a post, such as with an edited copy, keeps the index
+        new_id = self.post_id(index)
+        if new_id != old_id:
+            if self._index.get(old_id) == index:
+                del self._index[old_id]
+            self._index[new_id] = index
+
+    def __delitem__(self, index):
+        del self._items[index]
+        self._index = None
+
+    def insert(self, index, value):
+        self._items.insert(index, value)
+        self._index = None
+
+    def extend(self, values):
+        start = len(self._items)
+        self._items.extend(values)
+        if self._index is not None:
+            for i in range(start, len(self._items)):
+                self._index[self.post_id(i)] = i
+
+    def _positions(self):
+        if self._index is None:
+            self._index = {self.post_id(i): i for i in range(len(self._items))}
+        return self._index
+
+    def position(self, post_id):
+        """Returns the index of the post numbered ``post_id``, or None."""
+        return self._positions().get(post_id)
+
+    def get_post(self, post_id, default=None):
+        """Returns the post numbered ``post_id``, or ``default`` if it isn't in the list."""
+        index = self._positions().get(post_id)
+        if index is None:
+            return default
+        return self._get(index)
+
+    def has_post(self, post_id):
+        """Returns whether the post numbered ``post_id`` is in the list."""
+        return post_id in self._positions()
+
+    def raw(self, start=0):
+        """Yields the JSON of every post from ``start`` on, without building Post objects."""
+        for index in range(start, len(self._items)):
+            item = self._items[index]
+            yield item if type(item) is dict else item._data
+
+    def stored(self):
+        """Returns the replies as they are held: the JSON dict of each reply
+        not accessed yet, and the built post of the rest."""
+        return list(self._items)
+
+    def post_id(self, index):
+        """Returns the number of the post at ``index``, without building it."""
+        item = self._items[index]
+        return item['no'] if type(item) is dict else item.post_id
+
+
+class ThreadPosts(_LazySequence):
+    """Every post of a :class:`basc_py4chan.Thread`, the OP followed by its replies.
+
+    A view over the thread, so posts are built lazily and shared with
+    :attr:`basc_py4chan.Thread.replies`.
+    """
+    def __init__(self, thread):
+        self._thread = thread
+
+    def _get(self, index):
+        if index == 0:
+            return self._thread.topic
+        return self._thread.replies[index - 1]
+
+    def __len__(self):
+        return len(self._thread.replies) + 1
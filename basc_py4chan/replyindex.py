@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Index of which posts quote which, kept up to date as threads grow."""
+
+import heapq
+import re
+
+# quotelinks to posts in the same thread; see basc_py4chan.comment for the full markup
+_QUOTE = re.compile(r'href="#p(\d+)"')
+
+
+def _count(item):
+    return len(item[1])
+
+
+class ReplyIndex(object):
+    """Maps the posts of a :class:`basc_py4chan.Thread` to the posts quoting them.
+
+    Built from the comment HTML of each post, without creating Post objects.
+    Posts are indexed once: :meth:`refresh` only looks at replies added since
+    the last refresh, so keeping the index current as the thread is updated
+    costs O(new posts). If the replies are replaced rather than appended to,
+    as by a forced update, the index is rebuilt.
+
+    :attr:`basc_py4chan.Thread.reply_index` refreshes the index whenever it is read.
+    """
+    def __init__(self, thread):
+        """Creates a :class:`basc_py4chan.replyindex.ReplyIndex` object.
+
+        Args:
+            thread (:class:`basc_py4chan.Thread`): Thread to index.
+        """
+        self._thread = thread
+        # post ID -> IDs of the posts quoting it, in thread order
+        self._replies = {}
+        self._topic_indexed = False
+        # replies indexed so far, and the ID of the last of them
+        self._indexed = 0
+        self._last_id = None
+
+    def _add(self, data):
+        comment = data.get('com')
+        if not comment or 'href="#p' not in comment:
+            return
+        post_id = data['no']
+        seen = set()
+        for match in _QUOTE.finditer(comment):
+            quoted = int(match.group(1))
+            # quoting a post twice is still one reply
+            if quoted not in seen:
+                seen.add(quoted)
+                self._replies.setdefault(quoted, []).append(post_id)
+
+    def refresh(self):
+        """Index the replies added to the thread since the last refresh.
+
+        Returns:
+            int: How many posts were indexed.
+        """
+        replies = self._thread.replies
+        if self._indexed and (len(replies) < self._indexed or
+                              replies.post_id(self._indexed - 1) != self._last_id):
+            # replies were replaced, not appended to
+            self._replies.clear()
+            self._topic_indexed = False
+            self._indexed = 0
+
+        indexed = 0
+        if not self._topic_indexed:
+            self._add(self._thread.topic._data)
+            self._topic_indexed = True
+            indexed += 1
+        for data in replies.raw(self._indexed):
+            self._add(data)
+            indexed += 1
+
+        self._indexed = len(replies)
+        if self._indexed:
+            self._last_id = replies.post_id(-1)
+        return indexed
+
+    def replies_to(self, post_id):
+        """Returns the IDs of the posts quoting ``post_id``, in thread order."""
+        return list(self._replies.get(post_id, ()))
+
+    def reply_count(self, post_id):
+        """Returns how many posts quote ``post_id``."""
+        return len(self._replies.get(post_id, ()))
+
+    def most_replied(self, n=10):
+        """Returns the ``n`` most quoted posts.
+
+        Returns:
+            list of (int, int): (post ID, number of posts quoting it) pairs,
+            most quoted first.
+        """
+        return [(post_id, len(quoting)) for post_id, quoting in
+                heapq.nlargest(n, self._replies.items(), key=_count)]
+
+    def __contains__(self, post_id):
+        return post_id in self._replies
+
+    def __len__(self):
+        return len(self._replies)
+
+    def __repr__(self):
+        return '<ReplyIndex /%s/%i, %i quoted posts>' % (
+            self._thread._board.name, self._thread.id, len(self._replies))
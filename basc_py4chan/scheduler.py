@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Pacing of requests to 4chan, following the API rules.
+
+The 4chan API asks clients to make no more than one request per second, and
+to wait at least 10 seconds before requesting the same thread again. A
+:class:`RequestScheduler` enforces limits like these for every request made
+through a :class:`ScheduledSession`, however many boards, threads and worker
+threads share the session.
+"""
+
+import itertools
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    # Python 2
+    from urlparse import urlparse
+
+from . import __version__
+
+# lower priorities go first
+PRIORITY_LIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BACKFILL = 20
+
+# host -> (requests per second, burst)
+DEFAULT_HOST_RATES = {
+    'a.4cdn.org': (1.0, 1),
+    'boards.4chan.org': (1.0, 1),
+    'boards.4channel.org': (1.0, 1),
+    'i.4cdn.org': (5.0, 10),
+}
+
+# (URL pattern, minimum seconds between requests for the same URL)
+DEFAULT_MIN_INTERVALS = [
+    (r'/thread/\d+\.json$', 10.0),
+]
+
+# seconds to back off a host that answers 429 or 503 without a Retry-After
+DEFAULT_BACKOFF = 30.0
+
+# how long an outranked request sleeps before looking again, unless woken
+_POLL = 1.0
+
+_clock = getattr(time, 'monotonic', time.time)
+_local = threading.local()
+
+
+def current_priority():
+    """Returns the priority requests made by the calling thread are sent with."""
+    return getattr(_local, 'priority', PRIORITY_NORMAL)
+
+
+@contextmanager
+def request_priority(priority):
+    """Send the requests made by the calling thread within the block with ``priority``.
+
+    Example::
+
+        with request_priority(PRIORITY_BACKFILL):
+            board.get_all_threads(expand=True)
+    """
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class _Bucket(object):
+    """Token bucket for one host."""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def wait(self, now):
+        """Seconds until a token is available."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RequestScheduler(object):
+    """Decides when each request may be sent, so that 4chan's limits are respected.
+
+    Every host gets a token bucket: ``rate`` requests per second, with bursts
+    of up to ``burst`` requests after a quiet spell. URLs matching one of the
+    minimum interval patterns are additionally not requested again until that
+    many seconds have passed since they were last requested.
+
+    Requests waiting on the same host are granted in priority order, lowest
+    first; a request whose URL is still cooling down does not hold up requests
+    for other URLs. Hosts without a configured rate are not limited.
+
+    Attributes:
+        requests (int): Requests granted so far.
+        waited (float): Total seconds requests spent waiting to be granted.
+    """
+    def __init__(self, host_rates=None, min_intervals=None):
+        """Creates a :class:`basc_py4chan.scheduler.RequestScheduler` object.
+
+        Args:
+            host_rates (dict): Maps host names to (requests per second, burst)
+                tuples. Defaults to :data:`DEFAULT_HOST_RATES`.
+            min_intervals (list): (regular expression, seconds) pairs; URLs
+                matching a pattern are requested at most once every that many
+                seconds. Defaults to :data:`DEFAULT_MIN_INTERVALS`.
+        """
+        if host_rates is None:
+            host_rates = DEFAULT_HOST_RATES
+        if min_intervals is None:
+            min_intervals = DEFAULT_MIN_INTERVALS
+
+        self._cond = threading.Condition()
+        self._rates = dict(host_rates)
+        self._buckets = {}
+        self._intervals = [(re.compile(pattern), seconds) for pattern, seconds in min_intervals]
+        self._longest_interval = max([seconds for pattern, seconds in min_intervals] or [0])
+        # URL -> when it was last requested
+        self._last_request = {}
+        # host -> [(priority, sequence, URL, seconds)] of requests waiting for it
+        self._waiting = {}
+        self._sequence = itertools.count()
+
+        self.requests = 0
+        self.waited = 0.0
+
+    def set_rate(self, host, rate, burst=1):
+        """Limit requests to ``host`` to ``rate`` per second, or remove the limit if None."""
+        with self._cond:
+            self._rates[host] = None if rate is None else (rate, burst)
+            self._buckets.pop(host, None)
+            self._cond.notify_all()
+
+    def _bucket(self, host, now):
+        bucket = self._buckets.get(host)
+        if bucket is None and self._rates.get(host) is not None:
+            rate, burst = self._rates[host]
+            bucket = self._buckets[host] = _Bucket(rate, burst, now)
+        return bucket
+
+    def _min_interval(self, url):
+        path = urlparse(url).path
+        for pattern, seconds in self._intervals:
+            if pattern.search(path):
+                return seconds
+        return 0.0
+
+    def _cooldown(self, url, interval, now):
+        if not interval or url not in self._last_request:
+            return 0.0
+        return max(0.0, self._last_request[url] + interval - now)
+
+    def _wait_time(self, host, waiter, now):
+        priority, sequence, url, interval = waiter
+        cooldown = self._cooldown(url, interval, now)
+        bucket = self._bucket(host, now)
+        wait = bucket.wait(now) if bucket is not None else 0.0
+        if cooldown or wait:
+            return max(cooldown, wait)
+
+        for other in self._waiting[host]:
+            if other[:2] < waiter[:2] and not self._cooldown(other[2], other[3], now):
+                # a more urgent request can go, let it
+                return _POLL
+        return 0.0
+
+    def _grant(self, host, waiter, now):
+        bucket = self._buckets.get(host)
+        if bucket is not None:
+            bucket.tokens -= 1
+        url, interval = waiter[2:]
+        if interval:
+            if len(self._last_request) > 10000:
+                self._forget(now)
+            self._last_request[url] = now
+        self.requests += 1
+
+    def _forget(self, now):
+        # drop URLs that have cooled down, they no longer need to be remembered
+        for url, when in list(self._last_request.items()):
+            if now - when > self._longest_interval:
+                del self._last_request[url]
+
+    def acquire(self, url, priority=None):
+        """Block until a request for ``url`` may be sent.
+
+        Args:
+            url (string): URL about to be requested.
+            priority (int): Lower is sooner, such as :data:`PRIORITY_LIVE`.
+                Defaults to :func:`current_priority`.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if priority is None:
+            priority = current_priority()
+        host = urlparse(url).netloc
+        waiter = (priority, next(self._sequence), url, self._min_interval(url))
+
+        with self._cond:
+            start = _clock()
+            waiting = self._waiting.setdefault(host, [])
+            waiting.append(waiter)
+            try:
+                while True:
+                    now = _clock()
+                    wait = self._wait_time(host, waiter, now)
+                    if wait <= 0:
+                        self._grant(host, waiter, now)
+                        break
+                    self._cond.wait(wait)
+            finally:
+                waiting.remove(waiter)
+                # whoever is next may be able to go now
+                self._cond.notify_all()
+
+            waited = now - start
+            self.waited += waited
+        return waited
+
+    def backoff(self, url, seconds=DEFAULT_BACKOFF):
+        """Send no requests to the host of ``url`` for the next ``seconds`` seconds."""
+        host = urlparse(url).netloc
+        with self._cond:
+            now = _clock()
+            bucket = self._bucket(host, now)
+            if bucket is None:
+                bucket = self._buckets[host] = _Bucket(float('inf'), 1, now)
+            bucket.tokens = 0.0
+            bucket.blocked_until = max(bucket.blocked_until, now + seconds)
+
+    def __repr__(self):
+        return '<RequestScheduler %i requests, %.1fs waited>' % (self.requests, self.waited)
+
+
+class ScheduledSession(requests.Session):
+    """A requests session that sends every request through a :class:`RequestScheduler`.
+
+    Pass one session to every :class:`basc_py4chan.Board` (and
+    :class:`basc_py4chan.download.Downloader`) that should share the limits::
+
+        session = ScheduledSession()
+        boards = basc_py4chan.get_boards('g tg', session=session)
+
+    A host that answers 429 Too Many Requests or 503 Service Unavailable is
+    left alone for as long as its Retry-After header asks, or
+    :data:`DEFAULT_BACKOFF` seconds.
+
+    Attributes:
+        scheduler (:class:`RequestScheduler`): Scheduler the requests go through.
+            This may be a :mod:`multiprocessing` proxy of one, shared by
+            sessions in many processes.
+    """
+    def __init__(self, scheduler=None):
+        """Creates a :class:`basc_py4chan.scheduler.ScheduledSession` object.
+
+        Args:
+            scheduler (:class:`RequestScheduler`): Scheduler to share, such as one
+                used by another session. A new one with the default limits is
+                created if not given.
+        """
+        requests.Session.__init__(self)
+        self.headers['User-Agent'] = 'py-4chan/%s' % __version__
+        self.scheduler = scheduler or RequestScheduler()
+
+    def request(self, method, url, *args, **kwargs):
+        # the priority is passed on, so it holds for a scheduler in another process
+        self.scheduler.acquire(url, current_priority())
+        res = requests.Session.request(self, method, url, *args, **kwargs)
+        if res.status_code in (429, 503):
+            retry_after = res.headers.get('Retry-After', '')
+            self.scheduler.backoff(url, float(retry_after) if retry_after.isdigit() else DEFAULT_BACKOFF)
+        return res
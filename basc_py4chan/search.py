@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Full-text search over stored posts, using SQLite's FTS5.
+
+:class:`SearchIndex` keeps the plaintext comment, subject, name and filename
+of each post in an FTS5 table, fed the same way as
+:class:`basc_py4chan.storage.SQLiteArchive`, and answers queries with the
+best matching posts first.
+"""
+
+import sqlite3
+from collections import namedtuple
+
+from .storage import SQLiteArchive, _changed_post_json, _new_post_json
+from .util import clean_comment_bodies
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS search_posts (
+    id INTEGER PRIMARY KEY,
+    board TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    thread_id INTEGER NOT NULL,
+    UNIQUE (board, post_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5 (
+    subject, name, comment, filename
+);
+'''
+
+_INSERT_KEY = 'INSERT OR IGNORE INTO search_posts (board, post_id, thread_id) VALUES (?, ?, ?)'
+# a post already indexed keeps its rowid, so its old text is replaced
+_INSERT_TEXT = ('INSERT OR REPLACE INTO search_text (rowid, subject, name, comment, filename) '
+                'VALUES ((SELECT id FROM search_posts WHERE board = ? AND post_id = ?), ?, ?, ?, ?)')
+
+_SEARCH = '''
+SELECT search_posts.board, search_posts.thread_id, search_posts.post_id,
+       search_text.subject, search_text.name, search_text.comment, search_text.filename,
+       bm25(search_text, %s)
+FROM search_text JOIN search_posts ON search_posts.id = search_text.rowid
+WHERE search_text MATCH ?%s
+ORDER BY bm25(search_text, %s)
+LIMIT ? OFFSET ?
+'''
+
+# bm25 weights of subject, name, comment and filename
+DEFAULT_WEIGHTS = (4.0, 1.0, 1.0, 2.0)
+
+
+class SearchResult(namedtuple('SearchResult', 'board thread_id post_id subject name '
+                                              'text_comment filename rank')):
+    """A post matching a search.
+
+    Attributes:
+        board (string): Board the post is on.
+        thread_id (int): Thread the post is in.
+        post_id (int): Number of the post.
+        subject (string): Subject of the post, or None.
+        name (string): Poster's name, or None.
+        text_comment (string): The comment, as plaintext.
+        filename (string): Original filename of the post's file, with its
+            extension, or None.
+        rank (float): Relevance of the post; lower is better.
+    """
+    __slots__ = ()
+
+    @property
+    def is_op(self):
+        return self.post_id == self.thread_id
+
+
+class SearchIndex(object):
+    """Full-text index of posts, ranked with BM25.
+
+    Posts are written like to :class:`basc_py4chan.storage.SQLiteArchive`,
+    straight from the thread JSON, with each comment cleaned to plaintext. A
+    post written again replaces its indexed text, so the index follows edits
+    and deleted files; posts removed from a thread stay searchable.
+
+    The index can live in its own database or in an archive's::
+
+        archive = SQLiteArchive('g.sqlite3')
+        index = SearchIndex(archive)
+        for sink in (archive, index):
+            sink.write_new(thread, count)
+
+        for result in index.search('linux AND kernel', board='g'):
+            print(result.post_id, result.text_comment)
+
+    Queries use the FTS5 query syntax: words, ``"quoted phrases"``, ``prefix*``,
+    ``AND``/``OR``/``NOT`` and column filters like ``subject: thread``.
+
+    Attributes:
+        weights (tuple of float): BM25 weights of the subject, name, comment
+            and filename columns.
+        posts_written (int): Posts indexed so far.
+    """
+    def __init__(self, database, weights=DEFAULT_WEIGHTS):
+        """Creates a :class:`basc_py4chan.search.SearchIndex` object.
+
+        Args:
+            database: Database file, created if missing, or a
+                :class:`basc_py4chan.storage.SQLiteArchive` to share the
+                database and connection of.
+            weights (tuple of float): BM25 weights of the subject, name,
+                comment and filename columns.
+
+        Raises:
+            RuntimeError: SQLite was built without FTS5.
+        """
+        if isinstance(database, SQLiteArchive):
+            self.path = database.path
+            self._db = database._db
+            self._owns_db = False
+        else:
+            self.path = database
+            self._db = sqlite3.connect(database)
+            self._db.execute('PRAGMA journal_mode = WAL')
+            self._owns_db = True
+        try:
+            self._db.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            if 'fts5' in str(e):
+                raise RuntimeError('SQLite %s was built without FTS5, which SearchIndex needs'
+                                   % sqlite3.sqlite_version)
+            raise
+        self.weights = tuple(weights)
+        self.posts_written = 0
+
+    def _write(self, threads_and_posts):
+        # [(thread, iterable of post JSON)], written in one transaction
+        key_rows = []
+        text_rows = []
+        comments = []
+        for thread, posts in threads_and_posts:
+            board = thread._board.name
+            thread_id = thread.id
+            for data in posts:
+                post_id = data['no']
+                filename = data.get('filename')
+                if filename is not None:
+                    filename += data.get('ext', '')
+                key_rows.append((board, post_id, thread_id))
+                text_rows.append([board, post_id, data.get('sub'), data.get('name'), None, filename])
+                comments.append(data.get('com', ''))
+
+        for row, comment in zip(text_rows, clean_comment_bodies(comments)):
+            row[4] = comment
+        with self._db:
+            self._db.executemany(_INSERT_KEY, key_rows)
+            self._db.executemany(_INSERT_TEXT, text_rows)
+        self.posts_written += len(text_rows)
+        return len(text_rows)
+
+    def write_thread(self, thread):
+        """Index a thread and every one of its posts.
+
+        Returns:
+            int: Number of posts indexed.
+        """
+        return self._write([(thread, thread._post_json())])
+
+    def write_threads(self, threads):
+        """Index many threads and all their posts, in a single transaction.
+
+        Returns:
+            int: Number of posts indexed.
+        """
+        return self._write([(thread, thread._post_json()) for thread in threads])
+
+    def write_new(self, thread, count):
+        """Index the OP and the last ``count`` replies of a thread.
+
+        Args:
+            thread (:class:`basc_py4chan.Thread`): The thread.
+            count (int): How many replies are new, as returned by
+                :meth:`basc_py4chan.Thread.update`.
+
+        Returns:
+            int: Number of posts indexed.
+        """
+        return self._write([(thread, _new_post_json(thread, count))])
+
+    def write_delta(self, thread, delta):
+        """Index the posts added or modified, as found by :meth:`basc_py4chan.Thread.update_diff`.
+
+        Returns:
+            int: Number of posts indexed.
+        """
+        return self._write([(thread, _changed_post_json(thread, delta))])
+
+    def search(self, query, board=None, thread_id=None, limit=20, offset=0):
+        """Find the posts best matching a query.
+
+        Args:
+            query (string): FTS5 query, such as ``'"arch linux" OR gentoo'``.
+            board (string): Only search this board.
+            thread_id (int): Only search this thread.
+            limit (int): Most results to return.
+            offset (int): Number of best results to skip, for paging.
+
+        Returns:
+            list of :class:`SearchResult`: Matching posts, most relevant first.
+
+        Raises:
+            sqlite3.OperationalError: The query isn't valid FTS5 syntax.
+        """
+        weights = ', '.join(repr(float(weight)) for weight in self.weights)
+        conditions = ''
+        args = [query]
+        if board is not None:
+            conditions += ' AND search_posts.board = ?'
+            args.append(board)
+        if thread_id is not None:
+            conditions += ' AND search_posts.thread_id = ?'
+            args.append(thread_id)
+        args.extend((limit, offset))
+        rows = self._db.execute(_SEARCH % (weights, conditions, weights), args)
+        return [SearchResult(*row) for row in rows]
+
+    def count(self, query, board=None):
+        """Returns the number of posts matching a query, on one board or all of them."""
+        if board is None:
+            return self._db.execute('SELECT COUNT(*) FROM search_text WHERE search_text MATCH ?',
+                                    (query,)).fetchone()[0]
+        return self._db.execute(
+            'SELECT COUNT(*) FROM search_text JOIN search_posts ON search_posts.id = search_text.rowid '
+            'WHERE search_text MATCH ? AND search_posts.board = ?', (query, board)).fetchone()[0]
+
+    def optimize(self):
+        """Merge the index into as few segments as possible, for faster queries.
+
+        Worth running after indexing a large batch of threads.
+        """
+        with self._db:
+            self._db.execute("INSERT INTO search_text (search_text) VALUES ('optimize')")
+
+    def close(self):
+        """Close the database, unless it is shared with an archive."""
+        if self._owns_db:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return '<SearchIndex %s>' % self.path
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compact binary snapshots of threads, for restoring a board's cache offline.
+
+A snapshot is a short header followed by the zlib-compressed :mod:`marshal`
+dump of ``(board name, [thread state, ...])``, where each thread state holds
+the thread's post JSON and what it needs to send conditional requests.
+Compressed, it is a fraction of the size of the JSON. Loading it takes about
+as long as parsing that JSON with :func:`basc_py4chan.jsonstream.loads`, but
+needs no requests. marshal's format changes between Python versions, so the
+header records the versions that wrote the snapshot.
+
+Like pickle, marshal is not safe against malicious data: only load snapshots
+you wrote yourself.
+"""
+
+import marshal
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from collections import namedtuple
+
+MAGIC = b'B4CSNAP'
+FORMAT_VERSION = 1
+
+# magic, format version, Python major version, marshal version
+_HEADER = struct.Struct('<7sBBB')
+
+# os.rename() can't replace an existing file on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+
+class ThreadState(namedtuple('ThreadState', 'thread_id last_modified listing_modified '
+                                              'last_reply_id want_update posts')):
+    """What a snapshot holds of one thread.
+
+    Attributes:
+        thread_id (int): ID of the thread.
+        last_modified (string): Last-Modified date of the thread's JSON, or None.
+        listing_modified (int): Time the board's thread list last saw the thread change.
+        last_reply_id (int): ID of the last reply.
+        want_update (bool): Whether the thread was only partly loaded.
+        posts (list of dict): JSON of every post, the OP first.
+    """
+    __slots__ = ()
+
+
+def dumps(board_name, states, level=1):
+    """Returns the snapshot of a board's threads as bytes.
+
+    Args:
+        board_name (string): Name of the board the threads are on.
+        states (list of :class:`ThreadState`): Thread states, see
+            :meth:`basc_py4chan.Thread._snapshot`.
+        level (int): zlib compression level. Higher levels make smaller files,
+            but take longer to write; reading takes about as long.
+    """
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, sys.version_info[0], marshal.version)
+    # marshal only writes plain tuples
+    states = [tuple(state) for state in states]
+    return header + zlib.compress(marshal.dumps((board_name, states)), level)
+
+
+def loads(data):
+    """Returns the (board name, list of :class:`ThreadState`) of a snapshot.
+
+    Raises:
+        ValueError: The data isn't a snapshot, or was written by an
+            incompatible version of Python or of this library.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError('not a thread snapshot')
+    magic, version, python, marshal_version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a thread snapshot')
+    if version != FORMAT_VERSION:
+        raise ValueError('snapshot format %i is not supported' % version)
+    if python != sys.version_info[0] or marshal_version > marshal.version:
+        raise ValueError('snapshot was written by Python %i, marshal version %i'
+                         % (python, marshal_version))
+    try:
+        board_name, states = marshal.loads(zlib.decompress(data[_HEADER.size:]))
+        return board_name, [ThreadState(*state) for state in states]
+    except (zlib.error, EOFError, TypeError, ValueError) as e:
+        raise ValueError('corrupt thread snapshot: %s' % e)
+
+
+def write(path, data):
+    """Write a snapshot to a file, replacing it in one step, so a crash mid-write
+    leaves the previous snapshot intact."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        _replace(temp, path)
+    except Exception:
+        os.remove(temp)
+        raise
+
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""SQLite storage for boards, threads, posts and file metadata.
+
+:class:`SQLiteArchive` writes threads straight from the JSON they were parsed
+from, a whole batch of rows per statement, so ingesting entire boards is
+limited by SQLite rather than by building Post objects.
+"""
+
+import sqlite3
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS boards (
+    board TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS threads (
+    board TEXT NOT NULL,
+    thread_id INTEGER NOT NULL,
+    subject TEXT,
+    semantic_slug TEXT,
+    sticky INTEGER NOT NULL DEFAULT 0,
+    closed INTEGER NOT NULL DEFAULT 0,
+    archived INTEGER NOT NULL DEFAULT 0,
+    bumplimit INTEGER NOT NULL DEFAULT 0,
+    imagelimit INTEGER NOT NULL DEFAULT 0,
+    replies INTEGER,
+    images INTEGER,
+    last_modified TEXT,
+    PRIMARY KEY (board, thread_id)
+);
+CREATE TABLE IF NOT EXISTS posts (
+    board TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    thread_id INTEGER NOT NULL,
+    time INTEGER,
+    name TEXT,
+    tripcode TEXT,
+    poster_id TEXT,
+    capcode TEXT,
+    subject TEXT,
+    comment TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (board, post_id)
+);
+CREATE INDEX IF NOT EXISTS posts_thread ON posts (board, thread_id);
+CREATE TABLE IF NOT EXISTS files (
+    board TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    tim INTEGER,
+    ext TEXT,
+    filename TEXT,
+    fsize INTEGER,
+    w INTEGER,
+    h INTEGER,
+    tn_w INTEGER,
+    tn_h INTEGER,
+    md5 TEXT,
+    spoiler INTEGER NOT NULL DEFAULT 0,
+    filedeleted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (board, post_id)
+);
+CREATE INDEX IF NOT EXISTS files_md5 ON files (md5);
+'''
+
+_THREAD_COLUMNS = ('board', 'thread_id', 'subject', 'semantic_slug', 'sticky', 'closed',
+                   'archived', 'bumplimit', 'imagelimit', 'replies', 'images', 'last_modified')
+_POST_COLUMNS = ('board', 'post_id', 'thread_id', 'time', 'name', 'tripcode', 'poster_id',
+                 'capcode', 'subject', 'comment', 'deleted')
+_FILE_COLUMNS = ('board', 'post_id', 'tim', 'ext', 'filename', 'fsize', 'w', 'h', 'tn_w',
+                 'tn_h', 'md5', 'spoiler', 'filedeleted')
+
+
+def _upsert(table, columns, key, keep=()):
+    """INSERT statement replacing the row with the same key, if there is one.
+
+    Columns in ``keep`` hold on to their stored value when the new row has
+    None there, for fields the API leaves out once they no longer apply.
+    """
+    placeholders = ', '.join('?' * len(columns))
+    if sqlite3.sqlite_version_info < (3, 24, 0):
+        return 'INSERT OR REPLACE INTO %s (%s) VALUES (%s)' % (table, ', '.join(columns), placeholders)
+    # update in place, so the row keeps its rowid and triggers see an UPDATE
+    updates = []
+    for column in columns:
+        if column in key:
+            continue
+        if column in keep:
+            updates.append('%s = COALESCE(excluded.%s, %s)' % (column, column, column))
+        else:
+            updates.append('%s = excluded.%s' % (column, column))
+    return 'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE SET %s' % (
+        table, ', '.join(columns), placeholders, ', '.join(key), ', '.join(updates))
+
+
+# threads seen only in a listing have no Last-Modified of their own
+_UPSERT_THREAD = _upsert('threads', _THREAD_COLUMNS, ('board', 'thread_id'), keep=('last_modified',))
+_UPSERT_POST = _upsert('posts', _POST_COLUMNS, ('board', 'post_id'))
+# a deleted file's post no longer carries the file's details
+_UPSERT_FILE = _upsert('files', _FILE_COLUMNS, ('board', 'post_id'),
+                       keep=('tim', 'ext', 'filename', 'fsize', 'w', 'h', 'tn_w', 'tn_h', 'md5'))
+
+
+def _post_row(board, thread_id, data):
+    return (board, data['no'], thread_id, data.get('time'), data.get('name'), data.get('trip'),
+            data.get('id'), data.get('capcode'), data.get('sub'), data.get('com'), 0)
+
+
+def _file_row(board, data):
+    return (board, data['no'], data.get('tim'), data.get('ext'), data.get('filename'),
+            data.get('fsize'), data.get('w'), data.get('h'), data.get('tn_w'), data.get('tn_h'),
+            data.get('md5'), data.get('spoiler', 0), data.get('filedeleted', 0))
+
+
+def _new_post_json(thread, count):
+    # the OP, which carries the thread's counters, and the last count replies
+    posts = [thread.topic._data]
+    if count > 0:
+        replies = thread.replies
+        posts.extend(replies.raw(max(0, len(replies) - count)))
+    return posts
+
+
+def _changed_post_json(thread, delta):
+    # the OP, and every post added or modified by an update_diff()
+    posts = [thread.topic._data]
+    posts.extend(post._data for post in delta.added + delta.modified if not post.is_op)
+    return posts
+
+
+def _thread_row(thread):
+    data = thread.topic._data
+    return (thread._board.name, thread.id, data.get('sub'), data.get('semantic_url'),
+            data.get('sticky', 0), data.get('closed', 0), data.get('archived', 0),
+            data.get('bumplimit', 0), data.get('imagelimit', 0), data.get('replies'),
+            data.get('images'), thread._last_modified)
+
+
+class SQLiteArchive(object):
+    """Stores threads, posts and file metadata in an SQLite database.
+
+    Rows are built from each post's JSON and written with ``executemany``,
+    inserting new posts and updating existing ones by post number. The
+    database runs in WAL mode, so readers aren't blocked while threads are
+    being written.
+
+    To write only what changed, pass the result of an update along::
+
+        archive = SQLiteArchive('g.sqlite3')
+        archive.write_thread(thread)
+        ...
+        archive.write_new(thread, thread.update())
+        archive.write_delta(thread, thread.update_diff())
+
+    Posts deleted on the server stay in the database, marked ``deleted``.
+
+    A connection can only be used from the thread that opened it.
+
+    Attributes:
+        path (string): Location of the database.
+        posts_written (int): Post rows written so far.
+    """
+    def __init__(self, path, synchronous='NORMAL'):
+        """Creates a :class:`basc_py4chan.storage.SQLiteArchive` object.
+
+        Args:
+            path (string): Database file, created if missing.
+            synchronous (string): SQLite's ``synchronous`` setting. ``NORMAL`` is
+                safe in WAL mode; ``OFF`` is faster, but a power loss may lose
+                the latest writes.
+        """
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = %s' % synchronous)
+        self._db.executescript(_SCHEMA)
+        self._boards = set(row[0] for row in self._db.execute('SELECT board FROM boards'))
+        self.posts_written = 0
+
+    def _write(self, threads_and_posts):
+        # [(thread, iterable of post JSON)], written in one transaction
+        post_rows = []
+        file_rows = []
+        thread_rows = []
+        for thread, posts in threads_and_posts:
+            board = thread._board.name
+            if board not in self._boards:
+                self._db.execute('INSERT OR IGNORE INTO boards (board) VALUES (?)', (board,))
+                self._boards.add(board)
+            thread_id = thread.id
+            thread_rows.append(_thread_row(thread))
+            for data in posts:
+                post_rows.append(_post_row(board, thread_id, data))
+                if 'tim' in data or 'filedeleted' in data:
+                    file_rows.append(_file_row(board, data))
+
+        with self._db:
+            self._db.executemany(_UPSERT_THREAD, thread_rows)
+            self._db.executemany(_UPSERT_POST, post_rows)
+            self._db.executemany(_UPSERT_FILE, file_rows)
+        self.posts_written += len(post_rows)
+        return len(post_rows)
+
+    def write_thread(self, thread):
+        """Write a thread and every one of its posts.
+
+        Returns:
+            int: Number of posts written.
+        """
+        return self._write([(thread, thread._post_json())])
+
+    def write_threads(self, threads):
+        """Write many threads and all their posts, in a single transaction.
+
+        Returns:
+            int: Number of posts written.
+        """
+        return self._write([(thread, thread._post_json()) for thread in threads])
+
+    def write_new(self, thread, count):
+        """Write the OP and the last ``count`` replies of a thread.
+
+        Args:
+            thread (:class:`basc_py4chan.Thread`): The thread.
+            count (int): How many replies are new, as returned by
+                :meth:`basc_py4chan.Thread.update`.
+
+        Returns:
+            int: Number of posts written.
+        """
+        return self._write([(thread, _new_post_json(thread, count))])
+
+    def write_delta(self, thread, delta):
+        """Write the changes to a thread found by :meth:`basc_py4chan.Thread.update_diff`.
+
+        Added and modified posts are written, and removed posts are marked
+        ``deleted``.
+
+        Returns:
+            int: Number of posts written or marked deleted.
+        """
+        written = self._write([(thread, _changed_post_json(thread, delta))])
+        if delta.removed:
+            board = thread._board.name
+            with self._db:
+                self._db.executemany('UPDATE posts SET deleted = 1 WHERE board = ? AND post_id = ?',
+                                     [(board, post.post_id) for post in delta.removed])
+        return written + len(delta.removed)
+
+    def thread_ids(self, board):
+        """Returns the set of IDs of the threads stored for a board.
+
+        Suitable as the ``skip`` argument of :meth:`basc_py4chan.Board.backfill_archive`.
+        """
+        return set(row[0] for row in self._db.execute(
+            'SELECT thread_id FROM threads WHERE board = ?', (board,)))
+
+    def post_count(self, board=None):
+        """Returns the number of posts stored, on one board or in total."""
+        if board is None:
+            return self._db.execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+        return self._db.execute('SELECT COUNT(*) FROM posts WHERE board = ?', (board,)).fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return '<SQLiteArchive %s>' % self.path
@@ -1,7 +1,60 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+from collections import namedtuple
+
+import requests
+
+from .columnar import threads_to_columns
 from .post import Post
-from .url import Url
+from .postlist import PostList, ThreadPosts
+from .replyindex import ReplyIndex
+from . import snapshot
+
+
+# fields of a post that can change after it is made
+_REPLY_KEYS = ('com', 'filedeleted', 'spoiler')
+_TOPIC_KEYS = _REPLY_KEYS + ('sticky', 'closed', 'archived', 'bumplimit', 'imagelimit')
+
+
+# a response body cut short: a dropped connection, or JSON that ends early
+_BODY_ERRORS = (requests.RequestException, ValueError)
+
+
+def _changed(old, new, keys):
+    for key in keys:
+        if old.get(key) != new.get(key):
+            return True
+    return False
+
+
+class ThreadDelta(namedtuple('ThreadDelta', 'added removed modified')):
+    """What changed in a thread, as found by :meth:`Thread.update_diff`.
+
+    Attributes:
+        added (list of :class:`basc_py4chan.Post`): New posts, in thread order.
+        removed (list of :class:`basc_py4chan.Post`): Posts deleted on the server,
+            and removed from the thread.
+        modified (list of :class:`basc_py4chan.Post`): Posts whose comment, file
+            or, for the OP, thread flags changed. These replace the old posts.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+    __nonzero__ = __bool__
+
+
+def _first_after(posts, post_id):
+    # index of the first reply numbered above post_id, by bisecting the posts,
+    # which the API always sends in order; posts[0] is the OP and never new
+    lo, hi = 1, len(posts)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if posts[mid]['no'] <= post_id:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
 
 
 class Thread(object):
@@ -15,28 +68,64 @@ class Thread(object):
         imagelimit (bool): Whether the thread has hit the image limit.
         custom_spoiler (int): Number of custom spoilers in the thread (if the board supports it)
         topic (:class:`basc_py4chan.Post`): Topic post of the thread, the OP.
+        replies (:class:`basc_py4chan.postlist.PostList`): List of replies to the OP.
+            Post objects are built the first time each reply is accessed.
         posts (list of :class:`basc_py4chan.Post`): List of all posts in the thread, including the OP.
         all_posts (list of :class:`basc_py4chan.Post`): List of all posts in the thread, including the OP and any omitted posts.
         url (string): URL of the thread, not including semantic slug.
         semantic_url (string): URL of the thread, with the semantic slug.
         semantic_slug (string): The 'pretty URL slug' assigned to this thread by 4chan.
+        reply_index (:class:`basc_py4chan.replyindex.ReplyIndex`): Which posts quote which,
+            updated with the replies added since it was last read.
     """
     def __init__(self, board, id):
         self._board = board
-        self._url = Url(board_name=board.name, https=board.https)       # 4chan URL generator
+        self._url = board._url       # 4chan URL generator, shared by the whole board
         self.id = self.number = self.num = self.no = id
         self.topic = None
-        self.replies = []
+        self.replies = PostList(self)
         self.is_404 = False
         self.last_reply_id = 0
         self.omitted_posts = 0
         self.omitted_images = 0
         self.want_update = False
         self._last_modified = None
+        self._listing_modified = None
+        self._reply_index = None
+        # why the last update failed, or None if it didn't
+        self._update_error = None
+
+    def _new_post(self, data):
+        # replies are built by the board, so it can hand out compact posts
+        return self._board._post_factory(self, data)
+
+    def _wrap_post(self, data):
+        return data if self._board._lazy_posts else self._new_post(data)
+
+    def _wrap_posts(self, posts):
+        # replies are kept as JSON until accessed, unless the board drops the JSON
+        # of compact posts, which only saves memory if they are built right away
+        if self._board._lazy_posts:
+            return posts
+        return (self._new_post(p) for p in posts)
 
     def __len__(self):
         return self.num_replies
 
+    def __contains__(self, post_id):
+        # post numbers, or the posts themselves
+        post_id = getattr(post_id, 'post_id', post_id)
+        return post_id == self.topic.post_id or self.replies.has_post(post_id)
+
+    def get_post(self, post_id):
+        """Returns the post numbered ``post_id`` in this thread, or None.
+
+        Looks the post up in an index of post numbers, instead of searching.
+        """
+        if post_id == self.topic.post_id:
+            return self.topic
+        return self.replies.get_post(post_id)
+
     @property
     def _api_url(self):
         return self._url.thread_api_url(self.id)
@@ -72,18 +161,19 @@ class Thread(object):
 
         res.raise_for_status()
 
-        return cls._from_json(res.json(), board, id, res.headers['Last-Modified'])
+        return cls._from_json({'posts': board._response_posts(res)}, board, id, res.headers['Last-Modified'])
 
     @classmethod
     def _from_json(cls, json, board, id=None, last_modified=None):
         t = cls(board, id)
         t._last_modified = last_modified
 
-        posts = json['posts']
-        head, rest = posts[0], posts[1:]
+        # may be an iterator, when the response is being streamed
+        posts = iter(json['posts'])
+        head = next(posts)
 
         t.topic = t.op = Post(t, head)
-        t.replies.extend(Post(t, p) for p in rest)
+        t.replies.extend(t._wrap_posts(posts))
 
         t.id = head.get('no', id)
         t.num_replies = head['replies']
@@ -95,44 +185,116 @@ class Thread(object):
             if not t.replies:
                 t.last_reply_id = t.topic.post_number
             else:
-                t.last_reply_id = t.replies[-1].post_number
+                t.last_reply_id = t.replies.post_id(-1)
 
         else:
             t.want_update = True
 
         return t
 
+    @classmethod
+    def _from_snapshot(cls, board, state):
+        t = cls._from_json({'posts': state.posts}, board, state.thread_id, state.last_modified)
+        t._listing_modified = state.listing_modified
+        t.last_reply_id = state.last_reply_id
+        t.want_update = state.want_update
+        return t
+
+    def _snapshot(self):
+        # everything needed to rebuild the thread, as plain values marshal can write
+        return snapshot.ThreadState(self.id, self._last_modified, self._listing_modified,
+                                    self.last_reply_id, self.want_update, list(self._post_json()))
+
+    @classmethod
+    def from_snapshot(cls, board, data):
+        """Rebuild a thread from a snapshot made by :meth:`to_snapshot`.
+
+        The thread is ready to :meth:`update` with a conditional request, as if
+        it had never been unloaded. It is not added to the board's cache.
+
+        Args:
+            board (:class:`basc_py4chan.Board`): Board the thread is on.
+            data (bytes): The snapshot.
+
+        Returns:
+            :class:`basc_py4chan.Thread`: The thread.
+
+        Raises:
+            ValueError: The snapshot is of another board, or unreadable, see
+                :func:`basc_py4chan.snapshot.loads`.
+        """
+        board_name, states = snapshot.loads(data)
+        if board_name != board.name or len(states) != 1:
+            raise ValueError('not a snapshot of one thread on /%s/' % board.name)
+        return cls._from_snapshot(board, states[0])
+
+    def to_snapshot(self, level=1):
+        """Returns a compressed binary snapshot of the thread.
+
+        The snapshot holds every post's JSON along with the Last-Modified date
+        and last reply ID used by :meth:`update`, so a thread restored with
+        :meth:`from_snapshot` only fetches what changed since.
+
+        Args:
+            level (int): zlib compression level.
+
+        Returns:
+            bytes: The snapshot.
+        """
+        return snapshot.dumps(self._board.name, [self._snapshot()], level)
+
+    def _post_json(self):
+        # raw API data of every post, for code that doesn't need Post objects
+        yield self.topic._data
+        for data in self.replies.raw():
+            yield data
+
+    @property
+    def reply_index(self):
+        # built on first use, then brought up to date with new replies on every read
+        if self._reply_index is None:
+            self._reply_index = ReplyIndex(self)
+        self._reply_index.refresh()
+        return self._reply_index
+
+    def replies_to(self, post_id):
+        """Returns the IDs of the posts in this thread quoting ``post_id``."""
+        return self.reply_index.replies_to(post_id)
+
+    def most_replied(self, n=10):
+        """Returns the ``n`` most quoted posts of this thread, as (post ID, reply count) pairs."""
+        return self.reply_index.most_replied(n)
+
+    def to_columns(self, use_numpy=None):
+        """Returns the posts of this thread as a dict of columns.
+
+        See :func:`basc_py4chan.columnar.threads_to_columns`.
+        """
+        return threads_to_columns([self], use_numpy)
+
     def files(self):
         """Returns the URLs of all files attached to posts in the thread."""
-        if self.topic.has_file:
-            yield self.topic.file.file_url
-        for reply in self.replies:
-            if reply.has_file:
-                yield reply.file.file_url
+        for data in self._post_json():
+            if 'filename' in data:
+                yield self._url.file_url(data['tim'], data['ext'])
 
     def thumbs(self):
         """Returns the URLs of all thumbnails in the thread."""
-        if self.topic.has_file:
-            yield self.topic.file.thumbnail_url
-        for reply in self.replies:
-            if reply.has_file:
-                yield reply.file.thumbnail_url
+        for data in self._post_json():
+            if 'filename' in data:
+                yield self._url.thumb_url(data['tim'])
 
     def filenames(self):
         """Returns the filenames of all files attached to posts in the thread."""
-        if self.topic.has_file:
-            yield self.topic.file.filename
-        for reply in self.replies:
-            if reply.has_file:
-                yield reply.file.filename
+        for data in self._post_json():
+            if 'filename' in data:
+                yield '%s%s' % (data['tim'], data['ext'])
 
     def thumbnames(self):
         """Returns the filenames of all thumbnails in the thread."""
-        if self.topic.has_file:
-            yield self.topic.file.thumbnail_fname
-        for reply in self.replies:
-            if reply.has_file:
-                yield reply.file.thumbnail_fname
+        for data in self._post_json():
+            if 'filename' in data:
+                yield '%ss.jpg' % data['tim']
 
     def file_objects(self):
         """Returns the :class:`basc_py4chan.File` objects of all files attached to posts in the thread."""
@@ -151,67 +313,224 @@ class Thread(object):
         Returns:
             int: How many new posts have been fetched.
         """
+        res = self._request_update(force)
+        if res is None:
+            return 0
+        try:
+            posts = self._board._response_posts(res)
+            return self._apply_update(posts, res.headers['Last-Modified'], force)
+        except _BODY_ERRORS as e:
+            # nothing is applied until the whole body has been read, so the
+            # next update asks for the same posts again
+            self._update_error = e
+            res.close()
+            return 0
+
+    def update_diff(self, force=False):
+        """Fetch the thread and bring every post up to date, not just new ones.
+
+        Unlike :meth:`update`, posts deleted on the server are removed from
+        :attr:`replies`, and posts whose comment or file changed (for example
+        a deleted file, or a ban message) are replaced. The fresh posts are
+        merged with the current ones in a single pass, so posts that didn't
+        change are kept as they are rather than rebuilt.
+
+        Arguments:
+            force (bool): Fetch the thread even if it has 404'd.
+
+        Returns:
+            :class:`basc_py4chan.thread.ThreadDelta`: The posts that were added,
+            removed and modified. Empty if nothing changed or the thread 404'd.
+        """
+        res = self._request_update(force)
+        if res is None:
+            return ThreadDelta([], [], [])
+        try:
+            posts = self._board._response_posts(res)
+            return self._apply_diff(posts, res.headers['Last-Modified'])
+        except _BODY_ERRORS as e:
+            # like update(), a body cut short leaves the thread as it was
+            self._update_error = e
+            res.close()
+            return ThreadDelta([], [], [])
+
+    def _request_update(self, force):
+        # the response to an update request, or None if there is nothing to update
 
         # The thread has already 404'ed, this function shouldn't do anything anymore.
         if self.is_404 and not force:
-            return 0
-
-        if self._last_modified:
-            headers = {'If-Modified-Since': self._last_modified}
-        else:
-            headers = None
+            return None
 
         # random connection errors, just return 0 and try again later
+        self._update_error = None
         try:
-            res = self._board._requests_session.get(self._api_url, headers=headers)
-        except:
+            res = self._board._get(self._api_url, headers=self._update_headers())
+        except Exception as e:
             # try again later
-            return 0
+            self._update_error = e
+            return None
 
         # 304 Not Modified, no new posts.
         if res.status_code == 304:
-            return 0
+            res.close()
+            return None
 
         # 404 Not Found, thread died.
         elif res.status_code == 404:
-            self.is_404 = True
-            # remove post from cache, because it's gone.
-            self._board._thread_cache.pop(self.id, None)
-            return 0
+            res.close()
+            self._mark_404()
+            self._update_error = requests.HTTPError('404 Client Error: Not Found for url: %s' % res.url,
+                                                    response=res)
+            return None
 
         elif res.status_code == 200:
-            # If we somehow 404'ed, we should put ourself back in the cache.
-            if self.is_404:
-                self.is_404 = False
-                self._board._thread_cache[self.id] = self
+            return res
+
+        else:
+            res.raise_for_status()
+
+    def _update_headers(self):
+        if self._last_modified:
+            return {'If-Modified-Since': self._last_modified}
+        return None
 
-            # Remove
-            self.want_update = False
-            self.omitted_images = 0
-            self.omitted_posts = 0
+    def _mark_404(self):
+        self.is_404 = True
+        # remove post from cache, because it's gone.
+        self._board._thread_cache.pop(self.id, None)
 
-            self._last_modified = res.headers['Last-Modified']
-            posts = res.json()['posts']
+    def _begin_update(self, last_modified):
+        # If we somehow 404'ed, we should put ourself back in the cache.
+        if self.is_404:
+            self.is_404 = False
+            self._board._thread_cache[self.id] = self
 
-            original_post_count = len(self.replies)
-            self.topic = Post(self, posts[0])
+        # Remove
+        self.want_update = False
+        self.omitted_images = 0
+        self.omitted_posts = 0
+
+        self._last_modified = last_modified
 
-            if self.last_reply_id and not force:
-                self.replies.extend(Post(self, p) for p in posts if p['no'] > self.last_reply_id)
+    def _end_update(self):
+        # a cache that limits its size, such as ThreadCache, measures us again
+        updated = getattr(self._board._thread_cache, 'thread_updated', None)
+        if updated is not None:
+            updated(self)
+
+    def _apply_update(self, posts, last_modified, force=False):
+        """Merge a fresh copy of the thread's posts, as returned by the API.
+
+        Shared by every transport that fetches thread JSON, so that the
+        synchronous and asynchronous clients update threads identically.
+        """
+        # read the whole response before changing anything, so that a body
+        # cut short leaves the thread, and its Last-Modified, as they were
+        incremental = self.last_reply_id and not force
+        if isinstance(posts, list):
+            topic = posts[0]
+            if incremental:
+                # posts come in order, so the new ones are all those after the split
+                new_posts = posts[_first_after(posts, self.last_reply_id):]
             else:
-                self.replies[:] = [Post(self, p) for p in posts[1:]]
+                new_posts = posts[1:]
+        else:
+            # an iterator, when the response is being streamed
+            posts = iter(posts)
+            topic = next(posts)
+            if incremental:
+                new_posts = [p for p in posts if p['no'] > self.last_reply_id]
+            else:
+                new_posts = list(posts)
+
+        self._begin_update(last_modified)
+        original_post_count = len(self.replies)
+        self.topic = Post(self, topic)
+        if incremental:
+            self.replies.extend(self._wrap_posts(new_posts))
+        else:
+            self.replies[:] = list(self._wrap_posts(new_posts))
+
+        self._end_update()
+
+        new_post_count = len(self.replies)
+        post_count_delta = new_post_count - original_post_count
+        if not post_count_delta:
+            return 0
 
-            new_post_count = len(self.replies)
-            post_count_delta = new_post_count - original_post_count
-            if not post_count_delta:
-                return 0
+        self.last_reply_id = self.replies.post_id(-1)
 
-            self.last_reply_id = self.replies[-1].post_number
+        return post_count_delta
 
-            return post_count_delta
+    def _apply_diff(self, posts, last_modified):
+        """Merge a fresh copy of the thread's posts, including deletions and edits.
 
+        Both lists are sorted by post number, so one merge pass finds every
+        added, removed and modified post. Shared by the synchronous and
+        asynchronous clients, like :meth:`_apply_update`.
+        """
+        # may be an iterator, when the response is being streamed; read it
+        # all before changing anything
+        posts = list(posts)
+        self._begin_update(last_modified)
+
+        old_topic = self.topic
+        self.topic = Post(self, posts[0])
+        topic_modified = old_topic is not None and _changed(old_topic._data, posts[0], _TOPIC_KEYS)
+
+        replies = self.replies
+        old_count = len(replies)
+        merged = []
+        added = []         # positions in merged
+        modified = []      # positions in merged
+        removed = []
+        i, j = 0, 1
+        while i < old_count and j < len(posts):
+            old_id = replies.post_id(i)
+            data = posts[j]
+            if old_id == data['no']:
+                item = replies._items[i]
+                if _changed(item if type(item) is dict else item._data, data, _REPLY_KEYS):
+                    item = self._wrap_post(data)
+                    modified.append(len(merged))
+                merged.append(item)
+                i += 1
+                j += 1
+            elif old_id < data['no']:
+                # deleted on the server
+                removed.append(replies[i])
+                i += 1
+            else:
+                # older than what we have, such as posts a preview omitted
+                added.append(len(merged))
+                merged.append(self._wrap_post(data))
+                j += 1
+        while i < old_count:
+            removed.append(replies[i])
+            i += 1
+
+        tail = posts[j:]
+        if removed or added:
+            added.extend(range(len(merged), len(merged) + len(tail)))
+            replies[:] = merged + [self._wrap_post(data) for data in tail]
         else:
-            res.raise_for_status()
+            # nothing moved: swap modified posts in place and append the rest
+            for index in modified:
+                replies[index] = merged[index]
+            added.extend(range(old_count, old_count + len(tail)))
+            replies.extend(self._wrap_posts(tail))
+
+        if removed or modified:
+            # quotes in posts that are gone or edited may no longer hold
+            self._reply_index = None
+        self.last_reply_id = replies.post_id(-1) if replies else self.topic.post_id
+
+        self._end_update()
+
+        modified_posts = [replies[index] for index in modified]
+        if topic_modified:
+            modified_posts.insert(0, self.topic)
+        return ThreadDelta([replies[index] for index in added], removed, modified_posts)
 
     def expand(self):
         """If there are omitted posts, update to include all posts."""
@@ -220,7 +539,7 @@ class Thread(object):
 
     @property
     def posts(self):
-        return [self.topic] + self.replies
+        return ThreadPosts(self)
 
     @property
     def all_posts(self):
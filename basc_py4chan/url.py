@@ -1,8 +1,67 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+from string import Formatter
+
+
+class _Template(object):
+    """URL template, pre-split into a %-format string with the board name filled in.
+
+    Generating a URL is then a single string interpolation, instead of a
+    str.format() call that parses the template every time.
+    """
+    __slots__ = ('_format', '_order', 'template')
+
+    def __init__(self, template, fields, **fixed):
+        self.template = template
+        parts = []
+        order = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            parts.append(literal.replace('%', '%%'))
+            if field is None:
+                continue
+            if spec or conversion:
+                # not something we can pre-split, fall back to str.format
+                self._format = None
+                self._order = (fields, fixed)
+                return
+            if field in fixed:
+                parts.append(('%s' % fixed[field]).replace('%', '%%'))
+            else:
+                parts.append('%s')
+                order.append(fields.index(field))
+        self._format = ''.join(parts)
+        # None if arguments can be interpolated as they are passed
+        self._order = None if order == list(range(len(fields))) else order
+
+    def __call__(self, *args):
+        if self._order is None:
+            return self._format % args
+        if self._format is None:
+            fields, values = self._order
+            values = dict(values, **dict(zip(fields, args)))
+            return self.template.format(**values)
+        return self._format % tuple(args[i] for i in self._order)
+
+
+# name -> (URL dictionary section, key, positional fields of the generator method)
+_TEMPLATES = {
+    'board_list': ('listing', 'board_list', ()),
+    'page': ('api', 'board', ('page',)),
+    'catalog': ('listing', 'catalog', ()),
+    'thread_list': ('listing', 'thread_list', ()),
+    'archived_thread_list': ('listing', 'archived_thread_list', ()),
+    'thread_api': ('api', 'thread', ('thread_id',)),
+    'thread': ('http', 'thread', ('thread_id',)),
+    'file': ('data', 'file', ('tim', 'ext')),
+    'thumb': ('data', 'thumbs', ('tim',)),
+}
+
 
 # 4chan URL generator. Inherit and override this for derivative classes  (e.g. 420chan API, 8chan/vichan API)
 class Url(object):
+    # interned generators, see Url.shared()
+    _shared = {}
+
     # default value for board in case user wants to query board list
     def __init__(self, board_name, https=False):
         self._board_name = board_name
@@ -49,63 +108,65 @@ class Url(object):
         self.URL.update({'domain': DOMAIN})
         self.URL.update({'listing': LISTING})
 
+    # return a generator shared by everything using this site, board and protocol
+    @classmethod
+    def shared(cls, board_name, https=False):
+        key = (cls, board_name, bool(https))
+        url = cls._shared.get(key)
+        if url is None:
+            url = cls._shared.setdefault(key, cls(board_name=board_name, https=https))
+        return url
+
+    # compile URL templates the first time one is needed. This is done lazily
+    # so subclasses that build self.URL themselves get compiled templates too.
+    def __getattr__(self, name):
+        if name != '_templates':
+            raise AttributeError(name)
+        templates = {}
+        for key, (section, template, fields) in _TEMPLATES.items():
+            try:
+                templates[key] = _Template(self.URL[section][template], fields,
+                                           board=self._board_name)
+            except KeyError:
+                pass
+        self._templates = templates
+        return templates
+
     # generate boards listing URL
     def board_list(self):
         return self.URL['listing']['board_list']
 
     # generate board page URL
     def page_url(self, page):
-        return self.URL['api']['board'].format(
-            board=self._board_name,
-            page=page
-            )
+        return self._templates['page'](page)
 
     # generate catalog URL
     def catalog(self):
-        return self.URL['listing']['catalog'].format(
-            board=self._board_name
-            )
+        return self._templates['catalog']()
 
     # generate threads listing URL
     def thread_list(self):
-        return self.URL['listing']['thread_list'].format(
-            board=self._board_name
-            )
+        return self._templates['thread_list']()
 
-#    # generate archived threads list URL (disabled for compatibility)
-#    def archived_thread_list(self):
-#        return self.URL['listing']['archived_thread_list'].format(
-#            board=self._board_name
-#            )
+    # generate archived threads list URL
+    def archived_thread_list(self):
+        return self._templates['archived_thread_list']()
 
     # generate API thread URL
     def thread_api_url(self, thread_id):
-        return self.URL['api']['thread'].format(
-            board=self._board_name,
-            thread_id=thread_id
-            )
+        return self._templates['thread_api'](thread_id)
 
     # generate HTTP thread URL
     def thread_url(self, thread_id):
-        return self.URL['http']['thread'].format(
-            board=self._board_name,
-            thread_id=thread_id
-            )
+        return self._templates['thread'](thread_id)
 
     # generate file URL
     def file_url(self, tim, ext):
-        return self.URL['data']['file'].format(
-            board=self._board_name,
-            tim=tim,
-            ext=ext
-            )
+        return self._templates['file'](tim, ext)
 
     # generate thumb URL
     def thumb_url(self, tim):
-        return self.URL['data']['thumbs'].format(
-            board=self._board_name,
-            tim=tim
-            )
+        return self._templates['thumb'](tim)
 
     # return entire URL dictionary
     @property
@@ -18,14 +18,55 @@ else:
 
     _parser = HTMLParser()
 
+# every tag left once <br> and <wbr> are dealt with; a literal < in a comment
+# is always escaped, so anything between angle brackets is markup
+_TAG = re.compile(r'<[^>]+>')
+
+# entities 4chan escapes comment text with, other than &amp;
+_ENTITIES = (('&gt;', '>'), ('&lt;', '<'), ('&quot;', '"'), ('&#039;', "'"))
+
+# joins comments cleaned in one go by clean_comment_bodies
+_SEPARATOR = '\x00'
+
+
 def clean_comment_body(body):
     """Returns given comment HTML as plaintext.
 
     Converts all HTML tags and entities within 4chan comments
     into human-readable text equivalents.
     """
-    body = _parser.unescape(body)
-    body = re.sub(r'<a [^>]+>(.+?)</a>', r'\1', body)
-    body = body.replace('<br>', '\n')
-    body = re.sub(r'<.+?>', '', body)
-    return body
+    body = body.replace('<br>', '\n').replace('<wbr>', '')
+    if '<' in body:
+        # quotelinks, greentext and spoilers keep their text
+        body = _TAG.sub('', body)
+    # entities are decoded last, so escaped text is never taken for a tag
+    return _unescape(body)
+
+
+def _unescape(text):
+    # str.replace() for the entities 4chan uses, unescape() for anything else
+    if '&' in text:
+        for entity, char in _ENTITIES:
+            text = text.replace(entity, char)
+        if '&' in text:
+            if text.count('&') == text.count('&amp;'):
+                text = text.replace('&amp;', '&')
+            else:
+                text = _parser.unescape(text)
+    return text
+
+
+def clean_comment_bodies(bodies):
+    """Returns a list of the given comments' HTML as plaintext.
+
+    Same as calling :func:`clean_comment_body` on each comment, but cleans them
+    all together as one string, which is much faster for many short comments.
+    """
+    bodies = list(bodies)
+    joined = _SEPARATOR.join(bodies)
+    if joined.count(_SEPARATOR) == len(bodies) - 1:
+        cleaned = clean_comment_body(joined).split(_SEPARATOR)
+        # a stray < in one comment could swallow the separator after it
+        if len(cleaned) == len(bodies):
+            return cleaned
+    return [clean_comment_body(body) for body in bodies]
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Watching threads for new posts, polling each as often as it needs."""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .scheduler import PRIORITY_LIVE, request_priority
+
+# why a thread stopped being watched
+RETIRED_404 = '404'
+RETIRED_ARCHIVED = 'archived'
+RETIRED_BUMPLIMIT = 'bumplimit'
+
+
+class WatchEvent(namedtuple('WatchEvent', 'thread posts retired')):
+    """Something that happened to a watched thread.
+
+    Attributes:
+        thread (:class:`basc_py4chan.Thread`): The thread.
+        posts (list of :class:`basc_py4chan.Post`): Posts that arrived since it was last polled.
+        retired (string): Why the thread is no longer watched (``'404'``,
+            ``'archived'`` or ``'bumplimit'``), or None if it still is.
+    """
+    __slots__ = ()
+
+
+class _Watch(object):
+    __slots__ = ('thread', 'interval', 'due', 'checked')
+
+    def __init__(self, thread, interval, now):
+        self.thread = thread
+        self.interval = interval
+        self.due = now
+        self.checked = None
+
+
+class ThreadWatcher(object):
+    """Polls a set of threads for new posts, each at its own pace.
+
+    Every thread starts out polled every ``min_interval`` seconds. Each poll
+    that finds nothing new (including a 304 Not Modified) multiplies the
+    thread's interval by ``backoff``, up to ``max_interval``; each poll that
+    finds new posts multiplies it by ``speedup``, down to ``min_interval``.
+    Busy threads are thus checked often and quiet ones rarely.
+
+    Threads that 404, are archived or reach the bump limit are retired and no
+    longer polled.
+
+    New posts are passed to the ``on_posts`` callback, and retired threads to
+    ``on_retire``. Iterating over the watcher polls threads as they fall due
+    and yields a :class:`WatchEvent` for each, until no threads are left or
+    :meth:`stop` is called.
+
+    Updates are sent with :data:`basc_py4chan.scheduler.PRIORITY_LIVE`, so with
+    a :class:`basc_py4chan.scheduler.ScheduledSession` they go ahead of
+    backfill requests.
+
+    Attributes:
+        min_interval (float): Shortest time between two polls of a thread, in seconds.
+        max_interval (float): Longest time between two polls of a thread, in seconds.
+        requests (int): Thread updates sent so far.
+    """
+    def __init__(self, threads=(), min_interval=10.0, max_interval=600.0, backoff=1.5,
+                 speedup=0.5, retire_bumplimit=True, on_posts=None, on_retire=None,
+                 workers=1, clock=time.time, sleep=None):
+        """Creates a :class:`basc_py4chan.watcher.ThreadWatcher` object.
+
+        Args:
+            threads (list of :class:`basc_py4chan.Thread`): Threads to start watching.
+            min_interval (float): Shortest time between two polls of a thread.
+                The 4chan API asks for at least 10 seconds.
+            max_interval (float): Longest time between two polls of a thread.
+            backoff (float): Factor applied to a thread's interval when a poll finds nothing.
+            speedup (float): Factor applied to a thread's interval when a poll finds new posts.
+            retire_bumplimit (bool): Whether to stop watching threads past the bump limit.
+            on_posts: Function called with a thread and a list of its new posts.
+            on_retire: Function called with a thread and why it was retired.
+            workers (int): Number of threads updated at once.
+            clock: Function returning the current time in seconds.
+            sleep: Function sleeping for a number of seconds. By default the
+                sleep is cut short by :meth:`stop`.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.speedup = speedup
+        self.retire_bumplimit = retire_bumplimit
+        self.on_posts = on_posts
+        self.on_retire = on_retire
+        self.workers = workers
+        self._clock = clock
+
+        # (board name, thread id) -> _Watch
+        self._watches = {}
+        # (due, sequence, key) of every watch, including stale ones
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sleep = sleep or self._stopped.wait
+        self.requests = 0
+
+        for thread in threads:
+            self.add(thread)
+
+    @staticmethod
+    def _key(thread):
+        return thread._board.name, thread.id
+
+    def _schedule(self, key, watch):
+        heapq.heappush(self._queue, (watch.due, next(self._sequence), key))
+
+    def add(self, thread):
+        """Start watching a thread. It is polled on the next :meth:`poll`."""
+        key = self._key(thread)
+        with self._lock:
+            if key in self._watches:
+                return
+            watch = self._watches[key] = _Watch(thread, self.min_interval, self._clock())
+            self._schedule(key, watch)
+
+    def remove(self, thread):
+        """Stop watching a thread."""
+        with self._lock:
+            self._watches.pop(self._key(thread), None)
+
+    def __contains__(self, thread):
+        return self._key(thread) in self._watches
+
+    def __len__(self):
+        return len(self._watches)
+
+    @property
+    def threads(self):
+        """list of :class:`basc_py4chan.Thread`: Threads being watched."""
+        return [watch.thread for watch in self._watches.values()]
+
+    def interval(self, thread):
+        """Returns the current poll interval of a watched thread, in seconds."""
+        return self._watches[self._key(thread)].interval
+
+    def next_due(self):
+        """Returns the number of seconds until a thread is due, or None if none are watched."""
+        with self._lock:
+            while self._queue:
+                due, sequence, key = self._queue[0]
+                watch = self._watches.get(key)
+                if watch is not None and watch.due == due:
+                    return max(0.0, due - self._clock())
+                # removed, or rescheduled since
+                heapq.heappop(self._queue)
+        return None
+
+    def _due(self):
+        now = self._clock()
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                when, sequence, key = heapq.heappop(self._queue)
+                watch = self._watches.get(key)
+                if watch is not None and watch.due == when:
+                    due.append((key, watch))
+        return due
+
+    def _update(self, watch):
+        with request_priority(PRIORITY_LIVE):
+            try:
+                # anything but a 200, 304 or 404 gives None
+                return watch.thread.update() or 0
+            except Exception:
+                # treat like an unchanged thread, and back off, so one broken
+                # thread doesn't stop the others being polled
+                return 0
+
+    def _retire_reason(self, thread):
+        if thread.is_404:
+            return RETIRED_404
+        if thread.archived:
+            return RETIRED_ARCHIVED
+        if self.retire_bumplimit and thread.bumplimit:
+            return RETIRED_BUMPLIMIT
+        return None
+
+    def poll(self):
+        """Update every thread that is due, once.
+
+        Returns:
+            list of :class:`WatchEvent`: Threads that got new posts or were retired.
+        """
+        due = self._due()
+        events = []
+        handled = 0
+        try:
+            if self.workers > 1 and len(due) > 1:
+                executor = ThreadPoolExecutor(max_workers=self.workers)
+                try:
+                    counts = list(executor.map(self._update, [watch for key, watch in due]))
+                finally:
+                    executor.shutdown()
+            else:
+                counts = [self._update(watch) for key, watch in due]
+
+            for (key, watch), count in zip(due, counts):
+                handled += 1
+                self.requests += 1
+                thread = watch.thread
+                posts = thread.replies[-count:] if count > 0 else []
+                retired = self._retire_reason(thread)
+
+                with self._lock:
+                    now = self._clock()
+                    watch.checked = now
+                    if retired is not None:
+                        self._watches.pop(key, None)
+                    elif key in self._watches:
+                        if count > 0:
+                            watch.interval = max(self.min_interval, watch.interval * self.speedup)
+                        else:
+                            watch.interval = min(self.max_interval, watch.interval * self.backoff)
+                        watch.due = now + watch.interval
+                        self._schedule(key, watch)
+
+                if posts and self.on_posts is not None:
+                    self.on_posts(thread, posts)
+                if retired is not None and self.on_retire is not None:
+                    self.on_retire(thread, retired)
+                if posts or retired is not None:
+                    events.append(WatchEvent(thread, posts, retired))
+        finally:
+            # if something raised, the threads not handled yet stay due,
+            # rather than dropping out of the queue for good
+            with self._lock:
+                for key, watch in due[handled:]:
+                    if self._watches.get(key) is watch:
+                        self._schedule(key, watch)
+        return events
+
+    def __iter__(self):
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            wait = self.next_due()
+            if wait is None:
+                return
+            if wait:
+                self._sleep(wait)
+                continue
+            for event in self.poll():
+                yield event
+
+    def run(self):
+        """Poll threads as they fall due until none are left or :meth:`stop` is called.
+
+        New posts and retired threads are passed to the callbacks.
+        """
+        for event in self:
+            pass
+
+    def stop(self):
+        """Make :meth:`run`, or a loop over the watcher, return after the current poll."""
+        self._stopped.set()
+
+    def __repr__(self):
+        return '<ThreadWatcher %i threads>' % len(self._watches)
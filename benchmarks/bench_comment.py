@@ -0,0 +1,44 @@
+# bench_comment.py - comment HTML cleaning and parsing throughput
+#
+# Usage: python benchmarks/bench_comment.py
+from __future__ import print_function
+import re
+import timeit
+
+from fixtures import make_board, make_thread_json
+from basc_py4chan import Thread
+from basc_py4chan.comment import parse_comment
+from basc_py4chan.util import _parser, clean_comment_body, clean_comment_bodies
+
+
+def legacy_clean_comment_body(body):
+    """How comments used to be cleaned: unescape first, regexes compiled on every call."""
+    body = _parser.unescape(body)
+    body = re.sub(r'<a [^>]+>(.+?)</a>', r'\1', body)
+    body = body.replace('<br>', '\n')
+    body = re.sub(r'<.+?>', '', body)
+    return body
+
+
+def rate(stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    return number / best
+
+
+def main():
+    thread_json = make_thread_json(1000000, 1000)
+    bodies = [post['com'] for post in thread_json['posts']]
+    number = 20
+    print('Cleaning %i comments, comments/sec' % len(bodies))
+    print('  %-28s %12.0f' % ('legacy', rate(lambda: [legacy_clean_comment_body(b) for b in bodies], number) * len(bodies)))
+    print('  %-28s %12.0f' % ('clean_comment_body', rate(lambda: [clean_comment_body(b) for b in bodies], number) * len(bodies)))
+    print('  %-28s %12.0f' % ('parse_comment', rate(lambda: [parse_comment(b) for b in bodies], number) * len(bodies)))
+    print('  %-28s %12.0f' % ('clean_comment_bodies', rate(lambda: clean_comment_bodies(bodies), number) * len(bodies)))
+
+    thread = Thread._from_json(thread_json, make_board(), 1000000)
+    posts = list(thread.posts)
+    print('  %-28s %12.0f' % ('Post.text_comment, reread', rate(lambda: [p.text_comment for p in posts], number) * len(posts)))
+
+
+if __name__ == '__main__':
+    main()
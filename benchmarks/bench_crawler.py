@@ -0,0 +1,47 @@
+# bench_crawler.py - how the CPU side of a ShardedCrawler scales with processes
+#
+# Each task decodes thread JSON, builds the threads and snapshots them, like a
+# crawler worker does after its downloads; the parent restores every batch.
+# No network is involved.
+#
+# Usage: python benchmarks/bench_crawler.py
+from __future__ import print_function
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fixtures import make_board, make_thread_json
+from basc_py4chan import Thread, snapshot
+
+TASKS = 32
+THREADS_PER_TASK = 25
+
+
+def _task(first_id):
+    documents = [json.dumps(make_thread_json(first_id + i * 1000, 300))
+                 for i in range(THREADS_PER_TASK)]
+    board = make_board()
+    threads = [Thread._from_json(json.loads(document), board, first_id + i * 1000)
+               for i, document in enumerate(documents)]
+    return snapshot.dumps('g', [thread._snapshot() for thread in threads])
+
+
+def main():
+    board = make_board()
+    for processes in sorted(set([1, 2, 4, multiprocessing.cpu_count()])):
+        executor = ProcessPoolExecutor(max_workers=processes)
+        # start the workers before timing
+        list(executor.map(abs, range(processes)))
+        start = time.time()
+        for data in executor.map(_task, [1000000 + i * 100000 for i in range(TASKS)]):
+            board_name, states = snapshot.loads(data)
+            [Thread._from_snapshot(board, state) for state in states]
+        elapsed = time.time() - start
+        executor.shutdown()
+        print('%-34s %8.0f threads/sec' % ('%i processes' % processes,
+                                           TASKS * THREADS_PER_TASK / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# bench_post_memory.py - memory used per post by each post representation
+#
+# Usage: python benchmarks/bench_post_memory.py [threads] [replies]
+from __future__ import print_function
+import gc
+import json
+import sys
+import tracemalloc
+
+from fixtures import make_board, make_thread_json
+from basc_py4chan import Post, Thread
+from basc_py4chan.file import File
+from basc_py4chan.url import Url
+
+
+class BaselinePost(Post):
+    """Post as it was before compact posts: its own Url, and its File built eagerly."""
+    def __init__(self, thread, data):
+        Post.__init__(self, thread, data)
+        self._url = Url(board_name=thread._board.name, https=thread.https)
+        if self.has_file:
+            self._file = File(self, data)
+            self._file._url = Url(board_name=thread._board.name, https=thread.https)
+
+
+def measure(board, raw_threads, read):
+    """Bytes per post of parsed JSON plus thread/post objects."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # parse from text, like a real response, so the JSON itself is counted
+    threads = [Thread._from_json(json.loads(raw), board, i) for i, raw in enumerate(raw_threads)]
+    posts = sum(len(t.replies) + 1 for t in threads)
+    if read:
+        # replies are kept as JSON until first read, so build every post
+        for t in threads:
+            list(t.replies)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del threads
+    return (after - before) / float(posts)
+
+
+def main():
+    thread_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    replies = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    raw_threads = [json.dumps(make_thread_json(1000000 + i * 1000, replies))
+                   for i in range(thread_count)]
+
+    baseline = make_board()
+    baseline._post_factory = BaselinePost
+    baseline._lazy_posts = False
+
+    print('%i threads x %i replies, bytes/post as stored and once every post is read'
+          % (thread_count, replies + 1))
+    for label, board in (
+        ('baseline Post', baseline),
+        ('Post', make_board()),
+        ('CompactPost', make_board(compact_posts=True)),
+        ('CompactPost, raw JSON dropped', make_board(compact_posts=True, keep_raw=False)),
+    ):
+        print('%-32s %8.0f %8.0f' % (label, measure(board, raw_threads, False),
+                                     measure(board, raw_threads, True)))
+
+
+if __name__ == '__main__':
+    main()
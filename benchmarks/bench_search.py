@@ -0,0 +1,52 @@
+# bench_search.py - full-text indexing throughput and query latency
+#
+# Usage: python benchmarks/bench_search.py
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import time
+
+from fixtures import make_board, make_thread_json
+from basc_py4chan import Thread
+from basc_py4chan.search import SearchIndex
+
+QUERIES = (
+    ('rare word', '1000150'),
+    ('common word, top 20', 'implying'),
+    ('phrase', '"some text"'),
+    ('prefix, on one board', 'imag*'),
+)
+
+
+def main():
+    board = make_board()
+    threads = [Thread._from_json(make_thread_json(1000000 + i * 1000, 300), board, 1000000 + i * 1000)
+               for i in range(1000)]
+    posts = sum(len(thread.replies) + 1 for thread in threads)
+
+    directory = tempfile.mkdtemp()
+    try:
+        index = SearchIndex(os.path.join(directory, 'bench.sqlite3'))
+        start = time.time()
+        for i in range(0, len(threads), 50):
+            index.write_threads(threads[i:i + 50])
+        elapsed = time.time() - start
+        print('%-34s %10.0f posts/sec' % ('write_threads, %i posts' % posts, posts / elapsed))
+        index.optimize()
+
+        for label, query in QUERIES:
+            board_name = 'g' if 'board' in label else None
+            runs = 20
+            start = time.time()
+            for _ in range(runs):
+                index.search(query, board=board_name)
+            elapsed = time.time() - start
+            print('%-34s %10.2f ms/query' % (label, elapsed / runs * 1000))
+        index.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# bench_snapshot.py - restoring a board's thread cache from a snapshot vs. from JSON
+#
+# Usage: python benchmarks/bench_snapshot.py
+from __future__ import print_function
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from fixtures import make_board, make_thread_json
+from basc_py4chan import Thread, jsonstream
+
+
+def main():
+    ids = [1000000 + i * 1000 for i in range(1000)]
+    documents = [json.dumps(make_thread_json(id, 300)).encode('utf-8') for id in ids]
+    json_size = sum(len(document) for document in documents)
+
+    # parsed the way the library parses responses, with the fastest JSON library installed
+    start = time.time()
+    board = make_board()
+    for id, document in zip(ids, documents):
+        board._thread_cache[id] = Thread._from_json(jsonstream.loads(document), board, id)
+    elapsed = time.time() - start
+    print('%-34s %8.0f threads/sec  %6.1f MB' % ('%s + Thread' % jsonstream.BACKEND,
+                                                 len(ids) / elapsed, json_size / 1e6))
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'g.snapshot')
+        for level in (1, 6):
+            start = time.time()
+            board.save_snapshot(path, level)
+            elapsed = time.time() - start
+            print('%-34s %8.0f threads/sec  %6.1f MB' % ('save_snapshot, level %i' % level,
+                                                         len(ids) / elapsed,
+                                                         os.path.getsize(path) / 1e6))
+
+            start = time.time()
+            make_board().load_snapshot(path)
+            elapsed = time.time() - start
+            print('%-34s %8.0f threads/sec' % ('load_snapshot, level %i' % level, len(ids) / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# bench_storage.py - SQLite ingestion throughput
+#
+# Usage: python benchmarks/bench_storage.py
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import time
+
+from fixtures import make_board, make_thread_json
+from basc_py4chan import Thread
+from basc_py4chan.storage import SQLiteArchive
+
+
+def main():
+    board = make_board()
+    threads = [Thread._from_json(make_thread_json(1000000 + i * 1000, 300), board, 1000000 + i * 1000)
+               for i in range(200)]
+    posts = sum(len(thread.replies) + 1 for thread in threads)
+
+    directory = tempfile.mkdtemp()
+    try:
+        archive = SQLiteArchive(os.path.join(directory, 'bench.sqlite3'))
+        start = time.time()
+        for thread in threads:
+            archive.write_thread(thread)
+        elapsed = time.time() - start
+        print('%-34s %10.0f posts/sec' % ('write_thread, new posts', posts / elapsed))
+
+        start = time.time()
+        archive.write_threads(threads)
+        elapsed = time.time() - start
+        print('%-34s %10.0f posts/sec' % ('write_threads, upserting', posts / elapsed))
+        archive.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# bench_url.py - URL generation and thread parsing throughput
+#
+# Usage: python benchmarks/bench_url.py
+from __future__ import print_function
+import timeit
+
+from fixtures import make_board, make_thread_json
+from basc_py4chan import Thread, Url
+
+
+def format_file_url(url, tim, ext):
+    """How file URLs used to be generated: str.format on every call."""
+    return url.URL['data']['file'].format(board=url._board_name, tim=tim, ext=ext)
+
+
+def rate(stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    return number / best
+
+
+def main():
+    url = Url.shared('g')
+    number = 200000
+    print('URL generation, calls/sec')
+    print('  %-28s %12.0f' % ('Url() construction', rate(lambda: Url('g'), number // 10)))
+    print('  %-28s %12.0f' % ('Url.shared()', rate(lambda: Url.shared('g'), number)))
+    print('  %-28s %12.0f' % ('file_url, str.format', rate(lambda: format_file_url(url, 1577836800000, '.jpg'), number)))
+    print('  %-28s %12.0f' % ('file_url', rate(lambda: url.file_url(1577836800000, '.jpg'), number)))
+    print('  %-28s %12.0f' % ('thumb_url', rate(lambda: url.thumb_url(1577836800000), number)))
+    print('  %-28s %12.0f' % ('thread_url', rate(lambda: url.thread_url(1000000), number)))
+
+    board = make_board()
+    thread_json = make_thread_json(1000000, 300)
+    number = 200
+    print('Thread parsing, 301 posts')
+    print('  %-28s %12.0f threads/sec' % (
+        'Thread._from_json', rate(lambda: Thread._from_json(thread_json, board, 1000000), number)))
+    print('  %-28s %12.0f threads/sec' % (
+        'with every file URL', rate(lambda: list(Thread._from_json(thread_json, board, 1000000).files()), number)))
+
+
+if __name__ == '__main__':
+    main()
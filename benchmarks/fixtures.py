@@ -0,0 +1,58 @@
+# fixtures.py - synthetic 4chan API data for the benchmarks, no network needed
+import base64
+import hashlib
+import os
+import sys
+
+# run against the checkout these benchmarks live in
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def make_post(no, resto, time, with_file=True):
+    post = {
+        'no': no,
+        'resto': resto,
+        'now': '01/01/20(Wed)00:00:00',
+        'time': time,
+        'name': 'Anonymous',
+        'com': ('<a href="#p%i" class="quotelink">&gt;&gt;%i</a><br>'
+                '<span class="quote">&gt;implying</span><br>'
+                'Post number %i, with some text &amp; an entity<wbr>.') % (resto or no, resto or no, no),
+    }
+    if with_file:
+        post.update({
+            'filename': 'image%i' % no,
+            'ext': '.jpg',
+            'w': 1280,
+            'h': 720,
+            'tn_w': 250,
+            'tn_h': 140,
+            'tim': 1577836800000 + no,
+            'time': time,
+            'md5': base64.b64encode(hashlib.md5(str(no).encode()).digest()).decode('ascii'),
+            'fsize': 123456 + no,
+        })
+    return post
+
+
+def make_thread_json(thread_id, replies=300):
+    """Thread JSON shaped like /{board}/thread/{id}.json, every other post with a file."""
+    op = make_post(thread_id, 0, 1577836800)
+    op.update({
+        'sub': 'Thread %i' % thread_id,
+        'replies': replies,
+        'images': replies // 2,
+        'semantic_url': 'thread-%i' % thread_id,
+        'bumplimit': 0,
+        'imagelimit': 0,
+        'unique_ips': 50,
+    })
+    posts = [op] + [make_post(thread_id + i, thread_id, 1577836800 + i, with_file=not i % 2)
+                    for i in range(1, replies + 1)]
+    return {'posts': posts}
+
+
+def make_board(name='g', **kwargs):
+    """Board that is never asked to touch the network."""
+    import basc_py4chan
+    return basc_py4chan.Board(name, **kwargs)
@@ -1,6 +1,7 @@
 # example6-download-thread.py - download json and all full-size images from a thread
 from __future__ import print_function
 import basc_py4chan
+from basc_py4chan.download import Downloader
 import sys
 import os
 import requests
@@ -11,27 +12,6 @@ def mkdirs(path):
     if not os.path.exists(path):
         os.makedirs(path)
 
-def download_file(local_filename, url, clobber=False):
-    """Download the given file. Clobber overwrites file if exists."""
-    dir_name = os.path.dirname(local_filename)
-    mkdirs(dir_name)
-
-    if clobber or not os.path.exists(local_filename):
-        i = requests.get(url)
-
-        # if not exists
-        if i.status_code == 404:
-            print('Failed to download file:', local_filename, url)
-            return False
-
-        # write out in 1MB chunks
-        chunk_size_in_bytes = 1024*1024  # 1MB
-        with open(local_filename, 'wb') as local_file:
-            for chunk in i.iter_content(chunk_size=chunk_size_in_bytes):
-                local_file.write(chunk)
-
-    return True
-
 def download_json(local_filename, url, clobber=False):
     """Download the given JSON file, and pretty-print before we output it."""
     with open(local_filename, 'w') as json_file:
@@ -62,10 +42,15 @@ def main():
     print(url_builder.thread_api_url(thread_id))
     download_json(os.path.join(path, "%s.json" % thread_id), json_url)
 
-    # record the url of every file on the first thread, even extra files in posts
-    for img in thread.file_objects():
-        print("Downloading %s..." % img.file_url)
-        download_file(os.path.join(images_path, "%s" % img.filename), img.file_url)
+    # download every file in the thread, a few at a time. Files already on disk
+    # are skipped, and interrupted downloads resume where they left off.
+    downloader = Downloader(workers=4)
+    for result in downloader.download_thread(thread, images_path):
+        if result.status == 'failed':
+            print('Failed to download file:', result.path, result.file.file_url, result.error)
+        else:
+            print('%s %s' % (result.status.capitalize(), result.file.file_url))
+    print(downloader)
 
 if __name__ == '__main__':
     main()
@@ -30,7 +30,15 @@ setup(
         'basc_py4chan': 'basc_py4chan',
     },
     package_data={'': ['README.rst', 'LICENSE']},
-    install_requires=['requests >= 1.0.0'],
+    install_requires=[
+        'requests >= 1.0.0',
+        'futures; python_version < "3"',
+    ],
+    extras_require={
+        'async': ['aiohttp >= 3.0'],
+        'numpy': ['numpy'],
+        'speedups': ['orjson'],
+    },
     keywords='4chan api',
     classifiers=[
         'Intended Audience :: Developers',
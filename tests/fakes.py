@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""A fake 4chan API, and sessions answering from it, so tests need no network."""
+import json
+import re
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    # Python 2
+    from urlparse import urlparse
+
+_THREAD = re.compile(r'^/\w+/thread/(\d+)\.json$')
+
+
+def http_date(version):
+    return 'Mon, 01 Jan 2024 %02d:%02d:%02d GMT' % (version // 3600, version // 60 % 60, version % 60)
+
+
+class FakeResponse(object):
+    """The parts of a requests response the library uses."""
+    def __init__(self, status_code, url, content=b'', headers=None):
+        self.status_code = status_code
+        self.reason = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified',
+                       404: 'Not Found', 416: 'Range Not Satisfiable'}.get(status_code, '')
+        self.url = url
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.closed = False
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError('%i Error: %s for url: %s' % (self.status_code, self.reason, self.url),
+                                     response=self)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAPI(object):
+    """One board's worth of threads, served like a.4cdn.org serves them.
+
+    Every change bumps a version counter, which stands in for the
+    Last-Modified times of the threads and the thread listing.
+
+    Attributes:
+        threads (dict): Thread ID -> list of post dicts, OP first.
+        modified (dict): Thread ID -> version it last changed at.
+        archive (list): IDs of archived threads.
+        dead (set): IDs of threads still listed, but 404ing when fetched.
+        requests (list): (method, URL) of every request answered.
+    """
+    def __init__(self):
+        self.threads = {}
+        self.modified = {}
+        self.archive = []
+        self.dead = set()
+        self.requests = []
+        self.version = 0
+
+    def add_thread(self, thread_id, replies=0):
+        self.threads[thread_id] = [{'no': thread_id, 'resto': 0, 'time': thread_id,
+                                    'com': 'OP of %i' % thread_id, 'replies': 0, 'images': 0}]
+        self.add_replies(thread_id, replies)
+
+    def add_replies(self, thread_id, count):
+        posts = self.threads[thread_id]
+        for _ in range(count):
+            no = max(posts[-1]['no'], thread_id * 1000) + 1
+            posts.append({'no': no, 'resto': thread_id, 'time': no, 'com': 'reply %i' % no})
+        posts[0]['replies'] = len(posts) - 1
+        self.touch(thread_id)
+
+    def touch(self, thread_id):
+        self.version += 1
+        self.modified[thread_id] = self.version
+
+    def delete_thread(self, thread_id):
+        del self.threads[thread_id]
+        del self.modified[thread_id]
+        self.version += 1
+
+    def kill_thread(self, thread_id):
+        # still listed, like a thread that 404s between the listing and its fetch
+        self.dead.add(thread_id)
+
+    def respond(self, method, url, headers=None):
+        self.requests.append((method, url))
+        path = urlparse(url).path
+        since = (headers or {}).get('If-Modified-Since')
+
+        match = _THREAD.match(path)
+        if match:
+            thread_id = int(match.group(1))
+            if thread_id not in self.threads or thread_id in self.dead:
+                return FakeResponse(404, url)
+            body = {'posts': [dict(post) for post in self.threads[thread_id]]}
+            return self._document(url, body, http_date(self.modified[thread_id]), since)
+
+        listing = http_date(self.version)
+        if path.endswith('/threads.json'):
+            threads = [{'no': id, 'last_modified': self.modified[id]} for id in sorted(self.threads)]
+            return self._document(url, [{'page': 1, 'threads': threads}], listing, since)
+        if path.endswith('/catalog.json'):
+            threads = [dict(posts[0], last_replies=[dict(post) for post in posts[1:][-5:]])
+                       for id, posts in sorted(self.threads.items())]
+            return self._document(url, [{'page': 1, 'threads': threads}], listing, since)
+        if path.endswith('/archive.json'):
+            return self._document(url, list(self.archive), listing, since)
+        return FakeResponse(404, url)
+
+    def _document(self, url, body, last_modified, since):
+        if since == last_modified:
+            return FakeResponse(304, url)
+        return FakeResponse(200, url, json.dumps(body).encode('utf-8'),
+                            {'Last-Modified': last_modified})
+
+
+class FakeSession(object):
+    """A requests session answering from a :class:`FakeAPI`."""
+    def __init__(self, api):
+        self.api = api
+        self.headers = {}
+        self.adapters = {}
+
+    def get(self, url, headers=None, **kwargs):
+        return self.api.respond('GET', url, headers)
+
+    def head(self, url, **kwargs):
+        res = self.api.respond('HEAD', url)
+        res.content = b''
+        return res
+
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from basc_py4chan.aio import AsyncBoard
+except ImportError:
+    raise unittest.SkipTest('aiohttp is not installed')
+
+from fakes import FakeAPI
+
+
+class FakeAsyncSession(object):
+    """A :class:`basc_py4chan.aio.AsyncSession` answering from a :class:`FakeAPI`."""
+    def __init__(self, api):
+        self.api = api
+
+    async def get(self, url, headers=None):
+        return self.api.respond('GET', url, headers)
+
+    async def head(self, url):
+        res = self.api.respond('HEAD', url)
+        res.content = b''
+        return res
+
+    async def close(self):
+        pass
+
+
+async def collect(results):
+    return [result async for result in results]
+
+
+class AsyncBoardTest(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeAPI()
+        self.board = AsyncBoard('g', session=FakeAsyncSession(self.api))
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_get_all_threads_keeps_threads_without_replies(self):
+        self.api.add_thread(1)
+        self.api.add_thread(2, replies=3)
+        self.api.add_thread(3, replies=1)
+        self.api.kill_thread(3)
+        threads = self.run_async(self.board.get_all_threads(expand=True))
+        self.assertEqual([thread.id for thread in threads], [1, 2])
+        self.assertEqual([len(thread.replies) for thread in threads], [0, 3])
+
+    def test_get_thread_returns_cached_thread_without_replies(self):
+        self.api.add_thread(1)
+        thread = self.run_async(self.board.get_thread(1))
+        self.assertEqual(len(thread.replies), 0)
+        self.assertIs(self.run_async(self.board.get_thread(1)), thread)
+
+        self.api.add_replies(1, 2)
+        self.assertIs(self.run_async(self.board.get_thread(1)), thread)
+        self.assertEqual(len(thread.replies), 2)
+
+        self.api.kill_thread(1)
+        with self.assertRaises(Exception) as context:
+            self.run_async(self.board.get_thread(1, raise_404=True))
+        self.assertEqual(context.exception.response.status_code, 404)
+
+    def test_iter_threads(self):
+        self.api.add_thread(1, replies=2)
+        self.api.add_thread(2)
+        self.api.kill_thread(2)
+        results = self.run_async(collect(self.board.iter_threads()))
+        results = dict((result.thread_id, result) for result in results)
+        self.assertEqual(len(results[1].thread.replies), 2)
+        self.assertTrue(results[2].is_404)
+        self.assertIsNone(results[2].thread)
+
+    def test_sync(self):
+        for id in (1, 2, 3):
+            self.api.add_thread(id, replies=id)
+        result = self.run_async(self.board.sync())
+        self.assertEqual(sorted(thread.id for thread in result.new), [1, 2, 3])
+
+        self.api.add_replies(1, 1)
+        self.api.delete_thread(2)
+        result = self.run_async(self.board.sync())
+        self.assertEqual(result.new, [])
+        self.assertEqual([thread.id for thread in result.changed], [1])
+        self.assertEqual([thread.id for thread in result.pruned], [2])
+        self.assertEqual(sorted(self.board._thread_cache), [1, 3])
+
+    def test_backfill_archive(self):
+        for id in (1, 2, 3):
+            self.api.add_thread(id, replies=1)
+        self.api.archive = [1, 2, 3, 4]
+        self.assertEqual(self.run_async(self.board.get_archived_thread_ids()), [1, 2, 3, 4])
+
+        directory = tempfile.mkdtemp()
+        try:
+            progress_file = os.path.join(directory, 'progress')
+            results = self.run_async(collect(
+                self.board.backfill_archive(skip={1}, progress_file=progress_file)))
+            self.assertEqual(sorted(result.thread_id for result in results), [2, 3, 4])
+            self.assertEqual(len(self.board._thread_cache), 0)
+            with open(progress_file) as fd:
+                self.assertEqual(sorted(int(line) for line in fd), [2, 3, 4])
+
+            results = self.run_async(collect(self.board.backfill_archive(progress_file=progress_file)))
+            self.assertEqual([result.thread_id for result in results], [1])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from basc_py4chan import Board
+
+from fakes import FakeAPI, FakeSession
+
+
+class BoardTest(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeAPI()
+        self.board = Board('g', session=FakeSession(self.api))
+
+    def test_get_all_threads_keeps_threads_without_replies(self):
+        self.api.add_thread(1)
+        self.api.add_thread(2, replies=3)
+        self.api.add_thread(3)
+        for workers in (None, 4):
+            self.board.clear_cache()
+            threads = self.board.get_all_threads(expand=True, workers=workers)
+            self.assertEqual([thread.id for thread in threads], [1, 2, 3], workers)
+            self.assertEqual([len(thread.replies) for thread in threads], [0, 3, 0], workers)
+
+    def test_get_all_threads_drops_404(self):
+        self.api.add_thread(1)
+        self.api.add_thread(2, replies=1)
+        self.api.kill_thread(2)
+        for workers in (None, 4):
+            self.board.clear_cache()
+            threads = self.board.get_all_threads(expand=True, workers=workers)
+            self.assertEqual([thread.id for thread in threads], [1], workers)
+
+    def test_iter_threads_reports_404(self):
+        self.api.add_thread(1, replies=2)
+        self.api.kill_thread(1)
+        self.api.add_thread(2)
+        results = dict((result.thread_id, result) for result in self.board.iter_threads(workers=2))
+        self.assertTrue(results[1].is_404)
+        self.assertIsNone(results[1].thread)
+        self.assertIsNone(results[2].error)
+        self.assertEqual(results[2].thread.id, 2)
+
+    def test_cached_thread_that_dies(self):
+        self.api.add_thread(1, replies=1)
+        self.api.add_thread(2, replies=1)
+        thread = self.board.get_thread(1)
+        self.board.get_thread(2)
+        self.api.kill_thread(1)
+        self.api.kill_thread(2)
+
+        self.assertIs(self.board.get_thread(1), thread)
+        self.assertTrue(thread.is_404)
+        self.assertNotIn(1, self.board._thread_cache)
+        with self.assertRaises(Exception) as context:
+            self.board.get_thread(2, raise_404=True)
+        self.assertEqual(context.exception.response.status_code, 404)
+
+    def test_sync(self):
+        for id in (1, 2, 3):
+            self.api.add_thread(id, replies=id)
+        result = self.board.sync()
+        self.assertEqual(sorted(thread.id for thread in result.new), [1, 2, 3])
+        self.assertFalse(result.changed or result.pruned or result.failed)
+
+        # nothing changed: only the listing is requested, and it is not modified
+        requests_before = len(self.api.requests)
+        result = self.board.sync()
+        self.assertFalse(result.new or result.changed or result.pruned)
+        self.assertEqual(len(self.api.requests), requests_before + 1)
+
+        self.api.add_replies(2, 2)
+        self.api.delete_thread(3)
+        self.api.add_thread(4)
+        result = self.board.sync(workers=2)
+        self.assertEqual([thread.id for thread in result.new], [4])
+        self.assertEqual([thread.id for thread in result.changed], [2])
+        self.assertEqual([thread.id for thread in result.pruned], [3])
+        self.assertEqual(len(self.board._thread_cache[2].replies), 4)
+        self.assertEqual(sorted(self.board._thread_cache), [1, 2, 4])
+
+
+class BackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeAPI()
+        self.board = Board('g', session=FakeSession(self.api))
+        for id in (1, 2, 3, 4):
+            self.api.add_thread(id, replies=1)
+        self.api.archive = [1, 2, 3, 4, 5]
+        self.directory = tempfile.mkdtemp()
+        self.progress_file = os.path.join(self.directory, 'progress')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_archived_thread_ids(self):
+        self.assertEqual(self.board.get_archived_thread_ids(), [1, 2, 3, 4, 5])
+
+    def test_resumes_from_progress_file(self):
+        with open(self.progress_file, 'w') as fd:
+            fd.write('1\n')
+        results = list(self.board.backfill_archive(skip={2}, progress_file=self.progress_file,
+                                                   workers=2))
+        self.assertEqual(sorted(result.thread_id for result in results), [3, 4, 5])
+        self.assertTrue([result for result in results if result.thread_id == 5][0].is_404)
+        # fetched threads are not kept in the cache
+        self.assertEqual(len(self.board._thread_cache), 0)
+
+        with open(self.progress_file) as fd:
+            self.assertEqual(sorted(int(line) for line in fd), [1, 3, 4, 5])
+        self.assertEqual(list(self.board.backfill_archive(skip={2}, progress_file=self.progress_file)),
+                         [])
+
+    def test_keep_cached(self):
+        list(self.board.backfill_archive(keep_cached=True, workers=2))
+        self.assertEqual(sorted(self.board._thread_cache), [1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from basc_py4chan.comment import (CODE, CROSSLINK, DEADLINK, GREENTEXT, QUOTELINK, SPOILER, TEXT,
+                                  CrossReference, Segment, parse_comment)
+
+
+class ParseCommentTest(unittest.TestCase):
+    def test_quotelinks(self):
+        parsed = parse_comment('<a href="#p123" class="quotelink">&gt;&gt;123</a>'
+                               '<a href="#p124" class="quotelink">&gt;&gt;124</a><br>hi &amp; bye')
+        self.assertEqual(parsed.quoted_ids, [123, 124])
+        # adjacent quotelinks stay apart
+        self.assertEqual(parsed.segments, [Segment(QUOTELINK, '>>123', 123),
+                                           Segment(QUOTELINK, '>>124', 124),
+                                           Segment(TEXT, '\nhi & bye', None)])
+        self.assertEqual(parsed.text, '>>123>>124\nhi & bye')
+
+    def test_crosslinks(self):
+        parsed = parse_comment('<a href="/g/thread/5#p6" class="quotelink">&gt;&gt;&gt;6</a> '
+                               '<a href="/g/thread/7" class="quotelink">&gt;&gt;&gt;7</a> '
+                               '<a href="//boards.4chan.org/tg/" class="quotelink">&gt;&gt;&gt;/tg/</a>')
+        self.assertEqual(parsed.cross_references, [CrossReference('g', 5, 6),
+                                                   CrossReference('g', 7, 7),
+                                                   CrossReference('tg', None, None)])
+        self.assertEqual(parsed.quoted_ids, [])
+        self.assertEqual(parsed.segments[0], Segment(CROSSLINK, '>>>6', CrossReference('g', 5, 6)))
+
+    def test_malformed_links_are_text(self):
+        parsed = parse_comment('<a href="#pabc" class="quotelink">&gt;&gt;abc</a> '
+                               '<a>no href</a> <a href="http://example.com/">link</a>')
+        self.assertEqual(parsed.segments, [Segment(TEXT, '>>abc no href link', None)])
+        self.assertEqual(parsed.quoted_ids, [])
+        self.assertEqual(parsed.cross_references, [])
+
+    def test_deadlinks(self):
+        parsed = parse_comment('<span class="deadlink">&gt;&gt;99</span>'
+                               '<span class="deadlink">&gt;&gt;&gt;/g/</span>')
+        self.assertEqual(parsed.dead_ids, [99])
+        self.assertEqual(parsed.segments, [Segment(DEADLINK, '>>99>>>/g/', None)])
+
+    def test_greentext_spoilers_and_code(self):
+        parsed = parse_comment('<span class="quote">&gt;implying</span><br><s>secret</s>'
+                               '<pre class="prettyprint">x = 1<br>y &lt; 2</pre>')
+        self.assertEqual(parsed.greentext, ['>implying'])
+        self.assertEqual(parsed.spoilers, ['secret'])
+        self.assertEqual(parsed.code, ['x = 1\ny < 2'])
+        self.assertEqual([segment.kind for segment in parsed.segments], [GREENTEXT, TEXT, SPOILER, CODE])
+
+    def test_quotelink_inside_greentext(self):
+        parsed = parse_comment('<span class="quote">&gt;<a href="#p1" class="quotelink">&gt;&gt;1</a>'
+                               ' lol</span>')
+        self.assertEqual(parsed.quoted_ids, [1])
+        self.assertEqual(parsed.greentext, ['>>>1 lol'])
+        self.assertEqual(parsed.segments, [Segment(GREENTEXT, '>', None),
+                                           Segment(QUOTELINK, '>>1', 1),
+                                           Segment(GREENTEXT, ' lol', None)])
+
+    def test_misnested_tags(self):
+        parsed = parse_comment('<s>open <b>bold</s> after</b> <i>stray</u> end')
+        self.assertEqual(parsed.spoilers, ['open bold'])
+        self.assertEqual(parsed.text, 'open bold after stray end')
+        self.assertEqual(parsed.segments[-1], Segment(TEXT, ' after stray end', None))
+
+    def test_plain(self):
+        self.assertEqual(parse_comment('').segments, [])
+        self.assertEqual(parse_comment('a<wbr>b').text, 'ab')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from basc_py4chan.download import DOWNLOADED, FAILED, SKIPPED, Downloader
+
+from fakes import FakeResponse
+
+URL = 'https://i.4cdn.org/g/1577836800000.jpg'
+DATA = bytes(bytearray(range(256))) * 40
+
+_RANGE = re.compile(r'^bytes=(\d+)-$')
+
+
+class FakeFile(object):
+    file_url = URL
+    thumbnail_url = 'https://i.4cdn.org/g/1577836800000s.jpg'
+    file_size = len(DATA)
+
+
+class FileSession(object):
+    """Serves DATA, answering Range requests unless told otherwise.
+
+    Attributes:
+        ranges (list): The Range header of every request, or None.
+        responses (list): Status codes to answer with, instead of the usual
+            200 or 206, one per request until it runs out.
+    """
+    def __init__(self, data=DATA):
+        self.data = data
+        self.ranges = []
+        self.responses = []
+
+    def get(self, url, headers=None, **kwargs):
+        header = (headers or {}).get('Range')
+        self.ranges.append(header)
+        status = self.responses.pop(0) if self.responses else None
+        if status not in (None, 200, 206):
+            return FakeResponse(status, url)
+        if header is not None and status != 200:
+            offset = int(_RANGE.match(header).group(1))
+            return FakeResponse(206, url, self.data[offset:])
+        return FakeResponse(200, url, self.data)
+
+
+class DownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'file.jpg')
+        self.part = self.path + '.part'
+        self.session = FileSession()
+        self.downloader = Downloader(session=self.session, retries=1, backoff=0, chunk_size=1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_part(self, data):
+        with open(self.part, 'wb') as fd:
+            fd.write(data)
+
+    def downloaded(self):
+        with open(self.path, 'rb') as fd:
+            return fd.read()
+
+    def test_download(self):
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, DOWNLOADED)
+        self.assertEqual(result.size, len(DATA))
+        self.assertEqual(self.downloaded(), DATA)
+        self.assertFalse(os.path.exists(self.part))
+        self.assertEqual(self.session.ranges, [None])
+
+        # complete files on disk are skipped
+        self.assertEqual(self.downloader.fetch(FakeFile(), self.path).status, SKIPPED)
+        self.assertEqual(len(self.session.ranges), 1)
+
+    def test_resume(self):
+        self.write_part(DATA[:3000])
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, DOWNLOADED)
+        self.assertEqual(result.size, len(DATA) - 3000)
+        self.assertEqual(self.session.ranges, ['bytes=3000-'])
+        self.assertEqual(self.downloaded(), DATA)
+
+    def test_range_ignored(self):
+        self.write_part(b'x' * 3000)
+        self.session.responses = [200]
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, DOWNLOADED)
+        self.assertEqual(self.downloaded(), DATA)
+
+    def test_complete_part_file(self):
+        self.write_part(DATA)
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, DOWNLOADED)
+        self.assertEqual(result.size, 0)
+        self.assertEqual(self.session.ranges, [])
+        self.assertEqual(self.downloaded(), DATA)
+
+    def test_416_starts_over(self):
+        self.write_part(b'x' * 3000)
+        self.session.responses = [416]
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, DOWNLOADED)
+        self.assertEqual(self.session.ranges, ['bytes=3000-', None])
+        self.assertEqual(self.downloaded(), DATA)
+
+    def test_416_gives_up_after_retries(self):
+        self.write_part(b'x' * 3000)
+        self.session.responses = [416, 416]
+        self.downloader.retries = 0
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, FAILED)
+        self.assertIsInstance(result.error, ValueError)
+        # the bogus partial file isn't resumed again
+        self.assertFalse(os.path.exists(self.part))
+
+    def test_404_is_not_retried(self):
+        self.session.responses = [404]
+        self.downloader.retries = 3
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, FAILED)
+        self.assertEqual(result.error.response.status_code, 404)
+        self.assertEqual(len(self.session.ranges), 1)
+
+    def test_short_download_is_resumed(self):
+        self.session.data = DATA[:5000]
+        self.session.responses = [200]
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, FAILED)
+        # the first response came up short, the retry asked for the rest
+        self.assertEqual(self.session.ranges, [None, 'bytes=5000-'])
+        self.assertFalse(os.path.exists(self.path))
+
+        self.session.data = DATA
+        result = self.downloader.fetch(FakeFile(), self.path)
+        self.assertEqual(result.status, DOWNLOADED)
+        self.assertEqual(self.session.ranges[-1], 'bytes=5000-')
+        self.assertEqual(self.downloaded(), DATA)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from basc_py4chan.httpcache import CacheAdapter, FileCache
+
+URL = 'https://a.4cdn.org/g/thread/1.json'
+
+
+def age(cache, url, seconds):
+    # make a stored response look as if it was last used that long ago
+    then = time.time() - seconds
+    os.utime(cache._path(url), (then, then))
+
+
+class FileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_max_age(self):
+        cache = FileCache(self.directory, max_age=60)
+        cache.set('a', {'etag': '1'}, b'a')
+        cache.set('b', {'etag': '2'}, b'b')
+        age(cache, 'a', 120)
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(os.path.exists(cache._path('a')))
+        self.assertEqual(cache.get('b'), ({'etag': '2'}, b'b'))
+
+        age(cache, 'b', 120)
+        self.assertEqual(cache.prune(), 1)
+        self.assertEqual(cache.evictions, 2)
+
+    def test_max_bytes_evicts_least_recently_used(self):
+        cache = FileCache(self.directory, max_bytes=5000)
+        for i in range(4):
+            cache.set(str(i), {}, b'x' * 1000)
+            age(cache, str(i), 100 - i)
+        # reading a response makes it the most recently used
+        cache.get('0')
+        for i in range(4, 6):
+            cache.set(str(i), {}, b'x' * 1000)
+        kept = [i for i in range(6) if cache.get(str(i)) is not None]
+        self.assertEqual(kept, [0, 3, 4, 5])
+        self.assertEqual(cache.evictions, 2)
+
+    def test_max_bytes_counts_earlier_runs(self):
+        cache = FileCache(self.directory)
+        for i in range(4):
+            cache.set(str(i), {}, b'x' * 1000)
+        cache = FileCache(self.directory, max_bytes=2500)
+        cache.set('4', {}, b'x' * 10)
+        self.assertLessEqual(cache._nbytes, 2500 * 9 // 10)
+
+
+class CacheAdapterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.status = 200
+        self.send = HTTPAdapter.send
+        HTTPAdapter.send = self.fake_send
+
+        self.adapter = CacheAdapter(self.directory)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+
+    def tearDown(self):
+        HTTPAdapter.send = self.send
+        shutil.rmtree(self.directory)
+
+    def fake_send(self, adapter, request, **kwargs):
+        response = requests.Response()
+        response.status_code = self.status
+        response.url = request.url
+        response.request = request
+        if self.status == 304 and request.headers.get('If-None-Match') != '"1"':
+            response.status_code = 200
+        if response.status_code == 200:
+            response._content = b'{"posts": []}'
+            response.headers['ETag'] = '"1"'
+        else:
+            response._content = b''
+        return response
+
+    def test_not_modified(self):
+        self.session.get(URL)
+        self.status = 304
+        response = self.session.get(URL)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'{"posts": []}')
+        self.assertEqual((self.adapter.hits, self.adapter.misses), (1, 1))
+
+    def test_404_deletes(self):
+        self.session.get(URL)
+        self.assertIsNotNone(self.adapter.cache.get(URL))
+        self.status = 404
+        self.assertEqual(self.session.get(URL).status_code, 404)
+        self.assertIsNone(self.adapter.cache.get(URL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from basc_py4chan.jsonstream import iter_items
+
+# strings full of the characters the scanner looks for
+POSTS = [
+    {'no': 1, 'com': 'brackets ] } [ { inside a string'},
+    {'no': 2, 'com': 'an \\"escaped\\" quote, and \\\\'},
+    {'no': 3, 'com': 'ends in a backslash \\', 'sub': '"'},
+    {'no': 4, 'com': u'unicode éあ and \\u escapes \n\t', 'tags': [1, [2, {}]]},
+    {'no': 5, 'com': ''},
+]
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterItemsTest(unittest.TestCase):
+    def test_every_chunk_size(self):
+        document = json.dumps({'posts': POSTS}).encode('utf-8')
+        # every split point, including inside escapes and multibyte characters
+        for size in range(1, len(document) + 1):
+            self.assertEqual(list(iter_items(chunked(document, size), 2)), POSTS, size)
+
+    def test_split_after_backslash(self):
+        document = json.dumps({'posts': [{'com': 'a\\"]b'}]}).encode('utf-8')
+        split = document.index(b'\\') + 1
+        chunks = [document[:split], document[split:]]
+        self.assertEqual(list(iter_items(chunks, 2)), [{'com': 'a\\"]b'}])
+
+    def test_catalog_depth(self):
+        catalog = [{'page': 1, 'threads': POSTS[:2]}, {'page': 2, 'threads': POSTS[2:]}]
+        document = json.dumps(catalog).encode('utf-8')
+        self.assertEqual(list(iter_items(chunked(document, 7), 3)), POSTS)
+
+    def test_scalars_skipped(self):
+        document = b'{"posts": [1, "x]", {"no": 1}, null, [2]]}'
+        self.assertEqual(list(iter_items(chunked(document, 3), 2)), [{'no': 1}, [2]])
+
+    def test_truncated(self):
+        document = json.dumps({'posts': POSTS}).encode('utf-8')
+        for end in (len(document) - 1, document.index(b'escaped')):
+            items = iter_items(chunked(document[:end], 16), 2)
+            self.assertRaises(ValueError, list, items)
+
+
+if __name__ == '__main__':
+    unittest.main()
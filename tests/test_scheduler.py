@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from basc_py4chan import scheduler
+from basc_py4chan.scheduler import RequestScheduler, _Bucket
+
+THREAD = 'https://a.4cdn.org/g/thread/1.json'
+OTHER_THREAD = 'https://a.4cdn.org/g/thread/2.json'
+CATALOG = 'https://a.4cdn.org/g/catalog.json'
+
+
+class FakeClock(object):
+    """A clock that only moves when a request waits, so nothing really sleeps."""
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCondition(object):
+    def __init__(self, clock):
+        self.clock = clock
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def wait(self, timeout):
+        self.clock.now += timeout
+
+    def notify_all(self):
+        pass
+
+
+class BucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = _Bucket(2.0, 3, now=0.0)
+        for _ in range(3):
+            self.assertEqual(bucket.wait(0.0), 0.0)
+            bucket.tokens -= 1
+        self.assertAlmostEqual(bucket.wait(0.0), 0.5)
+        self.assertAlmostEqual(bucket.wait(0.25), 0.25)
+        self.assertEqual(bucket.wait(0.5), 0.0)
+
+    def test_refill_is_capped_at_burst(self):
+        bucket = _Bucket(1.0, 2, now=0.0)
+        bucket.tokens = 0.0
+        self.assertEqual(bucket.wait(1000.0), 0.0)
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_blocked(self):
+        bucket = _Bucket(1.0, 1, now=0.0)
+        bucket.blocked_until = 30.0
+        self.assertEqual(bucket.wait(10.0), 20.0)
+        self.assertEqual(bucket.wait(30.0), 0.0)
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self._clock = scheduler._clock
+        scheduler._clock = self.clock
+
+    def tearDown(self):
+        scheduler._clock = self._clock
+
+    def make_scheduler(self, *args, **kwargs):
+        requests = RequestScheduler(*args, **kwargs)
+        requests._cond = FakeCondition(self.clock)
+        return requests
+
+    def test_host_rate(self):
+        requests = self.make_scheduler({'a.4cdn.org': (1.0, 2)}, [])
+        waits = [requests.acquire(CATALOG) for _ in range(4)]
+        self.assertEqual(waits, [0.0, 0.0, 1.0, 1.0])
+        self.assertEqual(requests.requests, 4)
+        self.assertEqual(requests.waited, 2.0)
+
+    def test_unlimited_host(self):
+        requests = self.make_scheduler({}, [])
+        self.assertEqual([requests.acquire(CATALOG) for _ in range(3)], [0.0, 0.0, 0.0])
+
+    def test_min_interval(self):
+        requests = self.make_scheduler({}, [(r'/thread/\d+\.json$', 10.0)])
+        self.assertEqual(requests.acquire(THREAD), 0.0)
+        # another thread isn't held up by the first one cooling down
+        self.assertEqual(requests.acquire(OTHER_THREAD), 0.0)
+        self.clock.now += 4.0
+        self.assertEqual(requests.acquire(THREAD), 6.0)
+        self.assertEqual(requests.acquire(CATALOG), 0.0)
+
+    def test_backoff(self):
+        requests = self.make_scheduler({'a.4cdn.org': (10.0, 10)}, [])
+        requests.backoff(CATALOG, 30.0)
+        self.assertEqual(requests.acquire(CATALOG), 30.0)
+
+        # a host without a rate can be backed off as well
+        requests.backoff('https://i.4cdn.org/g/1.jpg', 5.0)
+        self.assertEqual(requests.acquire('https://i.4cdn.org/g/1.jpg'), 5.0)
+
+    def test_set_rate(self):
+        requests = self.make_scheduler({'a.4cdn.org': (1.0, 1)}, [])
+        requests.acquire(CATALOG)
+        requests.set_rate('a.4cdn.org', None)
+        self.assertEqual(requests.acquire(CATALOG), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from basc_py4chan import Board
+from basc_py4chan.cache import ThreadCache
+from basc_py4chan.thread import _first_after
+
+from fakes import FakeAPI, FakeSession
+
+
+def ids(posts):
+    return [post.post_id for post in posts]
+
+
+class FirstAfterTest(unittest.TestCase):
+    def test_bisects_replies(self):
+        posts = [{'no': no} for no in (1, 10, 20, 30, 40)]
+        self.assertEqual(_first_after(posts, 1), 1)
+        self.assertEqual(_first_after(posts, 10), 2)
+        self.assertEqual(_first_after(posts, 25), 3)
+        self.assertEqual(_first_after(posts, 40), 5)
+        # only the OP
+        self.assertEqual(_first_after(posts[:1], 1), 1)
+
+
+class UpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeAPI()
+        self.api.add_thread(1, replies=3)
+        self.board = Board('g', session=FakeSession(self.api))
+        self.thread = self.board.get_thread(1)
+
+    def test_incremental_update(self):
+        replies = list(self.thread.replies)
+        self.api.add_replies(1, 2)
+        self.assertEqual(self.thread.update(), 2)
+        self.assertEqual(ids(self.thread.replies), [1001, 1002, 1003, 1004, 1005])
+        # posts already held are kept, not rebuilt
+        self.assertEqual(list(self.thread.replies)[:3], replies)
+        self.assertEqual(self.thread.last_reply_id, 1005)
+
+    def test_not_modified(self):
+        self.assertEqual(self.thread.update(), 0)
+        self.assertIsNone(self.thread._update_error)
+        self.assertEqual(len(self.thread.replies), 3)
+
+    def test_update_ignores_posts_already_held(self):
+        # a post edited on the server isn't picked up by an incremental update
+        self.api.threads[1][1]['com'] = 'edited'
+        self.api.add_replies(1, 1)
+        self.assertEqual(self.thread.update(), 1)
+        self.assertEqual(self.thread.replies[0].comment, 'reply 1001')
+
+    def test_forced_update_replaces_replies(self):
+        del self.api.threads[1][2]
+        self.api.touch(1)
+        self.assertEqual(self.thread.update(force=True), -1)
+        self.assertEqual(ids(self.thread.replies), [1001, 1003])
+
+    def test_404(self):
+        self.api.kill_thread(1)
+        self.assertEqual(self.thread.update(), 0)
+        self.assertTrue(self.thread.is_404)
+        self.assertEqual(self.thread._update_error.response.status_code, 404)
+        self.assertNotIn(1, self.board._thread_cache)
+
+    def test_thread_without_replies(self):
+        self.api.add_thread(2)
+        thread = self.board.get_thread(2)
+        self.assertEqual(thread.last_reply_id, 2)
+        self.api.add_replies(2, 1)
+        self.assertEqual(thread.update(), 1)
+        self.assertEqual(ids(thread.replies), [2001])
+
+
+class UpdateDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeAPI()
+        self.api.add_thread(1, replies=4)
+        self.board = Board('g', session=FakeSession(self.api))
+        self.thread = self.board.get_thread(1)
+
+    def test_added(self):
+        self.api.add_replies(1, 2)
+        delta = self.thread.update_diff()
+        self.assertEqual(ids(delta.added), [1005, 1006])
+        self.assertEqual(delta.removed, [])
+        self.assertEqual(delta.modified, [])
+        self.assertEqual(self.thread.last_reply_id, 1006)
+
+    def test_removed_modified_and_added(self):
+        posts = self.api.threads[1]
+        unchanged = self.thread.replies[0]
+        del posts[2]
+        posts[3]['com'] = 'edited'
+        self.api.add_replies(1, 1)
+
+        delta = self.thread.update_diff()
+        self.assertTrue(delta)
+        self.assertEqual(ids(delta.added), [1005])
+        self.assertEqual(ids(delta.removed), [1002])
+        self.assertEqual(ids(delta.modified), [1004])
+        self.assertEqual(delta.modified[0].comment, 'edited')
+        self.assertEqual(ids(self.thread.replies), [1001, 1003, 1004, 1005])
+        self.assertIs(self.thread.replies[0], unchanged)
+
+    def test_modified_in_place(self):
+        self.api.threads[1][2]['com'] = 'edited'
+        self.api.threads[1][0]['closed'] = 1
+        self.api.touch(1)
+        delta = self.thread.update_diff()
+        self.assertEqual(ids(delta.modified), [1, 1002])
+        self.assertEqual(ids(self.thread.replies), [1001, 1002, 1003, 1004])
+        self.assertEqual(self.thread.replies[1].comment, 'edited')
+        self.assertTrue(self.thread.closed)
+
+    def test_omitted_posts_filled_in(self):
+        # a catalog preview holds only the last replies
+        self.board.clear_cache()
+        thread = self.board.get_all_threads()[0]
+        del thread.replies[:2]
+        delta = thread.update_diff()
+        self.assertEqual(ids(delta.added), [1001, 1002])
+        self.assertEqual(ids(thread.replies), [1001, 1002, 1003, 1004])
+
+    def test_not_modified(self):
+        self.assertFalse(self.thread.update_diff())
+
+
+class ThreadCacheTest(unittest.TestCase):
+    def test_threads_growing_in_place_are_measured(self):
+        api = FakeAPI()
+        api.add_thread(1, replies=1)
+        api.add_thread(2, replies=1)
+        cache = ThreadCache(max_bytes=10 ** 6)
+        board = Board('g', session=FakeSession(api), thread_cache=cache)
+        board.get_thread(1)
+        board.get_thread(2)
+        before = cache.nbytes
+
+        api.add_replies(1, 50)
+        board.refresh_cache()
+        self.assertGreater(cache.nbytes, before)
+
+        # too big for the cache now; the least recently used thread goes first
+        cache.max_bytes = cache.nbytes - 1
+        api.add_replies(2, 1)
+        board.get_thread(2)
+        self.assertEqual(list(cache), [2])
+        self.assertEqual(cache.evictions, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()